@@ -0,0 +1,20 @@
+# Read by gunicorn from the working directory, see runserver.sh. Settings given on the command line take precedence.
+import os
+
+# GUNICORN_PRELOAD=1 imports and warms up the app once in the master, workers are forked from it ready to serve.
+# Restarting workers then does not reload the code, only restarting the master does.
+preload_app = bool(int(os.environ.get("GUNICORN_PRELOAD", 0)))
+
+
+def when_ready(server):
+    # the master, before it forks the workers
+    if server.cfg.preload_app:
+        from taskmanager.startup import warm_up
+        warm_up()
+
+
+def post_worker_init(worker):
+    from taskmanager.startup import connect, warm_up
+    if not worker.cfg.preload_app:
+        warm_up()
+    connect()
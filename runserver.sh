@@ -2,4 +2,27 @@
 
 python manage.py collectstatic --no-input
 python manage.py migrate
-gunicorn solvro_api_for_mobile.wsgi --bind=0.0.0.0:80
\ No newline at end of file
+python manage.py generate_schema
+# background jobs, see taskmanager.jobs; more workers can run as processes of their own
+python manage.py run_jobs &
+jobs=$!
+if [ "$SERVER_MODE" = "asgi" ]; then
+  gunicorn solvro_api_for_mobile.asgi:application --worker-class uvicorn.workers.UvicornWorker --bind=0.0.0.0:80 &
+else
+  gunicorn solvro_api_for_mobile.wsgi --bind=0.0.0.0:80 &
+fi
+server=$!
+
+stop() {
+  kill -TERM "$jobs" "$server" 2>/dev/null
+  wait "$jobs" "$server"
+}
+# the container's stop signal goes to both
+trap 'stop; exit 143' TERM INT
+# and the container exits when either of them does, so that it is restarted instead of running without jobs
+while kill -0 "$jobs" 2>/dev/null && kill -0 "$server" 2>/dev/null; do
+  sleep 1 &
+  wait $!
+done
+stop
+exit 1
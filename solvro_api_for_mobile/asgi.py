@@ -9,8 +9,28 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from asgiref.wsgi import WsgiToAsgi
+from django.conf import settings
 from django.core.asgi import get_asgi_application
+from whitenoise import WhiteNoise
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'solvro_api_for_mobile.settings')
 
-application = get_asgi_application()
+# sets Django up, before settings are read
+django_application = get_asgi_application()
+
+
+def not_found(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'Not Found']
+
+
+# WhiteNoise only speaks WSGI, static files are rare enough to go through the adapter
+static_application = WsgiToAsgi(WhiteNoise(not_found, root=settings.STATIC_ROOT, prefix=settings.STATIC_URL))
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'].startswith(settings.STATIC_URL):
+        await static_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
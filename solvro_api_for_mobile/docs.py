@@ -0,0 +1,25 @@
+"""
+The Swagger UI and OpenAPI document views, imported on the first request to /swagger/ (see urls.py), so that
+workers serving the API do not import drf_yasg.
+"""
+from drf_yasg import openapi
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+from taskmanager.schema import with_cached_document
+
+# also the DEFAULT_INFO of SWAGGER_SETTINGS, for manage.py generate_schema
+api_info = openapi.Info(
+   title="Taskmanager Demo API",
+   default_version='v1',
+   description="Simple api for mobile application for student science club recrutation. To authenticate, include token in header in such format: {'Authorization': 'Bearer <token>'} Token can be retrieved on /auth/login and /auth/register endpoints, it expires after expires_in seconds and a new one can be retrieved with the refresh token on /auth/refresh.",
+   contact=openapi.Contact(email="kontakt@kowalinski.dev"),
+)
+
+schema_view = with_cached_document(get_schema_view(
+   api_info,
+   public=True,
+   permission_classes=(permissions.AllowAny,),
+))
+
+swagger_ui = schema_view.with_ui('swagger', cache_timeout=0)
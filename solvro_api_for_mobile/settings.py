@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/4.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
+import importlib.util
 import os
 from pathlib import Path
 
@@ -44,10 +45,19 @@ INSTALLED_APPS = [
     "corsheaders",
     "drf_yasg"
 ]
+# drf_yasg, with pkg_resources, is the slowest import of a worker and only /swagger/ needs it. With LAZY_DOCS (the
+# default without DEBUG) it is no installed app, its templates and static files are found by path instead, so it is
+# imported on the first request to /swagger/. See manage.py bench_startup.
+LAZY_DOCS = bool(int(os.environ.get("LAZY_DOCS", 0 if DEBUG else 1)))
+DRF_YASG_DIR = Path(importlib.util.find_spec("drf_yasg").submodule_search_locations[0])
+if LAZY_DOCS:
+    INSTALLED_APPS.remove("drf_yasg")
 
 MIDDLEWARE = [
+    'taskmanager.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    'taskmanager.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +67,23 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# 'wsgi' (gunicorn sync workers) or 'asgi' (gunicorn with uvicorn workers, serves /api/async/ without blocking),
+# runserver.sh starts the server accordingly
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
+if SERVER_MODE == "asgi":
+    # not async-capable, asgi.py serves static files in front of Django instead
+    MIDDLEWARE.remove("whitenoise.middleware.WhiteNoiseMiddleware")
+
+# Share of requests whose SQL queries are timed (0-1), see taskmanager.instrumentation. Request counts and durations
+# are recorded for every request.
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get("INSTRUMENTATION_SAMPLE_RATE", 0.1))
+# Queries of sampled requests taking longer are logged with their SQL to the 'taskmanager.slow_queries' logger
+INSTRUMENTATION_SLOW_QUERY_MS = float(os.environ.get("INSTRUMENTATION_SLOW_QUERY_MS", 200))
+# Send the timings of sampled requests to clients in a Server-Timing header
+INSTRUMENTATION_SERVER_TIMING = bool(int(os.environ.get("INSTRUMENTATION_SERVER_TIMING", 1)))
+# Bearer token Prometheus scrapes /metrics/ with; without it only staff users logged in to the admin can
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 ROOT_URLCONF = 'solvro_api_for_mobile.urls'
@@ -64,8 +91,7 @@ ROOT_URLCONF = 'solvro_api_for_mobile.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'templates']
-        ,
+        'DIRS': [BASE_DIR / 'templates'] + ([DRF_YASG_DIR / 'templates'] if LAZY_DOCS else []),
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -98,8 +124,62 @@ DATABASES = {
         "PASSWORD": os.environ.get("SQL_PASSWORD", "password"),
         "HOST": os.environ.get("SQL_HOST", "localhost"),
         "PORT": os.environ.get("SQL_PORT", "5432"),
+        # Seconds a connection is kept for the next requests of the worker, instead of one connection per request.
+        # Django recommends 0 under ASGI (SERVER_MODE=asgi), where a pooler such as PgBouncer should do the pooling.
+        "CONN_MAX_AGE": int(os.environ.get("SQL_CONN_MAX_AGE", 0 if SERVER_MODE == "asgi" else 60)),
+        # checks a kept connection before the first query of a request, reconnects if the database went away
+        "CONN_HEALTH_CHECKS": bool(int(os.environ.get("SQL_CONN_HEALTH_CHECKS", 1))),
+        # 1 when connecting through PgBouncer in transaction pooling mode, which breaks server-side cursors
+        "DISABLE_SERVER_SIDE_CURSORS": bool(int(os.environ.get("SQL_PGBOUNCER", 0))),
     }
 }
+# Read replicas of the default database, space separated 'host' or 'host:port', e.g. 'replica-1 replica-2:5433'.
+# Safe requests of the project and task endpoints read from them, see taskmanager.db_routers.
+DATABASE_REPLICAS = []
+for _index, _replica in enumerate(os.environ.get("SQL_REPLICA_HOSTS", "").split()):
+    _host, _, _port = _replica.partition(":")
+    DATABASES[f"replica_{_index}"] = {
+        **DATABASES["default"],
+        "HOST": _host,
+        "PORT": _port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{_index}")
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["taskmanager.db_routers.ReplicaRouter"]
+# Seconds a user reads from the default database after a write, to see it despite replication lag. Tracked in the
+# default cache, which has to be shared (CACHE_REDIS_URL) with several workers.
+REPLICA_STICKY_SECONDS = int(os.environ.get("SQL_REPLICA_STICKY_SECONDS", 5))
+
+# Password hashing: 'scrypt' (default), 'argon2' (needs the argon2-cffi package) or 'pbkdf2'. The other hashers stay
+# installed to check existing passwords, which are rehashed with the chosen one when their users log in.
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "scrypt")
+_PASSWORD_HASHERS = {
+    "scrypt": "taskmanager.hashers.ScryptPasswordHasher",
+    "argon2": "taskmanager.hashers.Argon2PasswordHasher",
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + [
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+# cost parameters, changing them rehashes passwords on login too
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get("PASSWORD_SCRYPT_WORK_FACTOR", 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get("PASSWORD_SCRYPT_BLOCK_SIZE", 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get("PASSWORD_SCRYPT_PARALLELISM", 1))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get("PASSWORD_ARGON2_TIME_COST", 2))
+# in KiB
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get("PASSWORD_ARGON2_MEMORY_COST", 19456))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get("PASSWORD_ARGON2_PARALLELISM", 1))
+# Threads per process that hash passwords (0 hashes in the request thread), and how many more logins may wait for
+# one before the rest get 503, see taskmanager.hashers
+PASSWORD_HASHING_WORKERS = int(os.environ.get("PASSWORD_HASHING_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASHING_QUEUE = int(os.environ.get("PASSWORD_HASHING_QUEUE", 32))
+
+AUTHENTICATION_BACKENDS = ['taskmanager.backends.PooledModelBackend']
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -135,6 +215,7 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
+STATICFILES_DIRS = [DRF_YASG_DIR / "static"] if LAZY_DOCS else []
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -145,11 +226,112 @@ AUTH_USER_MODEL = 'taskmanager.MyUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'taskmanager.authentication.AccessTokenAuthentication',
+        # tokens issued before access tokens, until their apps log in again
+        'taskmanager.authentication.CachedTokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # login and sign-up attempts, see taskmanager.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get("LOGIN_THROTTLE_IP_RATE", "60/min"),
+        'login_email': os.environ.get("LOGIN_THROTTLE_EMAIL_RATE", "10/min"),
+        'register_ip': os.environ.get("REGISTER_THROTTLE_IP_RATE", "20/hour"),
+    },
+    # number of reverse proxies in front of the app, so throttles see client addresses instead of the proxy's
+    'NUM_PROXIES': int(os.environ["NUM_PROXIES"]) if os.environ.get("NUM_PROXIES") else None,
+}
+# MessagePack responses (Accept: application/msgpack) are offered when the optional msgpack package is installed
+if importlib.util.find_spec("msgpack"):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('taskmanager.renderers.MessagePackRenderer')
+
+# Long lists are read and sent this many rows at a time, see taskmanager.streaming
+STREAMING_CHUNK_SIZE = int(os.environ.get("STREAMING_CHUNK_SIZE", 2000))
+# Shorter responses are not compressed, see taskmanager.compression
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+
+# With True, project responses carry user ids and a side-loaded "users" map unless ?expand= asks for nested users.
+# False keeps nested users by default, clients opt in to the compact shape by sending ?expand= (possibly empty).
+COMPACT_RESPONSES = bool(int(os.environ.get("COMPACT_RESPONSES", 0)))
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # per-process LRU of authenticated tokens, see taskmanager.authentication
+    "token-auth": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "token-auth",
+        "TIMEOUT": int(os.environ.get("TOKEN_AUTH_CACHE_TIMEOUT", 60)),
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("TOKEN_AUTH_CACHE_MAX_SIZE", 10000))},
+    },
 }
+# 'CACHE_REDIS_URL' makes the default cache shared by all workers, e.g. 'redis://localhost:6379/0'
+if os.environ.get("CACHE_REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("CACHE_REDIS_URL"),
+    }
+
+# Seconds signed access tokens are valid for. They are checked without a query, so they cannot be revoked and a
+# logout or deactivation takes up to that long to lock a device out.
+ACCESS_TOKEN_LIFETIME = int(os.environ.get("ACCESS_TOKEN_LIFETIME", 15 * 60))
+# Seconds a refresh token is valid for since its last use
+REFRESH_TOKEN_LIFETIME = int(os.environ.get("REFRESH_TOKEN_LIFETIME", 30 * 24 * 60 * 60))
+
+TOKEN_AUTH_LOCAL_CACHE = "token-auth"
+# alias of a cache shared by all workers to back the local one with, e.g. 'default' together with CACHE_REDIS_URL
+TOKEN_AUTH_SHARED_CACHE = os.environ.get("TOKEN_AUTH_SHARED_CACHE", "")
+
+# How long (in seconds) project membership answers are shared between requests, see taskmanager.membership
+PROJECT_MEMBERSHIP_CACHE_TIMEOUT = int(os.environ.get("PROJECT_MEMBERSHIP_CACHE_TIMEOUT", 30))
+
+# How long (in seconds) /api/projects/{id}/stats/ is kept in the cache. It is cached under the project version,
+# which task writes, membership changes and member name or profession changes bump, so this only frees memory.
+PROJECT_STATS_CACHE_TIMEOUT = int(os.environ.get("PROJECT_STATS_CACHE_TIMEOUT", 3600))
+
+# /api/sync/ resends rows changed this many seconds before the client's token, to cover commits that were in
+# flight when the token was issued. Tombstones older than the retention are pruned (manage.py prune_tombstones)
+# and clients with older tokens get a full sync.
+SYNC_OVERLAP_SECONDS = int(os.environ.get("SYNC_OVERLAP_SECONDS", 5))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+
+# On SQLite, /api/search/ compares the task names of users with up to this many tasks in their projects, it is
+# cheaper than asking the FTS5 index for matches among all tasks. See taskmanager.search and manage.py bench_search.
+SEARCH_INDEX_MIN_TASKS = int(os.environ.get("SEARCH_INDEX_MIN_TASKS", 20000))
+
+# Runs background jobs (see taskmanager.jobs): DatabaseRunner leaves them to 'manage.py run_jobs' workers,
+# 'JOBS_IMMEDIATE' runs them in the process that enqueued them, e.g. in development.
+JOB_RUNNER = {"BACKEND": "taskmanager.jobs.DatabaseRunner", "OPTIONS": {}}
+if bool(int(os.environ.get("JOBS_IMMEDIATE", 0))):
+    JOB_RUNNER = {"BACKEND": "taskmanager.jobs.ImmediateRunner", "OPTIONS": {}}
+# Failed jobs are retried after JOB_RETRY_SECONDS times the attempts so far, running ones that reported no progress
+# for JOB_TIMEOUT_SECONDS are assumed to have lost their worker. Jobs write at most JOB_CHUNK_SIZE rows per query.
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_SECONDS = int(os.environ.get("JOB_RETRY_SECONDS", 60))
+JOB_TIMEOUT_SECONDS = int(os.environ.get("JOB_TIMEOUT_SECONDS", 600))
+JOB_CHUNK_SIZE = int(os.environ.get("JOB_CHUNK_SIZE", 1000))
+# Longer member lists for /add-users-to-project/ are added by a background job, as are all task imports
+JOB_INLINE_MAX_EMAILS = int(os.environ.get("JOB_INLINE_MAX_EMAILS", 500))
+
+# Where change events for /api/async/projects/{id}/events/ go, see taskmanager.events. The in-memory broker only
+# reaches clients connected to the same process, 'REALTIME_REDIS_URL' is needed with several workers or nodes.
+REALTIME_BROKER = {"BACKEND": "taskmanager.events.InMemoryBroker", "OPTIONS": {}}
+if os.environ.get("REALTIME_REDIS_URL"):
+    REALTIME_BROKER = {
+        "BACKEND": "taskmanager.events.RedisBroker",
+        "OPTIONS": {"url": os.environ.get("REALTIME_REDIS_URL")},
+    }
+# Idle event streams get a comment line this often, so proxies and mobile networks keep them open
+REALTIME_HEARTBEAT_SECONDS = int(os.environ.get("REALTIME_HEARTBEAT_SECONDS", 15))
 
 SWAGGER_SETTINGS = {
+   'DEFAULT_INFO': 'solvro_api_for_mobile.docs.api_info',
    'SECURITY_DEFINITIONS': {
       'Token': {
             'type': 'apiKey',
@@ -158,3 +340,6 @@ SWAGGER_SETTINGS = {
       }
    }
 }
+
+# OpenAPI document written by manage.py generate_schema and served by /swagger/?format=openapi, see taskmanager.schema
+OPENAPI_SCHEMA_PATH = os.environ.get("OPENAPI_SCHEMA_PATH", BASE_DIR / "schema" / "openapi.json")
@@ -0,0 +1,137 @@
+"""
+Async versions of the read endpoints, for the ASGI serving mode (SERVER_MODE=asgi in runserver.sh).
+
+They return the same JSON as ProjectViewSet.list and TaskViewSet.list, but wait for the database without holding
+a worker thread, so one process can keep thousands of idle mobile connections open.
+"""
+import asyncio
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from taskmanager import fast_serializers
+from taskmanager.authentication import AccessTokenAuthentication, CachedTokenAuthentication
+from taskmanager.events import get_broker, project_channel
+from taskmanager.filters import TaskFilterBackend
+from taskmanager.membership import ais_project_member
+from taskmanager.models import Project, Task
+from taskmanager.pagination import TaskCursorPagination
+
+
+def _json_response(data, status=200, headers=None):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json', headers=headers)
+
+
+def async_api_view(view):
+    """Token authentication, GET only and DRF-like error responses for async views."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        authenticators = (AccessTokenAuthentication(), CachedTokenAuthentication())
+        try:
+            if request.method not in ('GET', 'HEAD'):
+                raise exceptions.MethodNotAllowed(request.method)
+            for authentication in authenticators:
+                result = await authentication.aauthenticate(request)
+                if result is not None:
+                    break
+            else:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = result
+            return await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            headers = None
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                headers = {'WWW-Authenticate': authenticators[0].authenticate_header(request)}
+            return _json_response({'detail': exc.detail}, status=exc.status_code, headers=headers)
+    return wrapper
+
+
+async def _check_membership(request, project_pk):
+    if not await ais_project_member(request, project_pk):
+        raise exceptions.PermissionDenied()
+
+
+async def _project_list_data(user):
+    projects = [row async for row in fast_serializers.project_values(Project.objects.for_user(user))]
+    if not projects:
+        return []
+    members = [row async for row in fast_serializers.member_values([project['id'] for project in projects])]
+    return fast_serializers.projects_data(projects, members)
+
+
+async def _task_page_data(request, project_pk):
+    paginator, drf_request = TaskCursorPagination(), Request(request)
+    queryset = TaskFilterBackend().filter_queryset(drf_request, Task.objects.filter(project_id=project_pk), None)
+    queryset = paginator.get_page_queryset(fast_serializers.task_values(queryset, drf_request), drf_request)
+    page = paginator.get_page([row async for row in queryset])
+    return paginator.get_paginated_response(fast_serializers.tasks_data(page)).data
+
+
+@async_api_view
+async def project_list(request):
+    return _json_response(await _project_list_data(request.user))
+
+
+@async_api_view
+async def task_list(request, project_pk):
+    await _check_membership(request, project_pk)
+    return _json_response(await _task_page_data(request, project_pk))
+
+
+@async_api_view
+async def board(request, project_pk):
+    """Everything the board screen needs: the project list and the first (or ?cursor) page of the project's tasks."""
+    await _check_membership(request, project_pk)
+    projects, tasks = await asyncio.gather(_project_list_data(request.user), _task_page_data(request, project_pk))
+    return _json_response({'projects': projects, 'tasks': tasks})
+
+
+def _sse(event_type, data):
+    return f'event: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+async def _event_stream(request, project_pk, subscription):
+    try:
+        yield f'retry: {settings.REALTIME_HEARTBEAT_SECONDS * 1000}\n\n'
+        while True:
+            event = await subscription.get(timeout=settings.REALTIME_HEARTBEAT_SECONDS)
+            if event is None:
+                yield ': ping\n\n'
+                continue
+            if event['type'] == 'project' and event['change'] in ('members', 'deleted'):
+                # same rules as IsPartOfThisProject, re-checked whenever they may have changed
+                request._project_memberships = {}
+                if not await ais_project_member(request, project_pk):
+                    yield _sse('revoked', {'project': project_pk})
+                    return
+            yield _sse(event['type'], event)
+    finally:
+        await subscription.close()
+
+
+@async_api_view
+async def project_events(request, project_pk):
+    """
+    Server-sent events with changes to the project and its tasks, instead of polling the task list.
+
+    'tasks' events carry the ids of created, updated and deleted tasks, 'project' events say that the project was
+    'updated', 'deleted' or its 'members' changed. After 'resync' (the client fell behind) the client should refetch,
+    after 'revoked' it is not a member anymore and the stream ends.
+    """
+    if not isinstance(request, ASGIRequest):
+        # WSGI reads an async response to its end before sending it, this one never ends and would hold the worker
+        return _json_response({'detail': 'Event streams need the ASGI serving mode (SERVER_MODE=asgi)'}, status=501)
+    await _check_membership(request, project_pk)
+    subscription = await get_broker().subscribe(project_channel(project_pk))
+    response = StreamingHttpResponse(_event_stream(request, project_pk, subscription),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx would buffer the stream otherwise
+    response['X-Accel-Buffering'] = 'no'
+    return response
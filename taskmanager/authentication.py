@@ -0,0 +1,194 @@
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from taskmanager.models import MyUser, RefreshToken
+
+ACCESS_TOKEN_SALT = 'taskmanager.access-token'
+
+
+def _cache_key(key):
+    # tokens are credentials, keep them out of cache keys
+    return 'token-auth:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _caches():
+    yield caches[settings.TOKEN_AUTH_LOCAL_CACHE]
+    if settings.TOKEN_AUTH_SHARED_CACHE:
+        yield caches[settings.TOKEN_AUTH_SHARED_CACHE]
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers token -> user, so the token query runs once per token per
+    TOKEN_AUTH_CACHE_TIMEOUT instead of once per request.
+
+    Users are looked up in a per-process LRU cache first (TOKEN_AUTH_LOCAL_CACHE), then in an optional cache shared
+    by all workers (TOKEN_AUTH_SHARED_CACHE). Deleting a token or saving its user invalidates both, other processes'
+    LRU caches expire within the timeout.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        local, *shared = _caches()
+        user = local.get(cache_key)
+        if user is None and shared:
+            user = shared[0].get(cache_key)
+            if user is not None:
+                local.set(cache_key, user)
+        if user is not None:
+            return user, Token(key=key, user=user)
+
+        user, token = super().authenticate_credentials(key)
+        for cache in (local, *shared):
+            cache.set(cache_key, user)
+        return user, token
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views, the token is loaded with the async ORM on a cache miss."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            msg = _('Invalid token header. Token string should not contain invalid characters.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        cache_key = _cache_key(key)
+        local, *shared = _caches()
+        # the local cache lives in process memory, it does not block
+        user = local.get(cache_key)
+        if user is None and shared:
+            user = await shared[0].aget(cache_key)
+            if user is not None:
+                local.set(cache_key, user)
+        if user is not None:
+            return user, Token(key=key, user=user)
+
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        local.set(cache_key, token.user)
+        if shared:
+            await shared[0].aset(cache_key, token.user)
+        return token.user, token
+
+
+def invalidate_token(key):
+    for cache in _caches():
+        cache.delete(_cache_key(key))
+
+
+def invalidate_user_tokens(user):
+    for key in Token.objects.filter(user_id=user.pk).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+def issue_tokens(user, device=''):
+    """Starts a session on a new device; returns the token fields of AuthResponseSerializer."""
+    now = timezone.now()
+    # expired sessions of the user go on the way
+    RefreshToken.objects.filter(user=user, expires_at__lte=now).delete()
+    refresh_token = secrets.token_urlsafe(32)
+    session = RefreshToken.objects.create(user=user, key_hash=_hash(refresh_token), device=str(device)[:128],
+                                          expires_at=now + timedelta(seconds=settings.REFRESH_TOKEN_LIFETIME))
+    return _token_fields(user, session.pk, refresh_token)
+
+
+def rotate_refresh_token(refresh_token):
+    """
+    Exchanges a refresh token for a new access token and a new refresh token, the old one stops working.
+    Returns (user, token fields), or None for an unknown or expired refresh token.
+    """
+    now = timezone.now()
+    session = RefreshToken.objects.select_related('user').filter(key_hash=_hash(refresh_token),
+                                                                  expires_at__gt=now).first()
+    if session is None or not session.user.is_active:
+        return None
+    new_token = secrets.token_urlsafe(32)
+    # conditional on the old hash, so that of two concurrent refreshes with one token only one wins
+    rotated = RefreshToken.objects.filter(pk=session.pk, key_hash=session.key_hash).update(
+        key_hash=_hash(new_token), expires_at=now + timedelta(seconds=settings.REFRESH_TOKEN_LIFETIME))
+    if not rotated:
+        return None
+    return session.user, _token_fields(session.user, session.pk, new_token)
+
+
+def _hash(refresh_token):
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def _token_fields(user, session_id, refresh_token):
+    # short keys, the token travels with every request
+    claims = {'u': user.pk, 's': session_id, 'e': user.email, 'n': user.name, 'p': user.profession}
+    return {
+        'token': signing.dumps(claims, salt=ACCESS_TOKEN_SALT, compress=True),
+        'token_type': 'Bearer',
+        'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+        'refresh_token': refresh_token,
+    }
+
+
+def _token_user(claims):
+    """
+    The user of access token claims, built without a query. The fields the token does not carry (password,
+    is_staff, is_superuser, is_active, last_login, ...) are deferred: they are loaded from the database when read,
+    so permission checks see their current values. The user cannot be saved, as its copies of the claims may be stale.
+    """
+    values = {'id': claims['u'], 'email': claims['e'], 'name': claims['n'], 'profession': claims['p']}
+    field_names = [field.attname for field in MyUser._meta.concrete_fields if field.attname in values]
+    user = MyUser.from_db('default', field_names, [values[name] for name in field_names])
+    user._read_only = True
+    return user
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    """
+    Signed access tokens of issue_tokens(), checked without touching the database: the user is rebuilt from the
+    token. Sent as 'Bearer <token>', or 'Token <token>' like the tokens of rest_framework.authtoken, which are left
+    to CachedTokenAuthentication. request.auth is the dict of claims, 's' being the RefreshToken id.
+
+    Tokens stay valid until they expire (ACCESS_TOKEN_LIFETIME) even after logout or deactivation, which delete the
+    refresh tokens only.
+    """
+    keywords = ('bearer', 'token')
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if len(auth) != 2 or auth[0].lower().decode(errors='replace') not in self.keywords:
+            return None
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            return None
+        if ':' not in key:
+            # a rest_framework.authtoken key
+            return None
+        try:
+            claims = signing.loads(key, salt=ACCESS_TOKEN_SALT, max_age=settings.ACCESS_TOKEN_LIFETIME)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed(_('Token expired.'))
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return _token_user(claims), claims
+
+    async def aauthenticate(self, request):
+        return self.authenticate(request)
+
+    def authenticate_header(self, request):
+        return 'Bearer'
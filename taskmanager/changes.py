@@ -0,0 +1,142 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from taskmanager.events import get_broker, project_channel
+from taskmanager.models import Project, Tombstone, TombstoneKindChoices
+
+_buffer = ContextVar('taskmanager_changes', default=None)
+_deleting = threading.local()
+
+
+class _ChangeBuffer:
+    def __init__(self):
+        self.tombstones = []
+        self.touched_projects = set()
+        self.bumped_projects = set()
+        self.task_events = defaultdict(lambda: {'created': [], 'updated': [], 'deleted': []})
+        self.project_events = defaultdict(set)
+
+    def flush(self):
+        if self.tombstones:
+            Tombstone.objects.bulk_create(self.tombstones)
+        if self.touched_projects:
+            _touch_projects(self.touched_projects)
+        if self.bumped_projects - self.touched_projects:
+            _bump_project_versions(self.bumped_projects - self.touched_projects)
+        # one event per project for the whole batch
+        for project_id, ids in self.task_events.items():
+            _publish(project_id, {'type': 'tasks', 'project': project_id, **ids})
+        for project_id, changes in self.project_events.items():
+            for change in sorted(changes):
+                _publish(project_id, {'type': 'project', 'project': project_id, 'change': change})
+
+
+@contextmanager
+def batched_changes():
+    """
+    Collects the bookkeeping signal handlers do for every changed row (tombstones, touched projects, change events)
+    and writes it with a couple of bulk queries on exit. Use it inside the transaction that makes the changes.
+    """
+    if _buffer.get() is not None:
+        yield
+        return
+    buffer = _ChangeBuffer()
+    token = _buffer.set(buffer)
+    try:
+        yield
+    finally:
+        _buffer.reset(token)
+    buffer.flush()
+
+
+def _deleting_projects():
+    if not hasattr(_deleting, 'projects'):
+        _deleting.projects = set()
+    return _deleting.projects
+
+
+def mark_project_deleting(project_id, deleting=True):
+    """Tasks removed by a project's cascade need no tombstones of their own, the project's one covers them."""
+    if deleting:
+        _deleting_projects().add(project_id)
+    else:
+        _deleting_projects().discard(project_id)
+
+
+def is_project_being_deleted(project_id):
+    return project_id in _deleting_projects()
+
+
+def record_tombstones(tombstones):
+    buffer = _buffer.get()
+    if buffer is not None:
+        buffer.tombstones.extend(tombstones)
+    elif tombstones:
+        Tombstone.objects.bulk_create(tombstones)
+
+
+def task_tombstone(task):
+    return Tombstone(kind=TombstoneKindChoices.TASK, object_id=task.pk, project_id=task.project_id)
+
+
+def project_tombstones(project_id, user_ids):
+    return [Tombstone(kind=TombstoneKindChoices.PROJECT, object_id=project_id, project_id=project_id, user_id=user_id)
+            for user_id in user_ids]
+
+
+def touch_projects(project_ids):
+    """Bumps updated_at and version of the projects, so /api/sync/ sends them (and their tasks) again."""
+    buffer = _buffer.get()
+    if buffer is not None:
+        buffer.touched_projects.update(project_ids)
+    elif project_ids:
+        _touch_projects(project_ids)
+
+
+def bump_project_versions(project_ids):
+    """Bumps version of the projects, which invalidates ETags of the projects and their task lists."""
+    buffer = _buffer.get()
+    if buffer is not None:
+        buffer.bumped_projects.update(project_ids)
+    elif project_ids:
+        _bump_project_versions(project_ids)
+
+
+def _touch_projects(project_ids):
+    Project.objects.filter(pk__in=project_ids).update(updated_at=timezone.now(), version=F('version') + 1)
+
+
+def _bump_project_versions(project_ids):
+    Project.objects.filter(pk__in=project_ids).update(version=F('version') + 1)
+
+
+def notify_tasks(project_id, created=(), updated=(), deleted=()):
+    """Pushes ids of changed tasks to subscribers of the project, once the transaction commits."""
+    buffer = _buffer.get()
+    if buffer is not None:
+        ids = buffer.task_events[project_id]
+        ids['created'].extend(created)
+        ids['updated'].extend(updated)
+        ids['deleted'].extend(deleted)
+    else:
+        _publish(project_id, {'type': 'tasks', 'project': project_id, 'created': list(created),
+                              'updated': list(updated), 'deleted': list(deleted)})
+
+
+def notify_project(project_id, change):
+    """Pushes a project change ('updated', 'members' or 'deleted') to subscribers, once the transaction commits."""
+    buffer = _buffer.get()
+    if buffer is not None:
+        buffer.project_events[project_id].add(change)
+    else:
+        _publish(project_id, {'type': 'project', 'project': project_id, 'change': change})
+
+
+def _publish(project_id, event):
+    transaction.on_commit(lambda: get_broker().publish(project_channel(project_id), event))
@@ -0,0 +1,134 @@
+"""
+Response compression with the encoding the client prefers in Accept-Encoding: brotli, when the optional ``brotli``
+package is installed, or gzip.
+
+Streamed responses (see taskmanager.streaming) are compressed chunk by chunk and flushed after every chunk, so the
+client can decode the start of a long list while the rest is read. Responses shorter than COMPRESSION_MIN_SIZE
+and event streams are sent as they are. A compressed response is a different representation, so like Apache's
+mod_deflate the coding is appended to its ETag ("<tag>-gzip") and the tag stays strong, which If-Match needs. The
+suffix is stripped from If-None-Match and If-Match before the view compares them with the tag it derives from the
+project version.
+"""
+import gzip
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+# dynamic responses are compressed on every request, higher qualities cost more CPU than they save in bytes
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = re.compile(r'^(text/(?!event-stream)|application/([\w.+-]*json|javascript|xml|msgpack))')
+CODED_ETAG = re.compile(r'-(?:gzip|br)"')
+
+
+def preferred_encoding(accept_encoding):
+    """'br', 'gzip' or None, by the q-values of an Accept-Encoding header; brotli wins ties."""
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        match = re.search(r'q=([\d.]+)', params)
+        try:
+            weights[coding.strip().lower()] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            continue
+    available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    default = weights.get('*', 0.0)
+    ranked = [(weights.get(coding, default), -index, coding) for index, coding in enumerate(available)]
+    weight, _, coding = max(ranked)
+    return coding if weight > 0 else None
+
+
+class _StreamCompressor:
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress = lambda chunk: self._compressor.process(chunk) + self._compressor.flush()
+            self.finish = self._compressor.finish
+        else:
+            # wbits 31: a gzip header and trailer around the deflate stream
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = lambda chunk: self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self._compressor.flush
+
+    def sequence(self, chunks):
+        for chunk in chunks:
+            if chunk:
+                yield self.compress(chunk)
+        yield self.finish()
+
+    async def asequence(self, chunks):
+        async for chunk in chunks:
+            if chunk:
+                yield self.compress(chunk)
+        yield self.finish()
+
+
+def coded_etag(etag, encoding):
+    """The ETag of a response compressed with encoding: '"<tag>-<encoding>"'."""
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Put it after WhiteNoiseMiddleware, which serves static files compressed at build time."""
+
+    def process_request(self, request):
+        # as sent, to tell which representation a 304 is about
+        request._if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        for header in ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MATCH'):
+            if header in request.META:
+                request.META[header] = CODED_ETAG.sub('"', request.META[header])
+
+    def process_response(self, request, response):
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.status_code == 304 and response.has_header('ETag'):
+            return self.not_modified(request, response)
+        if (response.has_header('Content-Encoding') or request.method == 'HEAD'
+                or not COMPRESSIBLE_TYPES.match(response.get('Content-Type', ''))):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = preferred_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = _StreamCompressor(encoding)
+            if response.is_async:
+                response.streaming_content = compressor.asequence(response.streaming_content)
+            else:
+                response.streaming_content = compressor.sequence(response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            response['ETag'] = coded_etag(response['ETag'], encoding)
+        return response
+
+    @staticmethod
+    def not_modified(request, response):
+        # a 304 names the representation the client holds, which is the compressed one if it sent a coded tag
+        encoding = preferred_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is not None:
+            etag = coded_etag(response['ETag'], encoding)
+            if etag in getattr(request, '_if_none_match', ''):
+                response['ETag'] = etag
+        return response
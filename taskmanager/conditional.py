@@ -0,0 +1,104 @@
+"""
+ETag / Last-Modified callables for django.views.decorators.http.condition.
+
+They read one or two columns instead of serializing the resource: a project and its task list are versioned by
+Project.version, a single task by its updated_at. The query string and the negotiated format (JSON, MessagePack)
+are part of the tag, as they change the representation (e.g. the page of a task list). Project.version is also
+bumped when a member changes their profile, which is nested in project responses.
+"""
+import hashlib
+
+from taskmanager.membership import is_project_member
+from taskmanager.models import Project, Task
+
+
+def forget_state(request):
+    """Call after a write, so that the ETag of the response is computed from the new state."""
+    request._conditional_state = {}
+
+
+def make_etag(request, *parts):
+    tag = '-'.join(str(part) for part in parts)
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None:
+        tag += f'-{renderer.format}'
+    query = request.META.get('QUERY_STRING')
+    if query:
+        tag += '-' + hashlib.sha1(query.encode()).hexdigest()[:12]
+    return f'"{tag}"'
+
+
+def _memoized(request, key, load):
+    # condition() asks for the ETag and Last-Modified separately, one query answers both
+    cache = getattr(request, '_conditional_state', None)
+    if cache is None:
+        cache = request._conditional_state = {}
+    if key not in cache:
+        cache[key] = load()
+    return cache[key]
+
+
+def _as_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _project_state(request, pk):
+    def load():
+        if _as_pk(pk) is None:
+            return None
+        return Project.objects.for_user(request.user).filter(pk=pk).values_list('version', 'updated_at').first()
+    return _memoized(request, ('project', pk), load)
+
+
+def _task_state(request, project_pk, pk):
+    def load():
+        if _as_pk(project_pk) is None or _as_pk(pk) is None:
+            return None
+        return Task.objects.filter(project_id=project_pk, pk=pk).values_list('updated_at', flat=True).first()
+    return _memoized(request, ('task', project_pk, pk), load)
+
+
+def project_etag(request, pk=None, **kwargs):
+    state = _project_state(request, pk)
+    return make_etag(request, 'project', pk, state[0]) if state else None
+
+
+def project_last_modified(request, pk=None, **kwargs):
+    state = _project_state(request, pk)
+    return state[1] if state else None
+
+
+def project_version(request, project_pk):
+    """Project.version, without checking access to the project."""
+    def load():
+        if _as_pk(project_pk) is None:
+            return None
+        return Project.objects.filter(pk=project_pk).values_list('version', flat=True).first()
+    return _memoized(request, ('version', project_pk), load)
+
+
+def task_list_etag(request, project_pk=None, **kwargs):
+    # membership was checked by IsPartOfThisProject.has_permission already
+    version = project_version(request, project_pk)
+    return make_etag(request, 'tasks', project_pk, version) if version else None
+
+
+def project_stats_etag(request, pk=None, **kwargs):
+    if not is_project_member(request, pk):
+        return None
+    version = project_version(request, pk)
+    return make_etag(request, 'stats', pk, version) if version else None
+
+
+def task_etag(request, project_pk=None, pk=None, **kwargs):
+    updated_at = _task_state(request, project_pk, pk)
+    if updated_at is None:
+        return None
+    return make_etag(request, 'task', pk, int(updated_at.timestamp()) * 1000000 + updated_at.microsecond)
+
+
+def task_last_modified(request, project_pk=None, pk=None, **kwargs):
+    return _task_state(request, project_pk, pk)
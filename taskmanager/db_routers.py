@@ -0,0 +1,55 @@
+"""
+Read replicas (SQL_REPLICA_HOSTS).
+
+Only views with ReplicaReadsMixin read from a replica, and only for safe requests once authentication and
+permission checks are done, so cached answers such as project membership are always computed on the primary.
+A user who changed something reads from the primary for REPLICA_STICKY_SECONDS afterwards, long enough for the
+replicas to catch up, so that the user sees their own writes.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+_replica = ContextVar('taskmanager_replica', default=None)
+
+
+def _sticky_key(user_id):
+    return f'replica-sticky:{user_id}'
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadsMixin:
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        user = request.user
+        if (settings.DATABASE_REPLICAS and request.method in SAFE_METHODS
+                and not (user.is_authenticated and cache.get(_sticky_key(user.pk)))):
+            self._replica_token = _replica.set(random.choice(settings.DATABASE_REPLICAS))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica.reset(token)
+            self._replica_token = None
+        if (settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400
+                and request.user.is_authenticated):
+            cache.set(_sticky_key(request.user.pk), True, settings.REPLICA_STICKY_SECONDS)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,31 @@
+"""
+drf_yasg without importing it to serve the API.
+
+drf_yasg (and pkg_resources, which it imports) is the slowest import of a worker, and only the schema needs it.
+Views are decorated with the swagger_auto_schema() below, which records the overrides until load_overrides() hands
+them to drf_yasg right before a schema is generated.
+"""
+_deferred = []
+_loaded = False
+
+
+def swagger_auto_schema(**kwargs):
+    """drf_yasg.utils.swagger_auto_schema, applied on load_overrides()."""
+    def decorator(view_method):
+        if _loaded:
+            from drf_yasg.utils import swagger_auto_schema as apply
+            return apply(**kwargs)(view_method)
+        _deferred.append((view_method, kwargs))
+        return view_method
+    return decorator
+
+
+def load_overrides():
+    """Imports drf_yasg and applies the overrides of all views imported so far; call it after loading the URLconf."""
+    global _loaded
+    from drf_yasg.utils import swagger_auto_schema as apply
+    while _deferred:
+        view_method, kwargs = _deferred.pop(0)
+        # drf_yasg sets attributes on the method and returns it
+        apply(**kwargs)(view_method)
+    _loaded = True
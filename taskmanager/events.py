@@ -0,0 +1,135 @@
+"""
+Publish/subscribe of project change events, pushed to clients by the /api/async/projects/{id}/events/ stream.
+
+The broker is configured like a cache backend, in settings.REALTIME_BROKER. InMemoryBroker only reaches
+subscribers in the same process, deployments with several workers or nodes need RedisBroker.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+RESYNC_EVENT = {'type': 'resync'}
+
+
+def project_channel(project_id):
+    return f'project:{project_id}'
+
+
+class BaseBroker:
+    def publish(self, channel, event):
+        """Sends a JSON-serializable event to every subscriber of the channel. Safe to call from any thread."""
+        raise NotImplementedError
+
+    async def subscribe(self, channel):
+        """Returns a subscription, an object with ``async get(timeout)`` (None on timeout) and ``async close()``."""
+        raise NotImplementedError
+
+
+class _MemorySubscription:
+    def __init__(self, broker, channel, queue_size):
+        self.broker, self.channel = broker, channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # the subscriber's loop is closed already
+            pass
+
+    def _put(self, event):
+        if self.queue.full():
+            # a subscriber that falls behind gets told to refetch instead of growing the queue forever
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = RESYNC_EVENT
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._unsubscribe(self)
+
+
+class InMemoryBroker(BaseBroker):
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    async def subscribe(self, channel):
+        subscription = _MemorySubscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.channel, None)
+
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self, timeout=None):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message['data']) if message else None
+
+    async def close(self):
+        await self.pubsub.close()
+
+
+class RedisBroker(BaseBroker):
+    """Redis pub/sub, for deployments with more than one process. Requires the ``redis`` package."""
+
+    def __init__(self, url, prefix='taskmanager:'):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker requires the 'redis' package")
+        self.url, self.prefix = url, prefix
+        self._client = redis.Redis.from_url(url)
+        self._async_redis = redis.asyncio
+
+    def publish(self, channel, event):
+        self._client.publish(self.prefix + channel, json.dumps(event))
+
+    async def subscribe(self, channel):
+        pubsub = self._async_redis.from_url(self.url).pubsub()
+        await pubsub.subscribe(self.prefix + channel)
+        return _RedisSubscription(pubsub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = settings.REALTIME_BROKER
+                _broker = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _broker
@@ -0,0 +1,110 @@
+"""
+Read-only fast paths of ProjectSerializer and TaskSerializer.
+
+They build the same JSON as the DRF serializers straight from ``.values()`` rows, skipping model instances and
+per-object field introspection, which dominate the CPU time of big lists. The shapes are pinned by equivalence
+tests, keep them in sync with the serializers. Compare both paths with ``manage.py bench_serializers``.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from taskmanager.filters import get_task_filters
+from taskmanager.instrumentation import measure_serialization
+from taskmanager.models import Project
+from taskmanager.serializers import get_expand, query_list
+
+TASK_VALUES = ('id', 'project_id', 'created_by_id', 'assigned_to_id', 'created_at', 'name', 'estimation', 'status')
+PROJECT_VALUES = ('id', 'name', 'owner_id', 'owner__email', 'owner__profession', 'owner__name')
+MEMBER_VALUES = ('project_id', 'myuser_id', 'myuser__email', 'myuser__profession', 'myuser__name')
+
+
+def is_applicable(request):
+    """The fast path renders the default shape only, ?fields= and compact responses go through the serializers."""
+    return get_expand(request) is None and query_list(request, 'fields') is None
+
+
+def datetime_formatter():
+    """DateTimeField().to_representation with the format and time zone looked up once instead of per value."""
+    output_format = api_settings.DATETIME_FORMAT
+    if output_format is None or output_format.lower() != ISO_8601 or not settings.USE_TZ:
+        return serializers.DateTimeField().to_representation
+    current_timezone = timezone.get_current_timezone()
+
+    def to_representation(value):
+        if value is None:
+            return None
+        value = value.astimezone(current_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return to_representation
+
+
+def task_values(queryset, request=None):
+    fields = TASK_VALUES
+    # cursors of TaskCursorPagination are built from the ordering columns, which have to be in the rows
+    ordering = get_task_filters(request).get('ordering', '').lstrip('-') if request is not None else ''
+    if ordering and ordering not in fields:
+        fields += (ordering,)
+    return queryset.values(*fields)
+
+
+@measure_serialization
+def tasks_data(rows):
+    created_at = datetime_formatter()
+    return [{
+        'id': row['id'],
+        'project': row['project_id'],
+        'created_by': row['created_by_id'],
+        'assigned_to': row['assigned_to_id'],
+        'created_at': created_at(row['created_at']),
+        'name': row['name'],
+        'estimation': row['estimation'],
+        'status': row['status'],
+    } for row in rows]
+
+
+def project_values(queryset):
+    return queryset.values(*PROJECT_VALUES)
+
+
+def member_values(project_ids, using=None):
+    """Members of the projects in the order ProjectSerializer lists them, see ProjectQuerySet.with_members()."""
+    return (Project.other_users.through.objects.using(using).filter(project_id__in=project_ids)
+            .order_by('project_id', 'myuser_id').values(*MEMBER_VALUES))
+
+
+@measure_serialization
+def projects_data(project_rows, member_rows):
+    members = {}
+    for row in member_rows:
+        members.setdefault(row['project_id'], []).append({
+            'id': row['myuser_id'],
+            'email': row['myuser__email'],
+            'profession': row['myuser__profession'],
+            'name': row['myuser__name'],
+        })
+    return [{
+        'id': row['id'],
+        'name': row['name'],
+        'owner': {
+            'id': row['owner_id'],
+            'email': row['owner__email'],
+            'profession': row['owner__profession'],
+            'name': row['owner__name'],
+        },
+        'other_users': members.get(row['id'], []),
+    } for row in project_rows]
+
+
+def projects_chunk_data(using):
+    """projects_data() of a chunk of project_values() rows read from the database ``using``, with their members."""
+    return lambda project_rows: projects_data(project_rows, member_values([row['id'] for row in project_rows], using))
+
+
+def serialize_projects(queryset):
+    """projects_data() of a project queryset, with two queries whatever the number of projects and members."""
+    project_rows = list(project_values(queryset))
+    if not project_rows:
+        return []
+    return projects_data(project_rows, member_values([row['id'] for row in project_rows]))
@@ -0,0 +1,44 @@
+from rest_framework.filters import BaseFilterBackend
+
+from taskmanager.serializers import TaskFilterSerializer
+
+
+def get_task_filters(request):
+    """Validated TaskFilterSerializer query parameters, memoized on the request (400 on invalid ones)."""
+    filters = getattr(request, '_task_filters', None)
+    if filters is None:
+        serializer = TaskFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = request._task_filters = serializer.validated_data
+    return filters
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    """
+    Filters tasks of a project, or assigned to the current user, by the TaskFilterSerializer query parameters.
+
+    Every filter is an equality or a range on a column covered by one of the (project, ...) or (assigned_to, ...)
+    indexes of Task, so a filtered page is an index range scan whatever the number of tasks. Ordering is applied by
+    TaskCursorPagination, which has to know it to build cursors.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        filters = get_task_filters(request)
+        lookups = {
+            'status__in': filters.get('status') or None,
+            'assigned_to_id': filters.get('assigned_to'),
+            'created_by_id': filters.get('created_by'),
+            'estimation__gte': filters.get('estimation_min'),
+            'estimation__lte': filters.get('estimation_max'),
+            'created_at__gte': filters.get('created_after'),
+            'created_at__lt': filters.get('created_before'),
+            'name__icontains': filters.get('search') or None,
+        }
+        queryset = queryset.filter(**{lookup: value for lookup, value in lookups.items() if value is not None})
+        if 'unassigned' in filters:
+            queryset = queryset.filter(assigned_to__isnull=filters['unassigned'])
+        return queryset
+
+    def get_schema_fields(self, view):
+        # documented with query_serializer=TaskFilterSerializer, coreapi is not installed
+        return []
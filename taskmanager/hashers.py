@@ -0,0 +1,105 @@
+"""
+Password hashing off the request threads.
+
+Hashes are computed by a per-process pool of PASSWORD_HASHING_WORKERS threads (hashlib and argon2 release the GIL
+while hashing), so a burst of logins takes at most that many cores. Callers wait for their hash; when
+PASSWORD_HASHING_QUEUE more are already waiting, PasswordHashingBusy answers 503 right away instead of piling up.
+The hashers below read their cost parameters from the settings, see PASSWORD_HASHER.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+    # hashlib's default limit (32 MiB) is too low for work factors over 2 ** 14, and hashes made with other costs
+    # than the current ones have to verify
+    maxmem = 1024 ** 3
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign-ins at once, try again in a moment.')
+    default_code = 'password_hashing_busy'
+    # sent as Retry-After
+    wait = 1
+
+
+class HashingPool:
+    def __init__(self, workers, queue):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing') \
+            if workers else None
+        self._slots = threading.BoundedSemaphore(workers + queue) if workers else None
+
+    def run(self, function, *args):
+        if self._executor is None:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE)
+    return _pool
+
+
+def hash_password(raw_password):
+    """make_password() in the pool."""
+    return get_pool().run(hashers.make_password, raw_password)
+
+
+def verify_password(user, raw_password):
+    """
+    user.check_password() in the pool. A password hashed with another hasher than PASSWORD_HASHERS[0], or with other
+    cost parameters, is rehashed and saved, so hashes move to the configured strategy as users log in.
+    """
+    outdated = []
+    valid = get_pool().run(hashers.check_password, raw_password, user.password, outdated.append)
+    if outdated:
+        # saved from the request thread, the pool threads never touch the database
+        user.password = hash_password(raw_password)
+        user.save(update_fields=['password'])
+    return valid
@@ -0,0 +1,240 @@
+"""
+Per-request timing and query metrics.
+
+InstrumentationMiddleware measures every request. A sample of them (INSTRUMENTATION_SAMPLE_RATE) also gets its SQL
+queries, serialization (see measure_serialization) and rendering timed, with the breakdown sent back in a
+Server-Timing header and queries slower than
+INSTRUMENTATION_SLOW_QUERY_MS logged with their SQL to the 'taskmanager.slow_queries' logger. Aggregates per view
+are served in the Prometheus text format by metrics_view. They are kept per process.
+"""
+import hmac
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+slow_query_logger = logging.getLogger('taskmanager.slow_queries')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = ContextVar('taskmanager_instrumentation', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.slow_queries = 0
+        self.serializing = False
+        self.serialization = 0.0
+        self.render_started = None
+        self.render = 0.0
+
+
+def query_timer(execute, sql, params, many, context):
+    """Database execute wrapper, installed on every connection; times queries of sampled requests only."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - began
+        timings.queries += 1
+        timings.db += duration
+        if duration * 1000 >= settings.INSTRUMENTATION_SLOW_QUERY_MS:
+            timings.slow_queries += 1
+            # the SQL text only, parameters may carry personal data
+            slow_query_logger.warning("slow query (%.1f ms): %s", duration * 1000, sql)
+
+
+def measure_serialization(function):
+    """
+    Adds the time of function, which builds the data of a response, to the serialization time of sampled requests.
+    Queries it makes count in both. Calls made while another measured one runs (nested serializers) count once.
+    """
+    @wraps(function)
+    def measured(*args, **kwargs):
+        timings = _current.get()
+        if timings is None or timings.serializing:
+            return function(*args, **kwargs)
+        timings.serializing = True
+        began = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings.serialization += time.perf_counter() - began
+            timings.serializing = False
+    return measured
+
+
+class Metrics:
+    """Counters and a request duration histogram per (view, method, status class)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.duration_sum = defaultdict(float)
+            self.duration_buckets = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1))
+            self.sampled = defaultdict(int)
+            self.queries = defaultdict(int)
+            self.db_seconds = defaultdict(float)
+            self.serialization_seconds = defaultdict(float)
+            self.render_seconds = defaultdict(float)
+            self.slow_queries = defaultdict(int)
+
+    def observe(self, view, method, status, duration, timings=None):
+        labels = (view, method, f'{status // 100}xx')
+        with self._lock:
+            self.requests[labels] += 1
+            self.duration_sum[labels] += duration
+            self.duration_buckets[labels][bisect_left(DURATION_BUCKETS, duration)] += 1
+            if timings is not None:
+                self.sampled[view] += 1
+                self.queries[view] += timings.queries
+                self.db_seconds[view] += timings.db
+                self.serialization_seconds[view] += timings.serialization
+                self.render_seconds[view] += timings.render
+                self.slow_queries[view] += timings.slow_queries
+
+    def render(self):
+        lines = []
+
+        def family(name, kind, description, samples):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+
+        with self._lock:
+            request_labels = sorted(self.requests)
+            family('taskmanager_requests_total', 'counter', 'Requests by view, method and status class.', [
+                f'taskmanager_requests_total{_labels(labels)} {self.requests[labels]}' for labels in request_labels])
+            histogram = []
+            for labels in request_labels:
+                cumulative = 0
+                for bound, count in zip((*DURATION_BUCKETS, '+Inf'), self.duration_buckets[labels]):
+                    cumulative += count
+                    histogram.append(f'taskmanager_request_duration_seconds_bucket'
+                                     f'{_labels(labels, le=bound)} {cumulative}')
+                histogram.append(f'taskmanager_request_duration_seconds_sum{_labels(labels)} '
+                                 f'{self.duration_sum[labels]:.6f}')
+                histogram.append(f'taskmanager_request_duration_seconds_count{_labels(labels)} '
+                                 f'{self.requests[labels]}')
+            family('taskmanager_request_duration_seconds', 'histogram', 'Time spent handling requests.', histogram)
+
+            views = sorted(self.sampled)
+            for name, description, values in (
+                ('taskmanager_sampled_requests_total', 'Requests with query and render timings.', self.sampled),
+                ('taskmanager_db_queries_total', 'SQL queries of sampled requests.', self.queries),
+                ('taskmanager_db_duration_seconds_total', 'Time in SQL queries of sampled requests.',
+                 self.db_seconds),
+                ('taskmanager_serialization_duration_seconds_total',
+                 'Time building response data (serializers) of sampled requests.', self.serialization_seconds),
+                ('taskmanager_render_duration_seconds_total',
+                 'Time rendering response bodies (JSON, MessagePack, ...) of sampled requests.', self.render_seconds),
+                ('taskmanager_slow_queries_total', 'Queries over INSTRUMENTATION_SLOW_QUERY_MS in sampled requests.',
+                 self.slow_queries),
+            ):
+                family(name, 'counter', description, [f'{name}{_labels((view,))} {_number(values[view])}'
+                                                      for view in views])
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(values, le=None):
+    pairs = list(zip(('view', 'method', 'status'), values))
+    if le is not None:
+        pairs.append(('le', le))
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return f'{value:.6f}' if isinstance(value, float) else str(value)
+
+
+metrics = Metrics()
+
+
+class InstrumentationMiddleware:
+    """Put it first in MIDDLEWARE, so that the time of the other middleware is included."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        began, timings = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.set(None)
+        return self.finish(request, response, began, timings)
+
+    async def __acall__(self, request):
+        began, timings = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.set(None)
+        return self.finish(request, response, began, timings)
+
+    @staticmethod
+    def start(request):
+        timings = None
+        if random.random() < settings.INSTRUMENTATION_SAMPLE_RATE:
+            timings = request._timings = RequestTimings()
+        _current.set(timings)
+        return time.perf_counter(), timings
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook
+        timings = getattr(request, '_timings', None)
+        if timings is not None:
+            timings.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self.rendered(timings))
+        return response
+
+    @staticmethod
+    def rendered(timings):
+        timings.render = time.perf_counter() - timings.render_started
+
+    @staticmethod
+    def finish(request, response, began, timings):
+        duration = time.perf_counter() - began
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        metrics.observe(view, request.method, response.status_code, duration, timings)
+        if timings is not None and settings.INSTRUMENTATION_SERVER_TIMING:
+            response['Server-Timing'] = (f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+                                         f'serialize;dur={timings.serialization * 1000:.1f}, '
+                                         f'render;dur={timings.render * 1000:.1f}, total;dur={duration * 1000:.1f}')
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: needs 'Authorization: Bearer <METRICS_TOKEN>', or a staff session without one."""
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '')
+        allowed = hmac.compare_digest(supplied.encode(), f'Bearer {settings.METRICS_TOKEN}'.encode())
+    else:
+        allowed = request.user.is_authenticated and request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,129 @@
+"""
+Background jobs, queued in the database so they need no broker and survive restarts.
+
+enqueue() stores a Job in the current transaction and hands it to the runner configured like a cache backend in
+settings.JOB_RUNNER once the transaction commits. DatabaseRunner leaves it to ``manage.py run_jobs`` workers, any
+number of which may poll the queue. ImmediateRunner runs it at once in the calling thread, for tests and development.
+
+A job is a function taking the Job and its kwargs, whose return value (JSON-serializable) becomes the job's result.
+Jobs that raise are retried up to JOB_MAX_ATTEMPTS times, unless they raise JobError. Jobs should be safe to run
+again, a worker that dies midway leaves its job to be retried after JOB_TIMEOUT_SECONDS.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from taskmanager.models import Job, JobStatusChoices
+
+logger = logging.getLogger(__name__)
+
+
+class JobError(Exception):
+    """Fails a job without retrying it. ``detail`` (JSON-serializable) becomes its result, e.g. validation errors."""
+
+    def __init__(self, message, detail=None):
+        super().__init__(message)
+        self.detail = detail
+
+
+class BaseRunner:
+    def submit(self, job):
+        """Called with every enqueued job once the transaction that created it commits."""
+        raise NotImplementedError
+
+
+class DatabaseRunner(BaseRunner):
+    """Jobs wait in the table for ``manage.py run_jobs``."""
+
+    def submit(self, job):
+        pass
+
+
+class ImmediateRunner(BaseRunner):
+    """Runs jobs in the thread that enqueued them, once its transaction commits. Failed jobs are not retried."""
+
+    def submit(self, job):
+        if claim(job.pk):
+            run_job(Job.objects.get(pk=job.pk), retry=False)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                config = settings.JOB_RUNNER
+                _runner = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _runner
+
+
+def enqueue(name, user=None, **kwargs):
+    """Queues the function at the dotted path ``name`` to be called with kwargs. ``user`` may see its status."""
+    job = Job.objects.create(name=name, kwargs=kwargs, user=user)
+    transaction.on_commit(lambda: get_runner().submit(job))
+    return job
+
+
+def claim(pk):
+    """Marks a queued job as running, False when another worker got it first."""
+    return bool(Job.objects.filter(pk=pk, status=JobStatusChoices.QUEUED).update(
+        status=JobStatusChoices.RUNNING, attempts=F('attempts') + 1, updated_at=timezone.now()))
+
+
+def claim_job():
+    """The next due job, marked as running, or None when there is none."""
+    now = timezone.now()
+    # jobs of workers that died are due again, unless that was their last attempt: a job that kills its worker
+    # (e.g. out of memory) would otherwise be run forever
+    stale = Job.objects.filter(status=JobStatusChoices.RUNNING,
+                               updated_at__lt=now - timedelta(seconds=settings.JOB_TIMEOUT_SECONDS))
+    stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status=JobStatusChoices.FAILED, error='The worker running it stopped responding', finished_at=now)
+    stale.update(status=JobStatusChoices.QUEUED, run_after=now)
+    while True:
+        due = list(Job.objects.filter(status=JobStatusChoices.QUEUED, run_after__lte=now)
+                   .order_by('run_after', 'id').values_list('pk', flat=True)[:10])
+        if not due:
+            return None
+        # a conditional UPDATE per candidate, so concurrent workers never run the same job on any database
+        for pk in due:
+            if claim(pk):
+                return Job.objects.get(pk=pk)
+
+
+def report_progress(job, result):
+    """Stores the progress of a running job as its result, which also tells claim_job() that it is alive."""
+    job.result = result
+    job.save(update_fields=['result', 'updated_at'])
+
+
+def run_job(job, retry=True):
+    """Runs a claimed job and records how it went."""
+    try:
+        result = import_string(job.name)(job, **job.kwargs)
+    except JobError as error:
+        job.status, job.error, job.result = JobStatusChoices.FAILED, str(error), error.detail
+    except Exception as error:
+        logger.exception('Job %s (%s) failed, attempt %s', job.pk, job.name, job.attempts)
+        job.error = f'{type(error).__name__}: {error}'
+        if retry and job.attempts < settings.JOB_MAX_ATTEMPTS:
+            job.status = JobStatusChoices.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=settings.JOB_RETRY_SECONDS * job.attempts)
+        else:
+            job.status = JobStatusChoices.FAILED
+    else:
+        job.status, job.result, job.error = JobStatusChoices.SUCCEEDED, result, ''
+    if job.status != JobStatusChoices.QUEUED:
+        job.finished_at = timezone.now()
+    job.save()
+    return job
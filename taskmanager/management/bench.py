@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+
+class _Rollback(Exception):
+    pass
+
+
+class RolledBackBenchCommand(BaseCommand):
+    """
+    Base of the bench_* commands, which measure as the number of rows grows to each of --sizes. Subclasses implement
+    run(sizes, options); the rows they create are rolled back at the end.
+    """
+    default_sizes = '10000,100000,1000000'
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.description = (f"{self.help} Rows are created in a transaction that is rolled back, the database is "
+                               f"left unchanged.")
+        return parser
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=self.default_sizes,
+                            help="comma-separated row counts to measure at (default: %(default)s)")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted({int(size) for size in options['sizes'].split(',')})
+        except ValueError:
+            raise CommandError(f"--sizes must be comma-separated numbers, got {options['sizes']!r}")
+        if sizes[0] < 1:
+            raise CommandError("--sizes must be positive")
+        try:
+            with transaction.atomic():
+                self.run(sizes, options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, sizes, options):
+        raise NotImplementedError
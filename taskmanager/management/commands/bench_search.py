@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.db import connections
+from django.utils import timezone
+
+from taskmanager.management.bench import RolledBackBenchCommand
+from taskmanager.models import EstimationChoices, MyUser, Project, Task, TaskStatusChoices
+from taskmanager.pagination import PageNumberPagination
+from taskmanager.search import has_fts, search_tasks, uses_fts
+
+WORDS = ('add fix update remove login logout register screen button api endpoint database migration crash bug '
+         'refactor test docs design review deploy release android ios web sync offline cache notification push '
+         'settings profile avatar photo upload search filter sort task project board kanban estimation sprint '
+         'backlog dark mode theme layout navigation drawer tab onboarding email password reset invite member '
+         'owner permission token refresh session error message toast dialog validation form input date picker '
+         'calendar reminder deadline status assignee comment attachment export import report chart statistics '
+         'performance memory leak animation splash icon font color accessibility translation polish english').split()
+
+QUERIES = ('login', 'dark mode', 'fix crash', 'notification settings', 'reminder deadl', 'kanbn', '4000',
+           'zzz unknown')
+
+
+class Command(RolledBackBenchCommand):
+    help = ("Measures /api/search/ queries of one user as the number of tasks grows: the first page of results with "
+            "their p50 and p95, and on SQLite whether the trigram index or the user's tasks were searched.")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--projects', type=int, default=2000, help="projects the tasks are spread over")
+        parser.add_argument('--member-of', default='20,200',
+                            help="comma-separated numbers of projects of the searching users (default: %(default)s)")
+        parser.add_argument('--repeat', type=int, default=20, help="runs per query")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def run(self, sizes, options):
+        random.seed(0)
+        owner = MyUser.objects.create_user(email='bench-owner@example.invalid', password=None)
+        Project.objects.bulk_create(Project(name=f'bench {i}', owner=owner) for i in range(options['projects']))
+        projects = list(Project.objects.filter(owner=owner).values_list('pk', flat=True))
+        users = []
+        for index, member_of in enumerate(int(number) for number in options['member_of'].split(',')):
+            user = MyUser.objects.create_user(email=f'bench-{index}@example.invalid', password=None)
+            Project.other_users.through.objects.bulk_create(
+                Project.other_users.through(project_id=pk, myuser_id=user.pk)
+                for pk in projects[::max(1, len(projects) // member_of)])
+            users.append(user)
+        start = timezone.now() - timedelta(days=365)
+        connection = connections[Task.objects.db]
+        page_size = PageNumberPagination.page_size
+
+        count = 0
+        for size in sizes:
+            while count < size:
+                batch = range(count, min(size, count + options['batch_size']))
+                Task.objects.bulk_create(Task(
+                    project_id=projects[i % len(projects)], created_by=owner, estimation=EstimationChoices.ONE,
+                    status=TaskStatusChoices.NOT_ASSIGNED, created_at=start + timedelta(seconds=i),
+                    name=' '.join(random.sample(WORDS, random.randint(2, 5))).capitalize() + f' {i}',
+                ) for i in batch)
+                count = batch[-1] + 1
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            for user in users:
+                visible = Task.objects.filter(project__in=Project.objects.for_user(user).values('pk')).count()
+                self.stdout.write(f'\n{size} tasks, {visible} of them in the projects of the user')
+                for query in QUERIES:
+                    timings = []
+                    for _ in range(options['repeat']):
+                        began = time.perf_counter()
+                        results = list(search_tasks(user, query)[:page_size + 1])
+                        timings.append(time.perf_counter() - began)
+                    timings.sort()
+                    p95 = timings[min(len(timings) - 1, round(len(timings) * 0.95) - 1)]
+                    way = ''
+                    if has_fts(connection):
+                        way = 'index' if uses_fts(connection, query, visible) else 'names'
+                    self.stdout.write(f'  {query:24} p50 {statistics.median(timings) * 1000:7.2f} ms  '
+                                      f'p95 {p95 * 1000:7.2f} ms  {len(results):3} results  {way}')
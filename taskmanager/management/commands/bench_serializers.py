@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from taskmanager import fast_serializers
+from taskmanager.management.bench import RolledBackBenchCommand
+from taskmanager.models import MyUser, Project, Task
+from taskmanager.serializers import ProjectSerializer, TaskSerializer
+
+
+class Command(RolledBackBenchCommand):
+    default_sizes = '10,1000,100000'
+    help = ("Compares the DRF serializers with taskmanager.fast_serializers on project and task lists, queries "
+            "included.")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--repeat', type=int, default=5, help="runs per path, the median is reported")
+        parser.add_argument('--members', type=int, default=3, help="members of every project")
+
+    def run(self, sizes, options):
+        repeat, members = options['repeat'], options['members']
+        users = MyUser.objects.bulk_create(MyUser(email=f'bench-{i}@example.invalid', name=f'user {i}',
+                                                  profession='BACKEND') for i in range(50))
+        user_ids = [user.pk for user in users]
+        Membership = Project.other_users.through
+        count = 0
+        for size in sizes:
+            projects = Project.objects.bulk_create(Project(name=f'project {i}', owner=users[i % len(users)])
+                                                   for i in range(count, size))
+            Membership.objects.bulk_create(Membership(project=project, myuser=users[(project.pk + j) % len(users)])
+                                           for project in projects for j in range(1, members + 1))
+            Task.objects.bulk_create(Task(project=projects[0] if projects else None, created_by=users[i % 7],
+                                          assigned_to=users[i % 5] if i % 3 else None, name=f'task {i}',
+                                          estimation=3, status='IN_PROGRESS') for i in range(count, size))
+            count = size
+
+            # rows of the bench's own users only; a list of every created pk would exceed SQLite's parameter limit
+            projects = Project.objects.filter(owner__in=user_ids)
+            tasks = Task.objects.filter(created_by__in=user_ids)
+            self.stdout.write(f'\n{size} rows')
+            self.compare('projects', repeat,
+                         lambda: ProjectSerializer(projects.with_members(), many=True).data,
+                         lambda: fast_serializers.serialize_projects(projects))
+            self.compare('tasks', repeat,
+                         lambda: TaskSerializer(tasks, many=True).data,
+                         lambda: fast_serializers.tasks_data(fast_serializers.task_values(tasks)))
+
+    def compare(self, name, repeat, serializer, fast):
+        results = {}
+        for label, path in (('serializer', serializer), ('fast', fast)):
+            timings = []
+            for _ in range(repeat):
+                began = time.perf_counter()
+                path()
+                timings.append(time.perf_counter() - began)
+            results[label] = statistics.median(timings)
+        self.stdout.write(f"  {name:10} serializer {results['serializer'] * 1000:10.2f} ms  "
+                          f"fast {results['fast'] * 1000:10.2f} ms  "
+                          f"x{results['serializer'] / max(results['fast'], 1e-9):.1f}")
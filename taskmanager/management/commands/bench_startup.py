@@ -0,0 +1,82 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# run in a fresh interpreter, prints the seconds each start-up phase took as JSON
+SCRIPT = """
+import json, time
+began = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+loaded = time.perf_counter()
+from taskmanager.startup import warm_up
+warm_up()
+warmed = time.perf_counter()
+print(json.dumps({{'import': imported - began, 'urlconf': loaded - imported, 'warm_up': warmed - loaded}}))
+"""
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = ("Measures the start-up of a worker in fresh interpreters: importing the WSGI module, loading the URLconf "
+            "and warming up (see gunicorn.conf.py), with the import cost per package and the slowest modules.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default=settings.WSGI_APPLICATION.rpartition('.')[0],
+                            help="module to import (default: %(default)s)")
+        parser.add_argument('--repeat', type=int, default=5, help="interpreters to start, the median is reported")
+        parser.add_argument('--top', type=int, default=20, help="number of modules and packages to list")
+        parser.add_argument('--json', action='store_true', help="print the report as JSON")
+
+    def handle(self, *args, **options):
+        phases, imports = defaultdict(list), None
+        for run in range(options['repeat']):
+            result = subprocess.run([sys.executable, '-X', 'importtime', '-c', SCRIPT.format(module=options['module'])],
+                                    capture_output=True, text=True, env=os.environ.copy(), cwd=settings.BASE_DIR)
+            if result.returncode:
+                raise CommandError(result.stderr[-2000:])
+            for phase, seconds in json.loads(result.stdout.strip().splitlines()[-1]).items():
+                phases[phase].append(seconds)
+            if imports is None:
+                # -X importtime of the first run, later ones have warm file system caches
+                imports = [match.groups() for match in map(IMPORT_TIME.match, result.stderr.splitlines()) if match]
+
+        packages, modules = defaultdict(int), []
+        for self_us, cumulative_us, indent, name in imports:
+            packages[name.partition('.')[0]] += int(self_us)
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+        report = {
+            'module': options['module'],
+            'runs': options['repeat'],
+            'phases_ms': {phase: round(statistics.median(values) * 1000, 1) for phase, values in phases.items()},
+            'imported_modules': len(modules),
+            'packages_ms': {name: round(us / 1000, 1) for name, us in
+                            sorted(packages.items(), key=lambda item: -item[1])[:options['top']]},
+            'slowest_modules': [{'module': name, 'self_ms': round(self_us / 1000, 1),
+                                 'cumulative_ms': round(cumulative_us / 1000, 1), 'depth': depth}
+                                for name, self_us, cumulative_us, depth in
+                                sorted(modules, key=lambda module: -module[1])[:options['top']]],
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"{report['module']}, median of {report['runs']} runs, {len(modules)} modules imported")
+        for phase, milliseconds in report['phases_ms'].items():
+            self.stdout.write(f"  {phase:10} {milliseconds:8.1f} ms")
+        self.stdout.write("\nimport time per package (self time of its modules, first run)")
+        for name, milliseconds in report['packages_ms'].items():
+            self.stdout.write(f"  {name:40} {milliseconds:8.1f} ms")
+        self.stdout.write("\nslowest modules (first run)")
+        for module in report['slowest_modules']:
+            self.stdout.write(f"  {module['module']:60} {module['self_ms']:8.1f} ms self "
+                              f"{module['cumulative_ms']:8.1f} ms cumulative")
@@ -0,0 +1,66 @@
+import statistics
+import time
+import tracemalloc
+
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from taskmanager.compression import brotli
+from taskmanager.management.bench import RolledBackBenchCommand
+from taskmanager.models import MyUser, Project, Task
+
+
+class Command(RolledBackBenchCommand):
+    default_sizes = '1000,10000,100000'
+    help = ("Measures /api/projects/{id}/tasks/export/ through the whole middleware stack as the number of tasks "
+            "grows, rendered as one response and streamed, per encoding: time to the first byte, total time, bytes "
+            "sent and peak memory allocated by Python.")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--repeat', type=int, default=3, help="timed runs per case, the median is reported")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="STREAMING_CHUNK_SIZE of streamed runs")
+
+    def run(self, sizes, options):
+        owner = MyUser.objects.create_user(email='bench-owner@example.invalid', password=None)
+        project = Project.objects.create(name='bench', owner=owner)
+        client = Client(headers={'Authorization': f'Token {Token.objects.create(user=owner).key}'})
+        url = f'/api/projects/{project.pk}/tasks/export/'
+        encodings = ('identity', 'gzip', 'br') if brotli is not None else ('identity', 'gzip')
+
+        count = 0
+        for size in sizes:
+            Task.objects.bulk_create(Task(project=project, created_by=owner, assigned_to=owner if i % 3 else None,
+                                          name=f'task {i}', estimation=3, status='IN_PROGRESS')
+                                     for i in range(count, size))
+            count = size
+            self.stdout.write(f'\n{size} tasks')
+            for label, chunk_size in (('one response', size + 1), ('streamed', options['chunk_size'])):
+                with override_settings(STREAMING_CHUNK_SIZE=chunk_size):
+                    for encoding in encodings:
+                        runs = [self.fetch(client, url, encoding) for _ in range(options['repeat'])]
+                        tracemalloc.start()
+                        self.fetch(client, url, encoding)
+                        peak = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                        first_byte = statistics.median(run[0] for run in runs)
+                        total = statistics.median(run[1] for run in runs)
+                        self.stdout.write(f'  {label:12} {encoding:8} first byte {first_byte * 1000:8.1f} ms  '
+                                          f'total {total * 1000:8.1f} ms  {runs[0][2]:10} bytes  '
+                                          f'peak {peak / 2 ** 20:7.1f} MiB')
+
+    @staticmethod
+    def fetch(client, url, encoding):
+        """(seconds to the first byte, seconds to the last one, bytes) of a GET of url."""
+        began = time.perf_counter()
+        response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+        assert response.status_code == 200, response.status_code
+        if not response.streaming:
+            finished = time.perf_counter()
+            return finished - began, finished - began, len(response.content)
+        chunks = iter(response.streaming_content)
+        size = len(next(chunks))
+        first_byte = time.perf_counter() - began
+        # the test client closes the response once its content is read
+        size += sum(len(chunk) for chunk in chunks)
+        return first_byte, time.perf_counter() - began, size
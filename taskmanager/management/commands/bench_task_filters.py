@@ -0,0 +1,79 @@
+import re
+import statistics
+import time
+from datetime import timedelta
+
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from taskmanager.filters import TaskFilterBackend
+from taskmanager.management.bench import RolledBackBenchCommand
+from taskmanager.models import EstimationChoices, MyUser, Project, Task, TaskStatusChoices
+from taskmanager.pagination import TaskCursorPagination
+
+# sqlite: "SEARCH taskmanager_task USING INDEX name (...)", PostgreSQL: "Index Scan using name on taskmanager_task"
+INDEX_RE = re.compile(r'USING (?:COVERING )?INDEX (\w+)|Index (?:Only )?Scan(?: Backward)? using (\w+)')
+FULL_SCAN_RE = re.compile(r'SCAN taskmanager_task(?! USING)|Seq Scan on taskmanager_task')
+
+
+class Command(RolledBackBenchCommand):
+    help = ("Measures the first page of filtered task lists of one project as it grows, and shows the index each query "
+            "uses.")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--repeat', type=int, default=5, help="runs per query, the median is reported")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def run(self, sizes, options):
+        repeat, batch_size = options['repeat'], options['batch_size']
+        users = [MyUser.objects.create_user(email=f'bench-{i}@example.invalid', password=None) for i in range(10)]
+        project = Project.objects.create(name='bench', owner=users[0])
+        start = timezone.now() - timedelta(days=365)
+        queries = {
+            'no filters': {},
+            'status': {'status': TaskStatusChoices.IN_PROGRESS},
+            'assigned_to': {'assigned_to': users[1].pk},
+            'unassigned': {'unassigned': 'true'},
+            'created_by': {'created_by': users[2].pk},
+            'estimation range': {'estimation_min': 3, 'estimation_max': 8},
+            'created range': {'created_after': (start + timedelta(days=180)).isoformat()},
+            'status, newest first': {'status': TaskStatusChoices.CLOSED, 'ordering': '-created_at'},
+            'search': {'search': 'task 42'},
+        }
+        statuses, estimations = TaskStatusChoices.values, EstimationChoices.values
+
+        count = 0
+        for size in sizes:
+            while count < size:
+                batch = range(count, min(size, count + batch_size))
+                Task.objects.bulk_create(Task(
+                    project=project, name=f'task {i}', status=statuses[i % len(statuses)],
+                    estimation=estimations[i % len(estimations)], created_by=users[i % len(users)],
+                    assigned_to=users[i % 7] if i % 7 else None,
+                    created_at=start + timedelta(seconds=i * 365 * 86400 // sizes[-1]),
+                ) for i in batch)
+                count = batch[-1] + 1
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            self.stdout.write(f'\n{size} tasks')
+            for name, params in queries.items():
+                queryset = self.page_queryset(project, params)
+                timings = []
+                for _ in range(repeat):
+                    began = time.perf_counter()
+                    list(queryset.all())
+                    timings.append(time.perf_counter() - began)
+                plan = queryset.explain()
+                index = next((a or b for a, b in INDEX_RE.findall(plan)), None)
+                scan = 'FULL SCAN' if FULL_SCAN_RE.search(plan) else index or '?'
+                self.stdout.write(f'  {name:24} {statistics.median(timings) * 1000:8.2f} ms  {scan}')
+
+    @staticmethod
+    def page_queryset(project, params):
+        request = Request(RequestFactory().get('/', params))
+        queryset = TaskFilterBackend().filter_queryset(request, Task.objects.filter(project=project), None)
+        return TaskCursorPagination().get_page_queryset(queryset, request)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from taskmanager.schema import write_schema
+
+
+class Command(BaseCommand):
+    help = ("Generates the OpenAPI document served by /swagger/?format=openapi, with a gzipped copy, so that the "
+            "view does not build it on the first requests after a deploy. Run it after every code change.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="path of the document (default: OPENAPI_SCHEMA_PATH)")
+
+    def handle(self, *args, **options):
+        path = write_schema(options['output'])
+        self.stdout.write(f"Wrote {path} and {path}.gz")
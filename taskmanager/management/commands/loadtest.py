@@ -0,0 +1,254 @@
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from taskmanager.models import MyUser
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * percent // 100) - 1)]
+
+
+def allowed_host():
+    """A host name that passes ALLOWED_HOSTS, the test client's 'testserver' usually does not."""
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+class InProcessTransport:
+    """
+    Requests go through the whole Django stack in this process; the queries of each request are counted.
+    Every client gets its own address, as virtual mobile users would, so the login throttle per address does not
+    stop them.
+    """
+
+    def __init__(self, index=0):
+        address = f'10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}'
+        self.client = Client(SERVER_NAME=allowed_host(), REMOTE_ADDR=address)
+        self.headers = {}
+
+    def request(self, method, path, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(path, data=json.dumps(data) if data else None,
+                                                            content_type='application/json', headers=self.headers)
+            # long lists are streamed, see taskmanager.streaming
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        if response.get('Content-Type') == 'application/json':
+            body = json.loads(content or b'null')
+        else:
+            body = content.decode(errors='replace')[:500]
+        return response.status_code, body, len(queries.captured_queries)
+
+
+class HttpTransport:
+    """Requests go to a running server, e.g. gunicorn in front of PostgreSQL. Queries cannot be counted."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {}
+
+    def request(self, method, path, data=None):
+        request = urllib.request.Request(self.base_url + path, method=method,
+                                         data=json.dumps(data).encode() if data else None,
+                                         headers={'Content-Type': 'application/json', **self.headers})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, json.loads(response.read() or b'null'), None
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode(errors='replace')[:500], None
+
+
+class VirtualClient:
+    """One mobile user: logs in, then opens the board, edits tasks and invites teammates until the run ends."""
+
+    def __init__(self, transport, email, password, emails, rng, record):
+        self.transport, self.email, self.password, self.emails = transport, email, password, emails
+        self.rng, self.record = rng, record
+
+    def call(self, name, method, path, data=None):
+        began = time.perf_counter()
+        try:
+            status, body, queries = self.transport.request(method, path, data)
+        except Exception as error:
+            status, body, queries = None, f'{type(error).__name__}: {error}', None
+        self.record(f'{method} {name}', time.perf_counter() - began, status, queries)
+        return status, body
+
+    def login(self):
+        status, body = self.call('/api/auth/login/', 'POST', '/api/auth/login/',
+                                 {'email': self.email, 'password': self.password})
+        if status != 200:
+            hint = ", run manage.py seed_data first" if status == 401 else ""
+            raise CommandError(f"Could not log in as {self.email}: {status} {body}{hint}")
+        self.user_id = body['id']
+        self.transport.headers['Authorization'] = f"Bearer {body['token']}"
+
+    def iteration(self):
+        status, projects = self.call('/api/projects/', 'GET', '/api/projects/')
+        if status != 200:
+            return
+        if isinstance(projects, dict):
+            # COMPACT_RESPONSES: {results, users}
+            projects = projects['results']
+        if not projects:
+            return
+        project = self.rng.choice(projects)
+        base = f"/api/projects/{project['id']}"
+        self.call('/api/projects/{id}/', 'GET', f'{base}/')
+        status, page = self.call('/api/projects/{id}/tasks/', 'GET', f'{base}/tasks/')
+        status, task = self.call('/api/projects/{id}/tasks/', 'POST', f'{base}/tasks/', {
+            'name': 'load test task', 'estimation': 3, 'status': 'NOT_ASSIGNED'})
+        if status == 201:
+            self.call('/api/projects/{id}/tasks/{id}/', 'PUT', f"{base}/tasks/{task['id']}/", {
+                'name': 'load test task', 'estimation': 5, 'status': 'IN_PROGRESS'})
+        # an id, or a nested user
+        owner = project['owner']
+        if (owner['id'] if isinstance(owner, dict) else owner) == self.user_id:
+            self.call('/api/projects/{id}/add-users-to-project/', 'POST', f'{base}/add-users-to-project/',
+                      {'emails': self.rng.sample(self.emails, min(3, len(self.emails)))})
+
+
+class Command(BaseCommand):
+    help = ("Drives the API with concurrent virtual clients logged in as users of manage.py seed_data and reports "
+            "p50/p95/p99 latency, throughput and queries per endpoint as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help="concurrent virtual clients (threads)")
+        parser.add_argument('--duration', type=float, default=30, help="seconds to run for")
+        parser.add_argument('--iterations', type=int, help="scenario runs per client, instead of --duration")
+        parser.add_argument('--base-url', help="load a running server instead of this process, e.g. "
+                                               "http://localhost:8000 (no query counts). Its login throttles "
+                                               "apply, raise LOGIN_THROTTLE_IP_RATE there for many clients")
+        parser.add_argument('--prefix', default='loadtest', help="--prefix given to seed_data")
+        parser.add_argument('--password', default='loadtest', help="--password given to seed_data")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+        parser.add_argument('--compare', help="JSON report of a previous run to compare with")
+        parser.add_argument('--max-regression', type=float,
+                            help="fail if the p95 of an endpoint grew by more percent than this over --compare")
+
+    def handle(self, *args, **options):
+        emails = list(MyUser.objects.filter(email__startswith=f"{options['prefix']}-")
+                      .order_by('id').values_list('email', flat=True))
+        if not emails:
+            raise CommandError("No seeded users, run manage.py seed_data first")
+
+        samples = defaultdict(list)
+        lock = threading.Lock()
+
+        def record(name, seconds, status, queries):
+            with lock:
+                samples[name].append((seconds, status, queries))
+
+        deadline = None if options['iterations'] else time.monotonic() + options['duration']
+        errors = []
+
+        def run(index):
+            transport = HttpTransport(options['base_url']) if options['base_url'] else InProcessTransport(index)
+            rng = random.Random(options['seed'] * 1000 + index)
+            client = VirtualClient(transport, emails[index % len(emails)], options['password'], emails, rng, record)
+            try:
+                client.login()
+                iteration = 0
+                while (iteration < options['iterations']) if deadline is None else (time.monotonic() < deadline):
+                    client.iteration()
+                    iteration += 1
+            except Exception as error:
+                errors.append(error)
+
+        def run_in_thread(index):
+            try:
+                run(index)
+            finally:
+                connection.close()
+
+        started_at, began = timezone.now(), time.perf_counter()
+        if options['clients'] == 1:
+            # in the calling thread, so that it shares its database connection (and transaction, in tests)
+            run(0)
+        else:
+            threads = [threading.Thread(target=run_in_thread, args=(index,)) for index in range(options['clients'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - began
+        if errors:
+            raise errors[0]
+
+        report = self.report(samples, elapsed, started_at, options)
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), report, options['max_regression'])
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def report(samples, elapsed, started_at, options):
+        endpoints = {}
+        for name, rows in sorted(samples.items()):
+            milliseconds = [seconds * 1000 for seconds, _, _ in rows]
+            queries = [count for _, _, count in rows if count is not None]
+            statuses = defaultdict(int)
+            for _, status, _ in rows:
+                # exceptions, e.g. "database is locked" with SQLite and concurrent writes
+                statuses[str(status) if status is not None else 'exception'] += 1
+            endpoints[name] = {
+                'requests': len(rows),
+                'errors': sum(1 for _, status, _ in rows if status is None or status >= 400),
+                'statuses': dict(sorted(statuses.items())),
+                'p50_ms': round(percentile(milliseconds, 50), 3),
+                'p95_ms': round(percentile(milliseconds, 95), 3),
+                'p99_ms': round(percentile(milliseconds, 99), 3),
+                'mean_ms': round(statistics.mean(milliseconds), 3),
+                'queries_p50': percentile(queries, 50) if queries else None,
+                'queries_max': max(queries) if queries else None,
+            }
+        requests = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'started_at': started_at.isoformat(),
+            'target': options['base_url'] or 'in-process',
+            'database': connection.vendor,
+            'clients': options['clients'],
+            'duration_s': round(elapsed, 3),
+            'requests': requests,
+            'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+            'throughput_rps': round(requests / elapsed, 2) if elapsed else None,
+            'endpoints': endpoints,
+        }
+
+    def compare(self, previous, report, max_regression):
+        regressions = []
+        self.stderr.write(f"throughput {previous['throughput_rps']} -> {report['throughput_rps']} req/s")
+        for name, endpoint in report['endpoints'].items():
+            before = previous['endpoints'].get(name)
+            if not before:
+                continue
+            change = (endpoint['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            self.stderr.write(f"{name:50} p95 {before['p95_ms']:9.2f} -> {endpoint['p95_ms']:9.2f} ms "
+                              f"({change:+.0f}%)  queries {before['queries_max']} -> {endpoint['queries_max']}")
+            if max_regression is not None and change > max_regression:
+                regressions.append(name)
+        if regressions:
+            raise CommandError(f"p95 regressed by more than {max_regression}%: {', '.join(regressions)}")
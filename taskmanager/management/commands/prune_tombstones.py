@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from taskmanager.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = "Deletes tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS. Clients with older sync tokens get a full sync."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(f"Deleted {deleted} tombstones older than {cutoff.isoformat()}")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from taskmanager.jobs import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = ("Runs queued background jobs (see taskmanager.jobs), polling for new ones. Any number of workers may "
+            "run at once.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="exit once no job is due")
+        parser.add_argument('--poll', type=float, default=1.0, help="seconds between checks of an empty queue")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll'])
+                continue
+            job = run_job(job)
+            self.stdout.write(f"Job {job.pk} ({job.name}): {job.status} after {job.attempts} attempt(s)")
@@ -0,0 +1,54 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from taskmanager.changes import batched_changes
+from taskmanager.models import EstimationChoices, MyUser, ProfessionChoices, Project, Task, TaskStatusChoices
+
+
+class Command(BaseCommand):
+    help = ("Creates synthetic users, projects and tasks for load tests (manage.py loadtest). Users are named "
+            "<prefix>-<n>@example.com and share one password.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--projects', type=int, default=20)
+        parser.add_argument('--members', type=int, default=5, help="members of every project besides its owner")
+        parser.add_argument('--tasks', type=int, default=200, help="tasks of every project")
+        parser.add_argument('--prefix', default='loadtest')
+        parser.add_argument('--password', default='loadtest')
+        parser.add_argument('--seed', type=int, default=0, help="random seed, the same seed gives the same data")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--reset', action='store_true', help="delete data seeded with the prefix before")
+
+    def handle(self, *args, **options):
+        prefix, batch_size = options['prefix'], options['batch_size']
+        rng = random.Random(options['seed'])
+        if options['reset']:
+            with transaction.atomic(), batched_changes():
+                deleted, _ = MyUser.objects.filter(email__startswith=f'{prefix}-').delete()
+            self.stdout.write(f"Deleted {deleted} rows seeded before")
+
+        # one by one through the manager, so passwords are hashed like for real sign-ups
+        users = [MyUser.objects.create_user(email=f'{prefix}-{i}@example.com', password=options['password'],
+                                            name=f'{prefix} user {i}', profession=rng.choice(ProfessionChoices.values))
+                 for i in range(options['users'])]
+        with transaction.atomic():
+            projects = Project.objects.bulk_create(
+                (Project(name=f'{prefix} project {i}', owner=rng.choice(users)) for i in range(options['projects'])),
+                batch_size=batch_size)
+            Membership = Project.other_users.through
+            Membership.objects.bulk_create(
+                (Membership(project=project, myuser=user) for project in projects
+                 for user in rng.sample([user for user in users if user != project.owner],
+                                        min(options['members'], len(users) - 1))),
+                batch_size=batch_size)
+            Task.objects.bulk_create(
+                (Task(project=project, name=f'{prefix} task {i}', created_by=project.owner,
+                      assigned_to=rng.choice([project.owner, None]), estimation=rng.choice(EstimationChoices.values),
+                      status=rng.choice(TaskStatusChoices.values)) for project in projects
+                 for i in range(options['tasks'])),
+                batch_size=batch_size)
+        self.stdout.write(f"Created {len(users)} users, {len(projects)} projects and "
+                          f"{len(projects) * options['tasks']} tasks")
@@ -0,0 +1,102 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from taskmanager.models import Project
+
+
+def _version_key(project_id):
+    return f'project-membership-version:{project_id}'
+
+
+def _member_key(project_id, user_id):
+    return f'project-membership:{project_id}:{user_id}'
+
+
+def is_project_member(request, project_id):
+    """
+    Whether ``request.user`` owns or belongs to the project.
+
+    Answers are memoized on the request, so any number of checks against the same project cost at most
+    one query per request, and shared for PROJECT_MEMBERSHIP_CACHE_TIMEOUT seconds through the cache.
+    """
+    user = request.user
+    if not user or not user.is_authenticated:
+        return False
+    try:
+        project_id = int(project_id)
+    except (TypeError, ValueError):
+        return False
+
+    memo = getattr(request, '_project_memberships', None)
+    if memo is None:
+        memo = request._project_memberships = {}
+    if project_id not in memo:
+        memo[project_id] = _resolve_membership(user, project_id)
+    return memo[project_id]
+
+
+def _resolve_membership(user, project_id):
+    version_key, member_key = _version_key(project_id), _member_key(project_id, user.pk)
+    cached = cache.get_many([version_key, member_key])
+    version = cached.get(version_key)
+    entry = cached.get(member_key)
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1]
+
+    if version is None:
+        # The version has to exist before querying, so an invalidation racing with us is never overwritten
+        cache.add(version_key, uuid4().hex, timeout=None)
+        version = cache.get(version_key)
+    is_member = Project.objects.for_user(user).filter(pk=project_id).exists()
+    cache.set(member_key, (version, is_member), timeout=settings.PROJECT_MEMBERSHIP_CACHE_TIMEOUT)
+    return is_member
+
+
+async def ais_project_member(request, project_id):
+    """is_project_member() for async views."""
+    user = request.user
+    if not user or not user.is_authenticated:
+        return False
+    try:
+        project_id = int(project_id)
+    except (TypeError, ValueError):
+        return False
+
+    memo = getattr(request, '_project_memberships', None)
+    if memo is None:
+        memo = request._project_memberships = {}
+    if project_id not in memo:
+        memo[project_id] = await _aresolve_membership(user, project_id)
+    return memo[project_id]
+
+
+async def _aresolve_membership(user, project_id):
+    version_key, member_key = _version_key(project_id), _member_key(project_id, user.pk)
+    cached = await cache.aget_many([version_key, member_key])
+    version = cached.get(version_key)
+    entry = cached.get(member_key)
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1]
+
+    if version is None:
+        await cache.aadd(version_key, uuid4().hex, timeout=None)
+        version = await cache.aget(version_key)
+    is_member = await Project.objects.for_user(user).filter(pk=project_id).aexists()
+    await cache.aset(member_key, (version, is_member), timeout=settings.PROJECT_MEMBERSHIP_CACHE_TIMEOUT)
+    return is_member
+
+
+def invalidate_project_membership(*project_ids):
+    """
+    Drops every cached membership answer of the given projects: at once, for the rest of the transaction, and again
+    once it commits, since requests that do not see the change yet may cache their answers in the meantime.
+    """
+    def invalidate():
+        cache.set_many({_version_key(project_id): uuid4().hex for project_id in project_ids}, timeout=None)
+
+    invalidate()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(invalidate)
@@ -0,0 +1,63 @@
+from django.db import migrations, models
+
+# the trigram index of task names for taskmanager.search is kept up to date by the database itself and differs per
+# database, there is no portable way to declare it on the model
+
+POSTGRESQL_FORWARDS = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # UPPER() like the SQL of icontains, pg_trgm compares case-insensitively anyway
+    'CREATE INDEX IF NOT EXISTS task_name_trgm_idx ON taskmanager_task USING gin (UPPER(name) gin_trgm_ops)',
+]
+POSTGRESQL_BACKWARDS = [
+    'DROP INDEX IF EXISTS task_name_trgm_idx',
+]
+
+SQLITE_FORWARDS = [
+    # external content table: the names are read from taskmanager_task, the table holds the index only
+    "CREATE VIRTUAL TABLE taskmanager_task_fts USING fts5("
+    "name, content='taskmanager_task', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER taskmanager_task_fts_insert AFTER INSERT ON taskmanager_task BEGIN "
+    "INSERT INTO taskmanager_task_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER taskmanager_task_fts_delete AFTER DELETE ON taskmanager_task BEGIN "
+    "INSERT INTO taskmanager_task_fts(taskmanager_task_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER taskmanager_task_fts_update AFTER UPDATE OF name ON taskmanager_task BEGIN "
+    "INSERT INTO taskmanager_task_fts(taskmanager_task_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO taskmanager_task_fts(rowid, name) VALUES (new.id, new.name); END",
+    "INSERT INTO taskmanager_task_fts(taskmanager_task_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARDS = [
+    'DROP TRIGGER IF EXISTS taskmanager_task_fts_insert',
+    'DROP TRIGGER IF EXISTS taskmanager_task_fts_delete',
+    'DROP TRIGGER IF EXISTS taskmanager_task_fts_update',
+    'DROP TABLE IF EXISTS taskmanager_task_fts',
+]
+
+
+def run(statements):
+    def migrate(apps, schema_editor):
+        connection = schema_editor.connection
+        vendor = connection.vendor
+        # the trigram tokenizer is in SQLite 3.34+, older ones search without an index
+        if vendor == 'sqlite' and connection.Database.sqlite_version_info < (3, 34):
+            return
+        for statement in statements.get(vendor, []):
+            schema_editor.execute(statement)
+    return migrate
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0009_refresh_token'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'name', 'id'], name='task_project_name_idx'),
+        ),
+        migrations.RunPython(
+            run({'postgresql': POSTGRESQL_FORWARDS, 'sqlite': SQLITE_FORWARDS}),
+            run({'postgresql': POSTGRESQL_BACKWARDS, 'sqlite': SQLITE_BACKWARDS}),
+        ),
+    ]
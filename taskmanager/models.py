@@ -1,6 +1,8 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
+from taskmanager.querysets import ProjectQuerySet
 from taskmanager.user_manager import UserManager
 
 
@@ -27,6 +29,18 @@ class TaskStatusChoices(models.TextChoices):
     CLOSED = "CLOSED"
 
 
+class TombstoneKindChoices(models.TextChoices):
+    PROJECT = "PROJECT"
+    TASK = "TASK"
+
+
+class JobStatusChoices(models.TextChoices):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+
 class MyUser(AbstractUser):
     name = models.CharField(max_length=128, default='<default_name>')
     username = None
@@ -35,12 +49,63 @@ class MyUser(AbstractUser):
     objects = UserManager()
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
+    # set on users rebuilt from access tokens (see taskmanager.authentication), whose fields may be stale copies
+    _read_only = False
+
+    def save(self, *args, **kwargs):
+        if self._read_only:
+            raise TypeError("A user rebuilt from an access token is read-only, load it from the database to save it")
+        super().save(*args, **kwargs)
 
 
 class Project(models.Model):
     name = models.CharField(max_length=128, default='<default_name>')
     owner = models.ForeignKey(MyUser, on_delete=models.CASCADE, related_name="projects_owned")
     other_users = models.ManyToManyField(MyUser, related_name='projects', blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # bumped on every change of the project, its members or its tasks; ETags are derived from it
+    version = models.PositiveBigIntegerField(default=1)
+    # set when the project is deleted, its rows are removed afterwards by a background job
+    deleted_at = models.DateTimeField(blank=True, null=True)
+    objects = ProjectQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # lets signal handlers notice an owner change without querying for the previous one
+        instance._loaded_owner_id = instance.__dict__.get('owner_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # version is only ever bumped with F('version') + 1 (see taskmanager.changes). Writing back the value loaded
+        # earlier would undo bumps made in the meantime and bring back ETags clients already hold.
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name != 'version']
+        super().save(*args, **kwargs)
+
+    def add_members_by_email(self, emails, batch_size=500):
+        """
+        Adds users with given emails to other_users using a handful of set-based queries per batch.
+        Returns lowercased emails split into added, already_members and not_found.
+        """
+        emails = list(dict.fromkeys(email.lower() for email in emails))
+        added, already_members, found = [], [], set()
+        for start in range(0, len(emails), batch_size):
+            users = dict(MyUser.objects.filter(email__in=emails[start:start + batch_size]).values_list('pk', 'email'))
+            found.update(users.values())
+            existing = set(self.other_users.through.objects.filter(project_id=self.pk, myuser_id__in=users)
+                           .values_list('myuser_id', flat=True))
+            existing.add(self.owner_id)
+            new_ids = [pk for pk in users if pk not in existing]
+            if new_ids:
+                self.other_users.add(*new_ids)
+            added.extend(users[pk] for pk in new_ids)
+            already_members.extend(users[pk] for pk in users if pk in existing)
+        not_found = [email for email in emails if email not in found]
+        return {'added': added, 'already_members': already_members, 'not_found': not_found}
 
 
 class Task(models.Model):
@@ -48,7 +113,79 @@ class Task(models.Model):
     created_by = models.ForeignKey(MyUser, on_delete=models.CASCADE, related_name="tasks_created_by")
     assigned_to = models.ForeignKey(MyUser, on_delete=models.CASCADE, related_name="tasks_assigned", blank=True,
                                     null=True)
-    created_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
     name = models.CharField(max_length=128, default='<default_name>')
     estimation = models.SmallIntegerField(choices=EstimationChoices.choices, )
     status = models.CharField(choices=TaskStatusChoices.choices, max_length=20)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of a project's tasks, see TaskCursorPagination
+            models.Index(fields=['project', 'created_at', 'id'], name='task_project_created_idx'),
+            models.Index(fields=['project', 'updated_at'], name='task_project_updated_idx'),
+            # filters of TaskFilterBackend, followed by the default ordering so a filtered page is one range scan.
+            # Estimation has a handful of values, its ranges are cheaper to check while walking the created_at index
+            models.Index(fields=['project', 'status', 'created_at', 'id'], name='task_project_status_idx'),
+            models.Index(fields=['project', 'assigned_to', 'created_at', 'id'], name='task_project_assignee_idx'),
+            models.Index(fields=['project', 'created_by', 'created_at', 'id'], name='task_project_creator_idx'),
+            # /api/me/tasks/
+            models.Index(fields=['assigned_to', 'status', 'created_at', 'id'], name='task_assignee_status_idx'),
+            # names of a project's tasks without reading the rows, for /api/search/ and ?ordering=name
+            models.Index(fields=['project', 'name', 'id'], name='task_project_name_idx'),
+        ]
+
+
+class Tombstone(models.Model):
+    """
+    Records a deletion so that /api/sync/ can tell clients to drop their copy.
+    Project tombstones are per user, as they are also left when a user loses access to a project.
+    """
+    kind = models.CharField(choices=TombstoneKindChoices.choices, max_length=20)
+    object_id = models.BigIntegerField()
+    project_id = models.BigIntegerField()
+    user = models.ForeignKey(MyUser, on_delete=models.CASCADE, related_name='+', blank=True, null=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project_id', 'deleted_at'], name='tombstone_project_idx'),
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_idx'),
+        ]
+
+
+class RefreshToken(models.Model):
+    """
+    A login on one device. Exchanged for new access tokens at /api/auth/refresh/ and deleted on logout.
+    Only the SHA-256 of the token is stored.
+    """
+    user = models.ForeignKey(MyUser, on_delete=models.CASCADE, related_name='refresh_tokens')
+    key_hash = models.CharField(max_length=64, unique=True)
+    device = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+
+class Job(models.Model):
+    """
+    Work too heavy for a request, run in the background by taskmanager.jobs. ``name`` is the dotted path of the
+    function that does it, called with ``kwargs``. ``result`` holds the progress of a running job.
+    """
+    name = models.CharField(max_length=128)
+    kwargs = models.JSONField(default=dict)
+    user = models.ForeignKey(MyUser, on_delete=models.CASCADE, related_name='+', blank=True, null=True)
+    status = models.CharField(choices=JobStatusChoices.choices, max_length=20, default=JobStatusChoices.QUEUED)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    # touched whenever a running job reports progress, jobs silent for longer than JOB_TIMEOUT_SECONDS are retried
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # the queue: due jobs in order, see taskmanager.jobs.claim_job()
+            models.Index(fields=['status', 'run_after', 'id'], name='job_queue_idx'),
+        ]
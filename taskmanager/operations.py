@@ -0,0 +1,85 @@
+"""
+Writes too heavy for a request: the purge of deleted projects, large member additions and task imports. They run
+as background jobs (see taskmanager.jobs), clients follow them at /api/jobs/{id}/.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from taskmanager.changes import (batched_changes, bump_project_versions, mark_project_deleting, notify_project,
+                                 notify_tasks, project_tombstones, record_tombstones)
+from taskmanager.jobs import JobError, enqueue, report_progress
+from taskmanager.membership import invalidate_project_membership
+from taskmanager.models import Project, Task
+from taskmanager.serializers import TaskBatchItemSerializer
+
+
+def delete_project(project, user):
+    """
+    Deletes the project for its members at once and enqueues the purge of its tasks. Returns the job.
+    Call it inside a transaction.
+    """
+    member_ids = [project.owner_id, *project.other_users.values_list('pk', flat=True)]
+    # an UPDATE, as saving would announce an 'updated' project
+    Project.objects.filter(pk=project.pk).update(deleted_at=timezone.now())
+    record_tombstones(project_tombstones(project.pk, member_ids))
+    invalidate_project_membership(project.pk)
+    notify_project(project.pk, 'deleted')
+    return enqueue('taskmanager.operations.purge_project', user=user, project_id=project.pk)
+
+
+def purge_project(job, project_id):
+    """Deletes the tasks of a deleted project, JOB_CHUNK_SIZE per transaction, then the project."""
+    deleted = (job.result or {}).get('deleted_tasks', 0)
+    tasks = Task.objects.filter(project_id=project_id)
+    while True:
+        with transaction.atomic():
+            ids = list(tasks.values_list('pk', flat=True)[:settings.JOB_CHUNK_SIZE])
+            if not ids:
+                break
+            # the project's tombstones, left by delete_project(), cover its tasks
+            mark_project_deleting(project_id)
+            try:
+                deleted += Task.objects.filter(pk__in=ids).delete()[0]
+            finally:
+                mark_project_deleting(project_id, deleting=False)
+        report_progress(job, {'deleted_tasks': deleted})
+    Project.objects.filter(pk=project_id).delete()
+    return {'deleted_tasks': deleted}
+
+
+def add_members(job, project_id, emails):
+    """Project.add_members_by_email() for lists too long for a request, with the response fields of short ones."""
+    project = Project.objects.alive().filter(pk=project_id).first()
+    if project is None:
+        raise JobError('Project not found')
+    with transaction.atomic():
+        result = project.add_members_by_email(emails, batch_size=settings.JOB_CHUNK_SIZE)
+    return {'message': f'All good {project.name}', **result}
+
+
+def import_tasks(job, project_id, tasks):
+    """
+    Creates tasks of a project from TaskBatchItemSerializer data, created by the job's user. Either every task is
+    created or, when any is invalid, none is and the errors per task index are the job's result.
+    """
+    if not Project.objects.alive().filter(pk=project_id).exists():
+        raise JobError('Project not found')
+    chunks, errors = [], {}
+    for start in range(0, len(tasks), settings.JOB_CHUNK_SIZE):
+        serializer = TaskBatchItemSerializer(data=tasks[start:start + settings.JOB_CHUNK_SIZE], many=True)
+        if serializer.is_valid():
+            chunks.append(serializer)
+        else:
+            errors.update((str(start + index), error) for index, error in enumerate(serializer.errors) if error)
+    if errors:
+        raise JobError('Invalid tasks, none was imported', {'errors': errors})
+    created = 0
+    with transaction.atomic(), batched_changes():
+        for serializer in chunks:
+            ids = [task.pk for task in serializer.save(project_id=project_id, created_by_id=job.user_id)]
+            created += len(ids)
+            # bulk_create sends no signals
+            notify_tasks(project_id, created=ids)
+        bump_project_versions([project_id])
+    return {'created': created}
@@ -0,0 +1,253 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from taskmanager.filters import get_task_filters
+
+
+class LinkedPagination(BasePagination):
+    """Pages with next and previous links, and a page_size query parameter up to max_page_size."""
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+            except (KeyError, ValueError):
+                page_size = 0
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        return self.page_size
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetPagination(LinkedPagination):
+    """
+    Keyset (seek) pagination over a unique ordering, e.g. ``('created_at', 'id')``.
+
+    Every page is fetched with ``WHERE (ordering) > (last seen values) LIMIT n``, so with a matching index
+    a deep page costs the same as the first one. The cursor is an opaque base64 token carrying the ordering
+    values of the row the page starts after.
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_page(list(self.get_page_queryset(queryset, request, view)))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """Returns the lazy, sliced queryset for the requested page. Evaluate it and pass rows to get_page()."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request, queryset.model)
+
+        ordering = self.ordering
+        if self.cursor is not None:
+            values, self.reverse = self.cursor
+            queryset = queryset.filter(self.get_seek_filter(values, self.reverse))
+        else:
+            self.reverse = False
+        if self.reverse:
+            ordering = [self._invert(field) for field in ordering]
+        # One extra row tells whether there is another page in the direction of travel
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def get_page(self, rows):
+        has_more = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        if self.reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = page
+        return page
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(self.ordering)
+
+    def get_seek_filter(self, values, reverse):
+        # (a, b) > (x, y)  <=>  a >= x AND (a > x OR (a = x AND b > y)); the leading a >= x bound lets the
+        # planner use a range scan on the index even where row-value comparison is not supported
+        conditions = Q()
+        for position, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            equal = {other.lstrip('-'): values[index] for index, other in enumerate(self.ordering[:position])}
+            conditions |= Q(**equal, **{f'{name}__{"lt" if descending else "gt"}': values[position]})
+        first = self.ordering[0]
+        bound = 'lte' if first.startswith('-') != reverse else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & conditions
+
+    def get_cursor_values(self, row):
+        # rows are model instances, or dicts when a .values() queryset is paginated
+        if isinstance(row, dict):
+            return [row[field.lstrip('-')] for field in self.ordering]
+        return [getattr(row, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, row, reverse):
+        payload = {'v': [self._json_value(value) for value in self.get_cursor_values(row)]}
+        if reverse:
+            payload['r'] = 1
+        token = b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(b64decode(encoded.encode(), validate=True).decode())
+            raw_values = payload['v']
+            if len(raw_values) != len(self.ordering):
+                raise ValueError
+            values = [model._meta.get_field(field.lstrip('-')).to_python(value)
+                      for field, value in zip(self.ordering, raw_values)]
+            if any(value is None for value in values):
+                raise ValueError
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results to return per page (max {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def _json_value(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class TaskCursorPagination(KeysetPagination):
+    ordering = ('created_at', 'id')
+    page_size = 50
+    max_page_size = 200
+    ordering_query_param = 'ordering'
+
+    def get_ordering(self, request, queryset, view):
+        # validated against TaskFilterSerializer.ORDERING_FIELDS; id keeps the ordering unique for the cursor
+        field = get_task_filters(request).get(self.ordering_query_param)
+        if not field:
+            return tuple(self.ordering)
+        return (field, '-id' if field.startswith('-') else 'id')
+
+
+class PageNumberPagination(LinkedPagination):
+    """
+    Numbered pages of an ordered queryset, for orderings a cursor cannot seek in, such as search ranks.
+
+    No count is taken: one extra row tells whether there is a next page. A deep page costs as much as all the pages
+    before it, so the number of pages is capped.
+    """
+    page_size = 20
+    max_page_size = 100
+    max_page = 50
+    page_query_param = 'page'
+    invalid_page_message = 'Invalid page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        try:
+            self.number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        if not 1 <= self.number <= self.max_page:
+            raise NotFound(self.invalid_page_message)
+        offset = (self.number - 1) * self.page_size
+        rows = list(queryset[offset:offset + self.page_size + 1])
+        self.has_next = len(rows) > self.page_size and self.number < self.max_page
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_link(self, number):
+        url = self.request.build_absolute_uri()
+        if number == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, number)
+
+    def get_next_link(self):
+        return self.get_page_link(self.number + 1) if self.has_next else None
+
+    def get_previous_link(self):
+        return self.get_page_link(self.number - 1) if self.number > 1 else None
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.page_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Page number, from 1 to {self.max_page}.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results to return per page (max {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
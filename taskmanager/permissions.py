@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from taskmanager.membership import is_project_member
+
 
 class IsProjectOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -12,5 +14,10 @@ class IsProjectOwnerOrReadOnly(permissions.BasePermission):
 
 
 class IsPartOfThisProject(permissions.BasePermission):
+    def has_permission(self, request, view):
+        # Nested routes carry the project in the url, so list and create are checked too
+        project_id = view.kwargs.get('project_pk')
+        return project_id is None or is_project_member(request, project_id)
+
     def has_object_permission(self, request, view, obj):
-        return (obj.created_by == request.user) or (request.user in obj.project.other_users.all()) or (request.user == obj.project.owner)
+        return (obj.created_by_id == request.user.id) or is_project_member(request, obj.project_id)
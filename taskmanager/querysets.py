@@ -0,0 +1,18 @@
+from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Q
+
+
+class ProjectQuerySet(models.QuerySet):
+    def alive(self):
+        # deleted projects are gone for clients at once, their rows only once taskmanager.operations purged them
+        return self.filter(deleted_at__isnull=True)
+
+    def for_user(self, user):
+        # EXISTS on the membership table instead of a JOIN, so no .distinct() is needed
+        membership = self.model.other_users.through.objects.filter(project_id=OuterRef('pk'), myuser_id=user.pk)
+        return self.alive().filter(Q(owner_id=user.pk) | Exists(membership))
+
+    def with_members(self):
+        # members in a stable order, which taskmanager.fast_serializers reproduces
+        members = self.model.other_users.field.related_model.objects.order_by('id')
+        return self.select_related('owner').prefetch_related(Prefetch('other_users', queryset=members))
@@ -0,0 +1,27 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    MessagePack, chosen with ``Accept: application/msgpack``. Smaller and cheaper to parse than JSON on the device,
+    with the same structure. Requires the ``msgpack`` package.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImproperlyConfigured("MessagePackRenderer requires the 'msgpack' package")
+        self._packb = msgpack.packb
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # dates, decimals and lazy translations are turned into the same values JSONRenderer would emit
+        return self._packb(data, default=JSONEncoder().default, use_bin_type=True)
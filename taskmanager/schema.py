@@ -0,0 +1,115 @@
+"""
+The OpenAPI document, generated once instead of on every hit of /swagger/?format=openapi.
+
+``manage.py generate_schema`` writes it at deploy time to OPENAPI_SCHEMA_PATH, next to a gzipped copy and the
+fingerprint of the code it was generated from. The schema view serves those files while the fingerprint matches
+the running code, and otherwise generates the document once per process (and code version, through the default
+cache), e.g. in development.
+"""
+import gzip
+import hashlib
+from functools import lru_cache
+from importlib import import_module
+from pathlib import Path
+
+import django
+import drf_yasg
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import get_resolver
+from django.utils.cache import patch_vary_headers
+from drf_yasg.app_settings import swagger_settings
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer
+
+from taskmanager.docs import load_overrides
+
+_documents = {}
+
+
+@lru_cache(maxsize=None)
+def code_fingerprint():
+    """Hash of the project's Python sources and of the libraries the schema is built with."""
+    base = Path(settings.BASE_DIR).resolve()
+    directories = {Path(config.path).resolve() for config in apps.get_app_configs()
+                   if base in Path(config.path).resolve().parents}
+    directories.add(Path(import_module(settings.ROOT_URLCONF).__file__).resolve().parent)
+    digest = hashlib.sha256(f'{django.__version__} {rest_framework.__version__} {drf_yasg.__version__}'.encode())
+    for path in sorted(path for directory in directories for path in directory.rglob('*.py')):
+        digest.update(str(path.relative_to(base)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:32]
+
+
+def generate_schema():
+    """The OpenAPI document as JSON. Without a request, so it has no host and clients use the one they called."""
+    # imports the views, and with them their swagger_auto_schema() overrides
+    get_resolver().url_patterns
+    load_overrides()
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(swagger_settings.DEFAULT_INFO)
+    return OpenAPICodecJson(validators=[]).encode(generator.get_schema(request=None, public=True))
+
+
+def write_schema(path=None):
+    """Writes the document, its gzipped copy and its fingerprint; returns the path of the document."""
+    path = Path(path or settings.OPENAPI_SCHEMA_PATH)
+    document = generate_schema()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(document)
+    Path(f'{path}.gz').write_bytes(gzip.compress(document, mtime=0))
+    Path(f'{path}.fingerprint').write_text(code_fingerprint())
+    return path
+
+
+def _read_artifact(fingerprint):
+    path = Path(settings.OPENAPI_SCHEMA_PATH)
+    try:
+        if Path(f'{path}.fingerprint').read_text().strip() != fingerprint:
+            return None
+        return path.read_bytes(), Path(f'{path}.gz').read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def get_schema_document():
+    """(fingerprint, JSON, gzipped JSON) of the running code."""
+    fingerprint = code_fingerprint()
+    documents = _documents.get(fingerprint)
+    if documents is None:
+        cache_key = f'openapi-schema:{fingerprint}'
+        documents = _read_artifact(fingerprint) or cache.get(cache_key)
+        if documents is None:
+            document = generate_schema()
+            documents = document, gzip.compress(document, mtime=0)
+            cache.set(cache_key, documents, None)
+        _documents[fingerprint] = documents
+    return (fingerprint, *documents)
+
+
+def with_cached_document(schema_view):
+    """Subclass of a drf_yasg schema view class whose JSON document comes from get_schema_document()."""
+
+    class CachedSchemaView(schema_view):
+        def get(self, request, version='', format=None):
+            load_overrides()
+            renderer = request.accepted_renderer
+            # the UI page needs no document, and YAML is rare enough to generate
+            if not isinstance(renderer, (OpenAPIRenderer, SwaggerJSONRenderer)):
+                return super().get(request, version, format)
+            fingerprint, document, compressed = get_schema_document()
+            etag = f'"{fingerprint}"'
+            if etag in request.headers.get('If-None-Match', ''):
+                response = HttpResponseNotModified()
+            elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+                response = HttpResponse(compressed, content_type=renderer.media_type)
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(document, content_type=renderer.media_type)
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+
+    return CachedSchemaView
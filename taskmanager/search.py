@@ -0,0 +1,106 @@
+"""
+Search of task and project names, /api/search/.
+
+Task names have a trigram index (migration 0010), kept up to date by the database itself: a GIN index with pg_trgm
+on PostgreSQL, an FTS5 table with the trigram tokenizer on SQLite. Any part of a name of at least MIN_QUERY_LENGTH
+characters matches; on PostgreSQL so do names with a word similar to the query, e.g. with a typo.
+
+Only tasks of the user's projects are searched. On PostgreSQL the planner decides between the trigram index and the
+user's tasks. SQLite keeps no statistics for FTS5 tables: search_tasks() compares the names of the user's tasks in
+task_project_name_idx, a few milliseconds per 10000 tasks. For users with more than SEARCH_INDEX_MIN_TASKS it first
+counts the matches in the FTS5 index, up to what comparing the names would cost, and uses the index when there are
+no more. Measure with ``manage.py bench_search``.
+
+A user has few projects, their names are matched without an index.
+"""
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length, Upper
+
+from taskmanager.models import Project, Task
+
+MIN_QUERY_LENGTH = 3
+MAX_INDEX_TRIGRAMS = 4
+# a task found through the FTS5 index costs about as much as comparing this many names in task_project_name_idx
+FTS_MATCH_COST = 8
+FTS_TABLE = 'taskmanager_task_fts'
+
+
+def has_fts(connection):
+    """Whether migration 0010 created the FTS5 table, the trigram tokenizer is in SQLite 3.34+."""
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 34)
+
+
+def fts_query(query):
+    """
+    FTS5 query for the names that have the trigrams of query at up to MAX_INDEX_TRIGRAMS evenly spaced positions.
+    They are a few more than the names containing query, which ranked() filters out, but FTS5 reads a list of names
+    per trigram it is asked for, so a long phrase would cost many times more to find.
+    """
+    trigrams = [query[position:position + 3] for position in range(len(query) - 2)]
+    if len(trigrams) > MAX_INDEX_TRIGRAMS:
+        step = (len(trigrams) - 1) / (MAX_INDEX_TRIGRAMS - 1)
+        trigrams = [trigrams[round(index * step)] for index in range(MAX_INDEX_TRIGRAMS)]
+    return ' AND '.join('"%s"' % trigram.replace('"', '""') for trigram in dict.fromkeys(trigrams))
+
+
+def fts_match_count(connection, query, limit):
+    """Number of tasks found for query in the FTS5 table, counted up to limit."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+                       [fts_query(query), limit])
+        return cursor.fetchone()[0]
+
+
+def ranked(queryset, query):
+    """
+    Rows of queryset whose name matches query, best first: the whole name, its start, the start of a word, anywhere
+    else (on PostgreSQL then by trigram similarity), shorter names first and newer ones first among equals.
+    """
+    connection = connections[queryset.db]
+    condition = Q(name__icontains=query)
+    ordering = ['-rank']
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        # same expression as the index and as icontains, so a single index scan serves both
+        condition |= Q(TrigramWordSimilar(Upper('name'), Value(query.upper())))
+        queryset = queryset.annotate(similarity=TrigramWordSimilarity(query, 'name'))
+        ordering.append('-similarity')
+    rank = Case(
+        When(name__iexact=query, then=Value(3)),
+        When(name__istartswith=query, then=Value(2)),
+        When(name__icontains=f' {query}', then=Value(1)),
+        default=Value(0), output_field=IntegerField(),
+    )
+    return queryset.filter(condition).annotate(rank=rank).order_by(*ordering, Length('name'), '-id')
+
+
+def uses_fts(connection, query, visible):
+    """Whether search_tasks() asks the FTS5 index for the tasks matching query of a user with visible tasks."""
+    if not has_fts(connection) or visible <= settings.SEARCH_INDEX_MIN_TASKS:
+        return False
+    budget = visible // FTS_MATCH_COST
+    return fts_match_count(connection, query, budget + 1) <= budget
+
+
+def search_tasks(user, query):
+    """Tasks of the user's projects matching query, ranked, with the name of their project as project_name."""
+    tasks = Task.objects.filter(project__in=Project.objects.for_user(user).values('pk'))
+    connection = connections[tasks.db]
+    if connection.vendor != 'postgresql':
+        matches = tasks.filter(name__icontains=query)
+        if has_fts(connection) and uses_fts(connection, query, tasks.count()):
+            matches = matches.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                                                   [fts_query(query)]))
+        # ids first: SQLite then compares the names in task_project_name_idx, when ordering it reads every row
+        tasks = Task.objects.filter(pk__in=matches.values('pk'))
+    return ranked(tasks, query).annotate(project_name=F('project__name'))
+
+
+def search_projects(user, query):
+    """The user's projects matching query, ranked."""
+    return ranked(Project.objects.for_user(user), query)
@@ -1,7 +1,68 @@
+from django.conf import settings
 from django.utils import timezone
 
 from rest_framework import serializers
-from .models import MyUser, Project, Task
+from rest_framework.permissions import SAFE_METHODS
+from .hashers import hash_password
+from .instrumentation import measure_serialization
+from .models import Job, MyUser, Project, Task, TaskStatusChoices
+from .search import MIN_QUERY_LENGTH
+
+
+def query_list(request, name):
+    """Comma-separated values of a query parameter of a read request, None when it is not given."""
+    if request is None or request.method not in SAFE_METHODS or name not in request.query_params:
+        return None
+    return {value.strip() for value in request.query_params[name].split(',') if value.strip()}
+
+
+def get_expand(request):
+    """Nested relations requested with ?expand=, None when responses keep every relation nested."""
+    expand = query_list(request, 'expand')
+    if expand is None and settings.COMPACT_RESPONSES and request is not None:
+        return set()
+    return expand
+
+
+class MeasuredMixin:
+    """Counts the representations of the serializer as serialization time, see taskmanager.instrumentation."""
+
+    @measure_serialization
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+
+class SparseFieldsMixin:
+    """``?fields=id,name`` limits the output of a GET to the listed fields. Unknown names are ignored."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # only the serializer of the response, not nested ones
+        if self.root not in (self, self.parent):
+            return fields
+        requested = query_list(self.context.get('request'), 'fields')
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested or field.write_only}
+        return fields
+
+
+class ExpandableUsersMixin:
+    """
+    In compact responses (see get_expand) the ``user_fields`` not listed in ?expand= are rendered as user ids;
+    the view side-loads the users once per response with side_loaded_users().
+    """
+    user_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = get_expand(self.context.get('request'))
+        if expand is None or self.root not in (self, self.parent):
+            return fields
+        for name in self.user_fields:
+            if name in fields and name not in expand:
+                many = isinstance(fields[name], serializers.ListSerializer)
+                fields[name] = serializers.PrimaryKeyRelatedField(many=many, read_only=True)
+        return fields
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -11,11 +72,9 @@ class RegisterSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}, "id": {"read_only": True}}
 
     def create(self, validated_data):
-        passwrd = validated_data.pop("password")
-        user = super().create(validated_data)
-        user.set_password(passwrd)
-        user.save()
-        return user
+        # hashed once, in the hashing pool, and inserted with the user
+        validated_data["password"] = hash_password(validated_data["password"])
+        return super().create(validated_data)
 
 
 class LoginSerializer(serializers.ModelSerializer):
@@ -26,7 +85,17 @@ class LoginSerializer(serializers.ModelSerializer):
                         "name": {"read_only": True}, "id": {"read_only": True}}
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh_token = serializers.CharField()
+
+
+class LogoutSerializer(serializers.Serializer):
+    all_devices = serializers.BooleanField(default=False, help_text="end the sessions of all devices of the user")
+
+
+class ProjectSerializer(MeasuredMixin, SparseFieldsMixin, ExpandableUsersMixin, serializers.ModelSerializer):
+    user_fields = ('owner', 'other_users')
+
     other_users = LoginSerializer(many=True, read_only=True)
     other_users_ids = serializers.ListField(child=serializers.PrimaryKeyRelatedField(queryset=MyUser.objects.all()), required=False, write_only=True)
     owner = LoginSerializer(read_only=True)
@@ -36,17 +105,163 @@ class ProjectSerializer(serializers.ModelSerializer):
         model = Project
         fields = ('id', 'name', 'owner', 'other_users', 'owner_id', "other_users_ids")
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # nested owner and other_users would otherwise cost two queries per project
+        return queryset.with_members()
+
     def update(self, instance, validated_data):
         other_users_data = validated_data.pop('other_users_ids', None)
         if other_users_data is not None:
             instance.other_users.set(other_users_data)
         return super().update(instance, validated_data)
 
+    @staticmethod
+    def side_loaded_users(projects, data):
+        """Users referenced by ids in the compact representation ``data`` of ``projects``, keyed by id."""
+        if isinstance(data, dict):
+            projects, data = [projects], [data]
+        user_ids = set()
+        for item in data:
+            if isinstance(item.get('owner'), int):
+                user_ids.add(item['owner'])
+            user_ids.update(pk for pk in item.get('other_users', ()) if isinstance(pk, int))
+        users = {user.pk: user for project in projects for user in (project.owner, *project.other_users.all())
+                 if user.pk in user_ids}
+        return {str(pk): LoginSerializer(user).data for pk, user in sorted(users.items())}
+
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(MeasuredMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = ('id', 'project', 'created_by', 'assigned_to', 'created_at', 'name', 'estimation', 'status')
     def create(self, validated_data):
         validated_data["created_at"] = timezone.now()
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class MyTaskSerializer(TaskSerializer):
+    project_name = serializers.CharField(read_only=True)
+
+    class Meta(TaskSerializer.Meta):
+        fields = TaskSerializer.Meta.fields + ('project_name',)
+
+
+class TaskListSerializer(MeasuredMixin, serializers.ListSerializer):
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        # assignees of all items are checked with one query instead of one per item
+        assignee_ids = {item['assigned_to_id'] for item in attrs if item.get('assigned_to_id') is not None}
+        existing = set(MyUser.objects.filter(pk__in=assignee_ids).values_list('pk', flat=True))
+        errors = [{} for _ in attrs]
+        for error, item in zip(errors, attrs):
+            assignee_id = item.get('assigned_to_id')
+            if assignee_id is not None and assignee_id not in existing:
+                error['assigned_to'] = [f'Invalid pk "{assignee_id}" - object does not exist.']
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        now = timezone.now()
+        return Task.objects.bulk_create([Task(created_at=now, **item) for item in validated_data])
+
+    def update(self, instances, validated_data):
+        now = timezone.now()
+        fields = {'updated_at'}
+        for instance, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(instance, attr, value)
+            # bulk_update() does not apply auto_now
+            instance.updated_at = now
+            fields.update(attrs)
+        if instances:
+            Task.objects.bulk_update(instances, fields)
+        return instances
+
+
+class TaskBatchItemSerializer(TaskSerializer):
+    """TaskSerializer for batches: project and creator come from the request, assignees are checked in bulk."""
+    assigned_to = serializers.IntegerField(source='assigned_to_id', allow_null=True, required=False)
+
+    class Meta(TaskSerializer.Meta):
+        read_only_fields = ('project', 'created_by', 'created_at')
+        list_serializer_class = TaskListSerializer
+
+
+class SyncQuerySerializer(serializers.Serializer):
+    since = serializers.CharField(required=False, help_text="token returned by the previous sync")
+
+
+class QueryBooleanField(serializers.BooleanField):
+    # a missing query parameter means no filter, not false
+    default_empty_html = serializers.empty
+
+
+class TaskFilterSerializer(serializers.Serializer):
+    ORDERING_FIELDS = ('created_at', 'updated_at', 'estimation', 'status', 'name')
+
+    status = serializers.MultipleChoiceField(choices=TaskStatusChoices.choices, required=False,
+                                             help_text="repeat to match any of several statuses")
+    assigned_to = serializers.IntegerField(required=False)
+    unassigned = QueryBooleanField(required=False,
+                                   help_text="true for tasks without an assignee, false for assigned ones")
+    created_by = serializers.IntegerField(required=False)
+    estimation_min = serializers.IntegerField(required=False)
+    estimation_max = serializers.IntegerField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    search = serializers.CharField(required=False, max_length=128, help_text="part of the task name")
+    ordering = serializers.ChoiceField(
+        choices=[field for name in ORDERING_FIELDS for field in (name, '-' + name)], required=False,
+        help_text="field to sort by, prefixed with - for descending order; ties are broken by id",
+    )
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=MIN_QUERY_LENGTH, max_length=128, help_text="part of the name")
+    type = serializers.ChoiceField(choices=['tasks', 'projects'], default='tasks', help_text="what to search for")
+
+
+class TaskBatchSerializer(serializers.Serializer):
+    create = serializers.ListField(child=serializers.DictField(), max_length=500, default=list)
+    update = serializers.ListField(child=serializers.DictField(), max_length=500, default=list)
+    delete = serializers.ListField(child=serializers.IntegerField(), max_length=500, default=list)
+
+    def validate_update(self, items):
+        # the ids end up in sets and in_bulk(), so they are checked before the rest of the items
+        id_field = serializers.IntegerField()
+        errors = []
+        for item in items:
+            try:
+                item['id'] = id_field.run_validation(item.get('id', serializers.empty))
+            except serializers.ValidationError as error:
+                errors.append({'id': error.detail})
+            else:
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def validate(self, attrs):
+        update_ids = [item['id'] for item in attrs['update']]
+        if len(set(update_ids)) != len(update_ids) or set(update_ids) & set(attrs['delete']):
+            raise serializers.ValidationError('Each task can be updated or deleted only once per batch')
+        return attrs
+
+
+class TaskImportSerializer(serializers.Serializer):
+    tasks = serializers.ListField(child=serializers.DictField(), min_length=1, max_length=10000,
+                                  help_text="tasks like in /batch/ creates, checked by the import job")
+
+
+class JobSerializer(MeasuredMixin, serializers.ModelSerializer):
+    kind = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'status', 'result', 'error', 'attempts', 'created_at', 'finished_at')
+
+    def get_kind(self, job) -> str:
+        # the name of the job's function, without the module
+        return job.name.rpartition('.')[2]
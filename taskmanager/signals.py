@@ -0,0 +1,115 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.db.models import Q
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from taskmanager.authentication import invalidate_token, invalidate_user_tokens
+
+from taskmanager.changes import (bump_project_versions, is_project_being_deleted, mark_project_deleting,
+                                 notify_project, notify_tasks, project_tombstones, record_tombstones, task_tombstone,
+                                 touch_projects)
+from taskmanager.instrumentation import query_timer
+from taskmanager.membership import invalidate_project_membership
+from taskmanager.models import MyUser, Project, RefreshToken, Task
+
+# fields of a user that project responses show
+PROFILE_FIELDS = {'email', 'name', 'profession'}
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    # the owner might have changed
+    invalidate_project_membership(instance.pk)
+    bump_project_versions([instance.pk])
+    if not created:
+        notify_project(instance.pk, 'updated')
+    previous_owner_id = getattr(instance, '_loaded_owner_id', None)
+    if previous_owner_id and previous_owner_id != instance.owner_id:
+        if not instance.other_users.filter(pk=previous_owner_id).exists():
+            record_tombstones(project_tombstones(instance.pk, [previous_owner_id]))
+    instance._loaded_owner_id = instance.owner_id
+
+
+@receiver(pre_delete, sender=Project)
+def project_deleting(sender, instance, **kwargs):
+    mark_project_deleting(instance.pk)
+    if instance.deleted_at is not None:
+        # purged after taskmanager.operations.delete_project(), which did the bookkeeping
+        return
+    member_ids = [instance.owner_id, *instance.other_users.values_list('pk', flat=True)]
+    record_tombstones(project_tombstones(instance.pk, member_ids))
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    mark_project_deleting(instance.pk, deleting=False)
+    if instance.deleted_at is None:
+        invalidate_project_membership(instance.pk)
+        notify_project(instance.pk, 'deleted')
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, **kwargs):
+    bump_project_versions([instance.project_id])
+    notify_tasks(instance.project_id, **{'created' if created else 'updated': [instance.pk]})
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    if not is_project_being_deleted(instance.project_id):
+        record_tombstones([task_tombstone(instance)])
+        bump_project_versions([instance.project_id])
+        notify_tasks(instance.project_id, deleted=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Project.other_users.through)
+def project_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # forward: project.other_users.x(users), reverse: user.projects.x(projects); pk_set holds the other side
+    if action == 'pre_clear':
+        related = instance.projects if reverse else instance.other_users
+        instance._cleared_pks = set(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_pks', set())
+    elif action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    project_ids = pk_set if reverse else {instance.pk}
+    invalidate_project_membership(*project_ids)
+    touch_projects(project_ids)
+    for project_id in project_ids:
+        notify_project(project_id, 'members')
+    if action != 'post_add':
+        if reverse:
+            record_tombstones([tombstone for project_id in pk_set
+                               for tombstone in project_tombstones(project_id, [instance.pk])])
+        else:
+            record_tombstones(project_tombstones(instance.pk, pk_set - {instance.owner_id}))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # logout, or the user was deleted
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=MyUser)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    # e.g. deactivation, cached users must not outlive it
+    if not created:
+        invalidate_user_tokens(instance)
+        if not instance.is_active:
+            # access tokens run out within ACCESS_TOKEN_LIFETIME
+            RefreshToken.objects.filter(user=instance).delete()
+        if update_fields is None or set(update_fields) & PROFILE_FIELDS:
+            # projects nest their owner and members, their ETags and /api/sync/ have to see the change
+            touch_projects(set(Project.objects.filter(Q(owner=instance) | Q(other_users=instance))
+                               .values_list('pk', flat=True)))
+
+
+@receiver(connection_created)
+def connection_created_handler(sender, connection, **kwargs):
+    # fired again on reconnects of the same wrapper
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
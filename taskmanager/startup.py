@@ -0,0 +1,44 @@
+"""
+Worker start-up: deferred imports and warming up, see gunicorn.conf.py and manage.py bench_startup.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.db import connections
+from django.urls import get_resolver, resolve
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+
+
+def lazy_view(dotted_path):
+    """A view that imports the view at ``dotted_path`` on its first request, e.g. the docs, which few requests need."""
+    view = None
+
+    def lazy(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path)
+        return view(request, *args, **kwargs)
+    return lazy
+
+
+def warm_up():
+    """
+    Does what the first requests of a worker would: loads the URLconf with the views and serializers, the DRF classes
+    of the settings and the password hashers, and connects to the databases once to load their backends. The
+    connections are closed again, as they must not be shared with forked workers.
+    """
+    get_resolver().url_patterns
+    resolve('/api/projects/')
+    for name in ('DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES',
+                 'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_CONTENT_NEGOTIATION_CLASS'):
+        getattr(api_settings, name)
+    get_hashers()
+    for alias in settings.DATABASES:
+        connections[alias].ensure_connection()
+    connections.close_all()
+
+
+def connect():
+    """Opens the default connection of a new worker ahead of its first request, if connections are kept."""
+    if settings.DATABASES['default'].get('CONN_MAX_AGE'):
+        connections['default'].ensure_connection()
@@ -0,0 +1,67 @@
+"""
+Story-point summaries of a project for the dashboard, computed by the database in one grouped query.
+
+Results are cached under the project version, which every task write and every change of the members (or of their
+names and professions) bumps, so a cached summary is never stale and old ones simply expire.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from taskmanager.models import ProfessionChoices, Task, TaskStatusChoices
+
+
+def _totals(tasks=0, points=0):
+    return {'tasks': tasks, 'points': points}
+
+
+def compute_project_stats(project_id):
+    rows = (Task.objects.filter(project_id=project_id)
+            .values('status', 'assigned_to', 'assigned_to__email', 'assigned_to__name', 'assigned_to__profession')
+            .annotate(tasks=Count('id'), points=Sum('estimation'))
+            .order_by())
+
+    stats = {
+        **_totals(),
+        'by_status': {status: _totals() for status in TaskStatusChoices.values},
+        'by_profession': {profession: _totals() for profession in ProfessionChoices.values},
+        'by_member': {},
+        'unassigned': _totals(),
+    }
+    for row in rows:
+        tasks, points = row['tasks'], row['points'] or 0
+        buckets = [stats, stats['by_status'][row['status']]]
+        if row['assigned_to'] is None:
+            buckets.append(stats['unassigned'])
+        else:
+            member = stats['by_member'].get(row['assigned_to'])
+            if member is None:
+                member = stats['by_member'][row['assigned_to']] = {
+                    'user': {'id': row['assigned_to'], 'email': row['assigned_to__email'],
+                             'name': row['assigned_to__name'], 'profession': row['assigned_to__profession']},
+                    **_totals(), 'open_tasks': 0, 'open_points': 0,
+                }
+            buckets.append(member)
+            if row['status'] != TaskStatusChoices.CLOSED:
+                member['open_tasks'] += tasks
+                member['open_points'] += points
+            if row['assigned_to__profession'] in stats['by_profession']:
+                buckets.append(stats['by_profession'][row['assigned_to__profession']])
+        for bucket in buckets:
+            bucket['tasks'] += tasks
+            bucket['points'] += points
+
+    stats['by_status'] = [{'status': status, **totals} for status, totals in stats['by_status'].items()]
+    stats['by_profession'] = [{'profession': profession, **totals}
+                              for profession, totals in stats['by_profession'].items()]
+    stats['by_member'] = sorted(stats['by_member'].values(), key=lambda member: member['user']['id'])
+    return stats
+
+
+def get_project_stats(project_id, version):
+    key = f'project-stats:{project_id}:{version}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_project_stats(project_id)
+        cache.set(key, stats, timeout=settings.PROJECT_STATS_CACHE_TIMEOUT)
+    return stats
@@ -0,0 +1,56 @@
+"""
+JSON lists streamed chunk by chunk, for responses too long to build in memory.
+
+stream_list() reads the rows of a queryset STREAMING_CHUNK_SIZE at a time (a server-side cursor on PostgreSQL) and
+renders each chunk as soon as it is read, so a worker holds one chunk whatever the length of the list and the client
+gets the first rows while the rest is read. A list that fits in one chunk, the common case, is an ordinary Response
+with a Content-Length, as are responses of other renderers. Compression is up to taskmanager.compression.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+def stream_list(request, queryset, to_data):
+    """
+    Response with the JSON array of ``to_data(rows)`` of every chunk of rows of queryset. to_data gets a list of
+    rows and returns a list of JSON-serializable items.
+    """
+    chunk_size = settings.STREAMING_CHUNK_SIZE
+    # the database is picked now, ReplicaReadsMixin forgets the replica before the response is sent
+    rows = queryset.using(queryset.db).iterator(chunk_size=chunk_size)
+    first = list(islice(rows, chunk_size))
+    if len(first) < chunk_size or not isinstance(request.accepted_renderer, JSONRenderer):
+        return Response(to_data(first + list(rows)))
+    content = _json_array(first, rows, to_data, chunk_size)
+    if isinstance(request._request, ASGIRequest):
+        # a sync iterator would be read to the end before anything is sent
+        content = _aiterate(content)
+    return StreamingHttpResponse(content, content_type=JSONRenderer.media_type)
+
+
+def _json_array(first, rows, to_data, chunk_size):
+    # first holds a whole chunk
+    renderer = JSONRenderer()
+    chunk, separator = first, b'['
+    while chunk:
+        # the items of the rendered list, without its brackets
+        yield separator + renderer.render(to_data(chunk))[1:-1]
+        separator = b','
+        chunk = list(islice(rows, chunk_size))
+    yield b']'
+
+
+async def _aiterate(iterator):
+    # in the thread the view ran in, which owns the database cursor
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await step(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
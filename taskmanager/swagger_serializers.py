@@ -1,14 +1,18 @@
 from rest_framework import serializers
 
-from taskmanager.models import MyUser, Project
+from taskmanager.models import MyUser, ProfessionChoices, Project, TaskStatusChoices
+from taskmanager.serializers import TaskSerializer
 
 
 class AuthResponseSerializer(serializers.ModelSerializer):
-    token = serializers.CharField()
+    token = serializers.CharField(help_text="access token, sent as 'Authorization: Bearer <token>'")
+    token_type = serializers.CharField()
+    expires_in = serializers.IntegerField(help_text="seconds the access token is valid for")
+    refresh_token = serializers.CharField()
 
     class Meta:
         model = MyUser
-        fields = ('token', 'email', 'profession', 'id', 'name')
+        fields = ('token', 'token_type', 'expires_in', 'refresh_token', 'email', 'profession', 'id', 'name')
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -40,4 +44,56 @@ from rest_framework import serializers
 
 
 class EmailsSerializer(serializers.Serializer):
-    emails = serializers.ListField(child=serializers.EmailField())
+    emails = serializers.ListField(child=serializers.EmailField(), max_length=10000)
+
+
+class AddUsersResponseSerializer(serializers.Serializer):
+    message = serializers.CharField()
+    added = serializers.ListField(child=serializers.EmailField())
+    already_members = serializers.ListField(child=serializers.EmailField())
+    not_found = serializers.ListField(child=serializers.EmailField())
+
+
+class TaskBatchResponseSerializer(serializers.Serializer):
+    created = TaskSerializer(many=True)
+    updated = TaskSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.IntegerField())
+
+
+class DeletedIdsSerializer(serializers.Serializer):
+    projects = serializers.ListField(child=serializers.IntegerField())
+    tasks = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncResponseSerializer(serializers.Serializer):
+    token = serializers.CharField()
+    full = serializers.BooleanField()
+    projects = ProjectResponseSerializer(many=True)
+    tasks = TaskSerializer(many=True)
+    deleted = DeletedIdsSerializer()
+
+
+class StatsTotalsSerializer(serializers.Serializer):
+    tasks = serializers.IntegerField()
+    points = serializers.IntegerField()
+
+
+class StatusStatsSerializer(StatsTotalsSerializer):
+    status = serializers.ChoiceField(choices=TaskStatusChoices.choices)
+
+
+class ProfessionStatsSerializer(StatsTotalsSerializer):
+    profession = serializers.ChoiceField(choices=ProfessionChoices.choices)
+
+
+class MemberStatsSerializer(StatsTotalsSerializer):
+    user = UserSerializer()
+    open_tasks = serializers.IntegerField()
+    open_points = serializers.IntegerField()
+
+
+class ProjectStatsSerializer(StatsTotalsSerializer):
+    by_status = StatusStatsSerializer(many=True)
+    by_profession = ProfessionStatsSerializer(many=True)
+    by_member = MemberStatsSerializer(many=True)
+    unassigned = StatsTotalsSerializer()
@@ -1,3 +1,1566 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib.util
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core import signing
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from rest_framework.throttling import SimpleRateThrottle
+
+from . import compression, fast_serializers, schema
+from .authentication import AccessTokenAuthentication
+from .compression import preferred_encoding
+from .db_routers import ReplicaRouter
+from .events import InMemoryBroker, get_broker, project_channel
+from .hashers import HashingPool
+from .instrumentation import metrics
+from .jobs import ImmediateRunner, claim_job, enqueue
+from .models import Job, MyUser, Project, Task, Tombstone
+from .pagination import TaskCursorPagination
+from .search import has_fts
+from .serializers import ProjectSerializer, TaskSerializer
+from .startup import lazy_view
+from .views import SyncViewSet
+
+
+class TaskmanagerTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # sqlite reuses ids between tests, cached answers must not leak from one test to another
+        for cache in caches.all():
+            cache.clear()
+
+
+class QueryCountTestMixin:
+    def count_queries(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, response.content)
+        return len(ctx.captured_queries)
+
+    def assertQueriesDoNotScale(self, url, add_rows, method='get', **kwargs):
+        """Request ``url``, add more rows with ``add_rows()`` and request again; query count must stay the same."""
+        self.count_queries(method, url, **kwargs)  # warm up caches
+        before = self.count_queries(method, url, **kwargs)
+        add_rows()
+        after = self.count_queries(method, url, **kwargs)
+        self.assertEqual(before, after, f"{url} query count grew from {before} to {after} with more rows")
+
+
+class ProjectQueriesTests(QueryCountTestMixin, TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = MyUser.objects.create_user(email='owner@example.com', password='pass', name='Owner')
+        self.others = [MyUser.objects.create_user(email=f'user{i}@example.com', password='pass') for i in range(3)]
+        self.client.force_authenticate(self.user)
+        self.add_projects(1)
+
+    def add_projects(self, count):
+        for i in range(count):
+            project = Project.objects.create(name=f'project {i}', owner=self.user)
+            project.other_users.add(*self.others)
+            shared = Project.objects.create(name=f'shared {i}', owner=self.others[0])
+            shared.other_users.add(self.user, self.others[1])
+
+    def test_list_query_count_is_constant(self):
+        self.assertQueriesDoNotScale('/api/projects/', lambda: self.add_projects(10))
+
+    def test_list_returns_each_project_once(self):
+        response = self.client.get('/api/projects/')
+        ids = [project['id'] for project in response.data]
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_retrieve_query_count_is_constant(self):
+        project = Project.objects.filter(owner=self.user).first()
+        more_users = lambda: project.other_users.add(
+            *[MyUser.objects.create_user(email=f'more{i}@example.com') for i in range(10)])
+        self.assertQueriesDoNotScale(f'/api/projects/{project.id}/', more_users)
+
+    def test_outsider_does_not_see_projects(self):
+        outsider = MyUser.objects.create_user(email='outsider@example.com', password='pass')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get('/api/projects/').data, [])
+
+
+class TaskQueriesTests(QueryCountTestMixin, TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.user)
+        self.client.force_authenticate(self.user)
+
+    def add_tasks(self, count):
+        Task.objects.bulk_create(
+            Task(project=self.project, created_by=self.user, assigned_to=self.user, created_at=timezone.now(),
+                 name=f'task {i}', estimation=1, status='NOT_ASSIGNED') for i in range(count))
+
+    def test_list_query_count_is_constant(self):
+        self.add_tasks(1)
+        self.assertQueriesDoNotScale(f'/api/projects/{self.project.id}/tasks/', lambda: self.add_tasks(20))
+
+
+class TaskPaginationTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.user)
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        # several tasks share a timestamp, so the id tiebreaker matters
+        Task.objects.bulk_create(
+            Task(project=self.project, created_by=self.user, created_at=now + timezone.timedelta(seconds=i // 3),
+                 name=f'task {i}', estimation=1, status='NOT_ASSIGNED') for i in range(25))
+        self.url = f'/api/projects/{self.project.id}/tasks/'
+        self.expected = list(Task.objects.order_by('created_at', 'id').values_list('id', flat=True))
+
+    def walk(self, url, key):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(task['id'] for task in response.data['results'])
+            url, pages = response.data[key], pages + 1
+        return ids, pages
+
+    def test_forward_pages_cover_every_task_once(self):
+        ids, pages = self.walk(self.url + '?page_size=4', 'next')
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(pages, 7)
+
+    def test_previous_links_walk_back(self):
+        last_page = self.url + '?page_size=4'
+        response = self.client.get(last_page)
+        while response.data['next']:
+            last_page = response.data['next']
+            response = self.client.get(last_page)
+        ids = [task['id'] for task in response.data['results']]
+        previous, _ = self.walk(response.data['previous'], 'previous')
+        self.assertEqual(sorted(previous + ids), self.expected)
+
+    def test_page_size_is_capped(self):
+        Task.objects.bulk_create(
+            Task(project=self.project, created_by=self.user, created_at=timezone.now(), name='more', estimation=1,
+                 status='NOT_ASSIGNED') for _ in range(300))
+        response = self.client.get(self.url + '?page_size=100000')
+        self.assertEqual(len(response.data['results']), TaskCursorPagination.max_page_size)
+
+    def test_deep_page_uses_seek_not_offset(self):
+        response = self.client.get(self.url + '?page_size=4')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(response.data['next'])
+        task_queries = [query['sql'] for query in ctx.captured_queries if 'taskmanager_task' in query['sql']]
+        self.assertTrue(task_queries)
+        self.assertFalse(any('OFFSET' in sql.upper() for sql in task_queries))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url + '?cursor=garbage').status_code, 404)
+
+
+class TaskFilterTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.other = MyUser.objects.create_user(email='other@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.user)
+        self.client.force_authenticate(self.user)
+        self.start = timezone.now()
+        statuses = ['NOT_ASSIGNED', 'IN_PROGRESS', 'CLOSED']
+        Task.objects.bulk_create(Task(
+            project=self.project, created_by=self.user if i % 2 else self.other, name=f'task {i}',
+            assigned_to=self.other if i % 3 == 0 else None, estimation=[1, 2, 3, 5, 8][i % 5],
+            status=statuses[i % 3], created_at=self.start + timezone.timedelta(minutes=i),
+        ) for i in range(20))
+        self.url = f'/api/projects/{self.project.id}/tasks/'
+
+    def names(self, params):
+        response = self.client.get(self.url, {'page_size': 200, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [task['name'] for task in response.data['results']]
+
+    def expected(self, **lookups):
+        return list(Task.objects.filter(**lookups).order_by('created_at', 'id').values_list('name', flat=True))
+
+    def test_filters(self):
+        self.assertEqual(self.names({'status': ['IN_PROGRESS', 'CLOSED']}),
+                         self.expected(status__in=['IN_PROGRESS', 'CLOSED']))
+        self.assertEqual(self.names({'assigned_to': self.other.id}), self.expected(assigned_to=self.other))
+        self.assertEqual(self.names({'unassigned': 'true'}), self.expected(assigned_to=None))
+        self.assertEqual(self.names({'created_by': self.user.id, 'status': 'CLOSED'}),
+                         self.expected(created_by=self.user, status='CLOSED'))
+        self.assertEqual(self.names({'estimation_min': 2, 'estimation_max': 5}),
+                         self.expected(estimation__range=(2, 5)))
+        after, before = self.start + timezone.timedelta(minutes=5), self.start + timezone.timedelta(minutes=10)
+        self.assertEqual(self.names({'created_after': after.isoformat(), 'created_before': before.isoformat()}),
+                         self.expected(created_at__gte=after, created_at__lt=before))
+        self.assertEqual(self.names({'search': 'TASK 1'}), self.expected(name__icontains='task 1'))
+        self.assertEqual(len(self.names({})), 20)
+
+    def test_ordering_is_paginated(self):
+        url, names = self.url + '?ordering=-estimation&page_size=3', []
+        while url:
+            response = self.client.get(url)
+            names.extend(task['name'] for task in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(names, list(Task.objects.order_by('-estimation', '-id').values_list('name', flat=True)))
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'status': 'DONE'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ordering': 'password'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'created_after': 'yesterday'}).status_code, 400)
+
+    def test_filtered_list_has_its_own_etag(self):
+        self.assertNotEqual(self.client.get(self.url, {'status': 'CLOSED'})['ETag'], self.client.get(self.url)['ETag'])
+
+
+class ProjectMembershipTests(QueryCountTestMixin, TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.member = MyUser.objects.create_user(email='member@example.com', password='pass')
+        self.outsider = MyUser.objects.create_user(email='outsider@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        self.project.other_users.add(self.member)
+        self.task = Task.objects.create(project=self.project, created_by=self.owner, created_at=timezone.now(),
+                                        name='task', estimation=1, status='NOT_ASSIGNED')
+        self.url = f'/api/projects/{self.project.id}/tasks/'
+
+    def test_outsider_cannot_list_or_create(self):
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        response = self.client.post(self.url, {'name': 'x', 'estimation': 1, 'status': 'NOT_ASSIGNED'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(f'{self.url}{self.task.id}/').status_code, 403)
+
+    def test_member_can_list_and_retrieve(self):
+        self.client.force_authenticate(self.member)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(f'{self.url}{self.task.id}/').status_code, 200)
+
+    def test_membership_is_resolved_once_and_then_cached(self):
+        self.client.force_authenticate(self.member)
+        first = self.count_queries('get', f'{self.url}{self.task.id}/')
+        second = self.count_queries('get', f'{self.url}{self.task.id}/')
+        self.assertEqual(first - second, 1)
+
+    def test_cache_is_invalidated_on_membership_changes(self):
+        self.client.force_authenticate(self.member)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.project.other_users.remove(self.member)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.member.projects.add(self.project)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.member.projects.clear()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.other_users.add(self.member)
+            # a request that does not see the uncommitted member yet caches its answer
+            with mock.patch('taskmanager.membership.Project.objects.for_user', return_value=Project.objects.none()):
+                self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_cache_is_invalidated_on_owner_change(self):
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.project.owner = self.outsider
+        self.project.save()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+class AddUsersToProjectTests(QueryCountTestMixin, TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.member = MyUser.objects.create_user(email='member@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        self.project.other_users.add(self.member)
+        self.url = f'/api/projects/{self.project.id}/add-users-to-project/'
+        self.client.force_authenticate(self.owner)
+
+    def test_reports_added_existing_and_missing(self):
+        new = MyUser.objects.create_user(email='new@example.com', password='pass')
+        response = self.client.post(self.url, {'emails': ['NEW@example.com', 'member@example.com', 'owner@example.com',
+                                                         'ghost@example.com', 'new@example.com']}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['added'], ['new@example.com'])
+        self.assertCountEqual(response.data['already_members'], ['member@example.com', 'owner@example.com'])
+        self.assertEqual(response.data['not_found'], ['ghost@example.com'])
+        self.assertCountEqual(self.project.other_users.all(), [self.member, new])
+
+    def test_invalid_body(self):
+        self.assertEqual(self.client.post(self.url, {'emails': ['not an email']}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 400)
+
+    def test_only_owner_can_add(self):
+        self.client.force_authenticate(self.member)
+        self.assertEqual(self.client.post(self.url, {'emails': []}, format='json').status_code, 403)
+
+    def test_query_count_does_not_grow_with_emails(self):
+        MyUser.objects.bulk_create(MyUser(email=f'bulk{i}@example.com') for i in range(50))
+        emails = [f'bulk{i}@example.com' for i in range(50)]
+        few = self.count_queries('post', self.url, data={'emails': emails[:2]}, format='json')
+        many = self.count_queries('post', self.url, data={'emails': emails[2:]}, format='json')
+        self.assertEqual(few, many)
+        self.assertEqual(self.project.other_users.count(), 51)
+
+
+class TaskBatchTests(QueryCountTestMixin, TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.member = MyUser.objects.create_user(email='member@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        self.project.other_users.add(self.member)
+        self.other_project = Project.objects.create(name='other', owner=self.owner)
+        self.tasks = Task.objects.bulk_create(
+            Task(project=self.project, created_by=self.owner, created_at=timezone.now(), name=f'task {i}',
+                 estimation=1, status='NOT_ASSIGNED') for i in range(4))
+        self.foreign_task = Task.objects.create(project=self.other_project, created_by=self.owner, estimation=1,
+                                                created_at=timezone.now(), status='NOT_ASSIGNED')
+        self.url = f'/api/projects/{self.project.id}/tasks/batch/'
+        self.client.force_authenticate(self.member)
+
+    def batch(self, count):
+        return {
+            'create': [{'name': f'new {i}', 'estimation': 3, 'status': 'NOT_ASSIGNED', 'assigned_to': self.owner.id}
+                       for i in range(count)],
+            'update': [{'id': self.tasks[0].id, 'status': 'IN_PROGRESS', 'assigned_to': self.member.id}],
+            'delete': [self.tasks[1].id],
+        }
+
+    def test_applies_creates_updates_and_deletes(self):
+        response = self.client.post(self.url, self.batch(2), format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([task['name'] for task in response.data['created']], ['new 0', 'new 1'])
+        self.assertTrue(all(task['created_by'] == self.member.id and task['project'] == self.project.id
+                            for task in response.data['created']))
+        self.assertEqual(response.data['updated'][0]['status'], 'IN_PROGRESS')
+        self.assertEqual(response.data['deleted'], [self.tasks[1].id])
+        updated = Task.objects.get(pk=self.tasks[0].id)
+        self.assertEqual((updated.status, updated.assigned_to, updated.created_by, updated.name),
+                         ('IN_PROGRESS', self.member, self.owner, 'task 0'))
+        self.assertFalse(Task.objects.filter(pk=self.tasks[1].id).exists())
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 5)
+
+    def test_invalid_item_rejects_whole_batch(self):
+        batch = self.batch(2)
+        batch['create'][1]['estimation'] = 4
+        batch['update'].append({'id': self.foreign_task.id, 'name': 'stolen'})
+        batch['delete'].append(987654)
+        response = self.client.post(self.url, batch, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['create'][0], {})
+        self.assertIn('estimation', response.data['create'][1])
+        self.assertEqual(response.data['update'][0], {})
+        self.assertIn('id', response.data['update'][1])
+        self.assertIn('id', response.data['delete'][1])
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 4)
+        self.assertEqual(Task.objects.get(pk=self.tasks[0].id).status, 'NOT_ASSIGNED')
+
+    def test_malformed_update_ids(self):
+        batch = self.batch(1)
+        batch['update'] += [{'id': [self.tasks[2].id]}, {'id': 'abc'}, {'name': 'no id'}, {'id': str(self.tasks[3].id)}]
+        response = self.client.post(self.url, batch, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([set(item) for item in response.data['update']], [set(), {'id'}, {'id'}, {'id'}, set()])
+        self.assertEqual(response.data['update'][3]['id'][0].code, 'required')
+        # numeric strings are ids like in the other fields
+        batch['update'][1:4] = []
+        batch['update'][1]['name'] = 'renamed'
+        self.assertEqual(self.client.post(self.url, batch, format='json').status_code, 200)
+        self.assertEqual(Task.objects.get(pk=self.tasks[3].id).name, 'renamed')
+
+    def test_unknown_assignee(self):
+        batch = self.batch(1)
+        batch['create'][0]['assigned_to'] = 987654
+        response = self.client.post(self.url, batch, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('assigned_to', response.data['create'][0])
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        self.count_queries('post', self.url, data={}, format='json')  # warm up caches
+        few = self.count_queries('post', self.url, data=self.batch(1), format='json')
+        self.tasks[1] = Task.objects.create(project=self.project, created_by=self.owner, estimation=1,
+                                            created_at=timezone.now(), status='NOT_ASSIGNED')
+        many = self.count_queries('post', self.url, data=self.batch(50), format='json')
+        self.assertEqual(few, many)
+
+    def test_outsider_is_forbidden(self):
+        self.client.force_authenticate(MyUser.objects.create_user(email='outsider@example.com', password='pass'))
+        self.assertEqual(self.client.post(self.url, self.batch(1), format='json').status_code, 403)
+
+
+class ProjectStatsTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass', profession='BACKEND')
+        self.member = MyUser.objects.create_user(email='member@example.com', password='pass', profession='DEVOPS')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        self.project.other_users.add(self.member)
+        Task.objects.bulk_create([
+            Task(project=self.project, created_by=self.owner, assigned_to=self.owner, estimation=3, status='CLOSED'),
+            Task(project=self.project, created_by=self.owner, assigned_to=self.owner, estimation=5,
+                 status='IN_PROGRESS'),
+            Task(project=self.project, created_by=self.owner, assigned_to=self.member, estimation=8,
+                 status='IN_PROGRESS'),
+            Task(project=self.project, created_by=self.owner, estimation=2, status='NOT_ASSIGNED'),
+        ])
+        self.client.force_authenticate(self.member)
+        self.url = f'/api/projects/{self.project.id}/stats/'
+
+    def test_totals(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual((data['tasks'], data['points']), (4, 18))
+        self.assertEqual(data['by_status'], [
+            {'status': 'NOT_ASSIGNED', 'tasks': 1, 'points': 2},
+            {'status': 'IN_PROGRESS', 'tasks': 2, 'points': 13},
+            {'status': 'CLOSED', 'tasks': 1, 'points': 3},
+        ])
+        self.assertEqual([(member['user']['email'], member['tasks'], member['points'], member['open_points'])
+                          for member in data['by_member']],
+                         [('owner@example.com', 2, 8, 5), ('member@example.com', 1, 8, 8)])
+        by_profession = {row['profession']: row['points'] for row in data['by_profession']}
+        self.assertEqual(by_profession, {'FRONTEND': 0, 'BACKEND': 8, 'DEVOPS': 8, 'UX/UI': 0})
+        self.assertEqual(data['unassigned'], {'tasks': 1, 'points': 2})
+
+    def test_one_grouped_query_then_cached(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertEqual(len([query for query in ctx.captured_queries if 'taskmanager_task' in query['sql']]), 1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertFalse([query for query in ctx.captured_queries if 'taskmanager_task' in query['sql']])
+
+    def test_task_writes_invalidate(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        task = Task.objects.filter(assigned_to=self.member).get()
+        self.client.put(f'/api/projects/{self.project.id}/tasks/{task.id}/',
+                        {'name': 'task', 'estimation': 8, 'status': 'CLOSED'}, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['by_member'][1]['open_points'], 0)
+        # so do profile changes of the members
+        self.member.profession = 'FRONTEND'
+        self.member.save()
+        by_profession = {row['profession']: row['points'] for row in self.client.get(self.url).json()['by_profession']}
+        self.assertEqual(by_profession['DEVOPS'], 0)
+
+    def test_outsider_gets_404(self):
+        etag = self.client.get(self.url)['ETag']
+        outsider = MyUser.objects.create_user(email='outsider@example.com', password='pass')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+
+class MyTasksTests(QueryCountTestMixin, TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.user = MyUser.objects.create_user(email='user@example.com', password='pass')
+        self.projects = [self.make_project(f'project {i}') for i in range(2)]
+        self.client.force_authenticate(self.user)
+        self.url = '/api/me/tasks/'
+
+    def make_project(self, name, tasks=2):
+        project = Project.objects.create(name=name, owner=self.owner)
+        project.other_users.add(self.user)
+        Task.objects.bulk_create(
+            Task(project=project, created_by=self.owner, assigned_to=assignee, estimation=1,
+                 status='CLOSED' if i % 2 else 'IN_PROGRESS')
+            for i in range(tasks) for assignee in (self.user, self.owner))
+        return project
+
+    def test_lists_my_tasks_across_projects(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(task['assigned_to'] == self.user.id for task in results))
+        self.assertEqual({task['project_name'] for task in results}, {'project 0', 'project 1'})
+
+        response = self.client.get(self.url, {'status': 'CLOSED', 'page_size': 1})
+        self.assertEqual([task['status'] for task in response.data['results']], ['CLOSED'])
+        self.assertEqual(self.client.get(response.data['next']).data['results'][0]['status'], 'CLOSED')
+
+    def test_tasks_of_left_projects_are_hidden(self):
+        self.projects[0].other_users.remove(self.user)
+        results = self.client.get(self.url).data['results']
+        self.assertEqual({task['project'] for task in results}, {self.projects[1].id})
+
+    def test_query_count_does_not_grow_with_projects(self):
+        self.assertQueriesDoNotScale(self.url, lambda: [self.make_project(f'more {i}') for i in range(3)])
+
+
+class ResponseShapeTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.member = MyUser.objects.create_user(email='member@example.com', password='pass')
+        self.projects = [Project.objects.create(name=f'project {i}', owner=self.owner) for i in range(2)]
+        for project in self.projects:
+            project.other_users.add(self.member)
+        self.task = Task.objects.create(project=self.projects[0], created_by=self.owner, name='task', estimation=1,
+                                        status='NOT_ASSIGNED')
+        self.client.force_authenticate(self.member)
+
+    def test_sparse_fields(self):
+        response = self.client.get(f'/api/projects/{self.projects[0].id}/tasks/?fields=id,status,password')
+        self.assertEqual(response.json()['results'], [{'id': self.task.id, 'status': 'NOT_ASSIGNED'}])
+        response = self.client.get('/api/projects/?fields=name')
+        self.assertEqual(response.json(), [{'name': 'project 0'}, {'name': 'project 1'}])
+        response = self.client.get(f'/api/projects/{self.projects[0].id}/tasks/{self.task.id}/?fields=name')
+        self.assertEqual(response.json(), {'name': 'task'})
+
+    def test_compact_projects_side_load_users_once(self):
+        data = self.client.get('/api/projects/?expand=').json()
+        self.assertEqual([(project['owner'], project['other_users']) for project in data['results']],
+                         [(self.owner.id, [self.member.id])] * 2)
+        self.assertEqual(data['users'], {
+            str(self.owner.id): {'id': self.owner.id, 'email': 'owner@example.com', 'profession': '',
+                                 'name': '<default_name>'},
+            str(self.member.id): {'id': self.member.id, 'email': 'member@example.com', 'profession': '',
+                                  'name': '<default_name>'},
+        })
+
+        data = self.client.get(f'/api/projects/{self.projects[0].id}/?expand=owner').json()
+        self.assertEqual(data['owner']['email'], 'owner@example.com')
+        self.assertEqual(data['other_users'], [self.member.id])
+        self.assertEqual(list(data['users']), [str(self.member.id)])
+
+    def test_nested_users_by_default(self):
+        data = self.client.get('/api/projects/').json()
+        self.assertEqual(data[0]['owner']['email'], 'owner@example.com')
+        with override_settings(COMPACT_RESPONSES=True):
+            self.assertEqual(self.client.get('/api/projects/').json()['results'][0]['owner'], self.owner.id)
+
+    @skipUnless(importlib.util.find_spec('msgpack'), "msgpack is not installed")
+    def test_message_pack(self):
+        import msgpack
+        response = self.client.get(f'/api/projects/{self.projects[0].id}/tasks/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['results'][0]['id'], self.task.id)
+
+
+class FastSerializerTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass', name='Owner',
+                                                profession='BACKEND')
+        self.users = [MyUser.objects.create_user(email=f'user{i}@example.com', password='pass') for i in range(3)]
+        self.projects = [Project.objects.create(name=f'project {i}', owner=self.owner) for i in range(3)]
+        # added out of id order, the output must not depend on it
+        self.projects[0].other_users.add(self.users[2], self.users[0])
+        self.projects[1].other_users.add(self.users[1])
+        Task.objects.bulk_create(Task(
+            project=self.projects[i % 2], created_by=self.owner, assigned_to=self.users[i % 3] if i % 2 else None,
+            name=f'task {i}', estimation=5, status='CLOSED',
+            created_at=timezone.now() - timezone.timedelta(days=i * 40, microseconds=i),
+        ) for i in range(6))
+
+    def assertSameAsSerializers(self):
+        projects = Project.objects.all()
+        self.assertEqual(fast_serializers.serialize_projects(projects),
+                         json.loads(json.dumps(ProjectSerializer(projects.with_members(), many=True).data)))
+        tasks = Task.objects.order_by('id')
+        self.assertEqual(fast_serializers.tasks_data(fast_serializers.task_values(tasks)),
+                         json.loads(json.dumps(TaskSerializer(tasks, many=True).data)))
+
+    def test_same_json_as_serializers(self):
+        self.assertSameAsSerializers()
+        # dates are rendered in the current time zone, across DST changes
+        with override_settings(TIME_ZONE='UTC'):
+            self.assertSameAsSerializers()
+        with timezone.override('America/New_York'):
+            self.assertSameAsSerializers()
+
+    def test_endpoints_keep_their_shape(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get('/api/projects/')
+        self.assertEqual(response.json(), json.loads(json.dumps(
+            ProjectSerializer(Project.objects.with_members(), many=True).data)))
+        response = self.client.get(f'/api/projects/{self.projects[0].id}/')
+        self.assertEqual(response.json(), json.loads(json.dumps(
+            ProjectSerializer(Project.objects.with_members().get(pk=self.projects[0].id)).data)))
+        response = self.client.get(f'/api/projects/{self.projects[0].id}/tasks/?ordering=-updated_at&page_size=2')
+        tasks = Task.objects.filter(project=self.projects[0]).order_by('-updated_at', '-id')
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(TaskSerializer(tasks[:2], many=True).data)))
+        self.assertEqual(len(self.client.get(response.json()['next']).json()['results']), 1)
+        self.assertEqual(self.client.get('/api/projects/123456/').status_code, 404)
+        self.assertEqual(self.client.get('/api/projects/abc/').status_code, 404)
+
+
+class LoadTestHarnessTests(TaskmanagerTestCase):
+    def test_seed_and_report(self):
+        call_command('seed_data', users=3, projects=2, members=2, tasks=5, stdout=StringIO())
+        self.assertEqual(Task.objects.count(), 10)
+        self.assertTrue(all(project.other_users.count() == 2 for project in Project.objects.all()))
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command('loadtest', clients=1, iterations=2, output=output, stdout=StringIO())
+            with open(output) as file:
+                report = json.load(file)
+            call_command('loadtest', clients=1, iterations=1, compare=output, stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['endpoints']['POST /api/auth/login/']['requests'], 1)
+        projects = report['endpoints']['GET /api/projects/']
+        self.assertEqual(projects['requests'], 2)
+        self.assertLessEqual(projects['p50_ms'], projects['p99_ms'])
+        self.assertGreater(projects['queries_max'], 0)
+        self.assertIn('PUT /api/projects/{id}/tasks/{id}/', report['endpoints'])
+
+    @override_settings(ALLOWED_HOSTS=['.example.com'])
+    def test_compact_and_streamed_responses(self):
+        call_command('seed_data', users=3, projects=2, members=2, tasks=5, stdout=StringIO())
+        for overrides in ({'COMPACT_RESPONSES': True}, {'STREAMING_CHUNK_SIZE': 1}):
+            output = StringIO()
+            with self.settings(**overrides):
+                call_command('loadtest', clients=1, iterations=3, stdout=output)
+            self.assertEqual(json.loads(output.getvalue())['errors'], 0)
+
+    def test_login_failure_is_reported(self):
+        call_command('seed_data', users=1, projects=1, members=0, tasks=0, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, '401'):
+            call_command('loadtest', clients=1, iterations=1, password='wrong', stdout=StringIO())
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1, METRICS_TOKEN='secret')
+class InstrumentationTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.user = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        Project.objects.create(name='project', owner=self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/projects/')
+        self.assertRegex(response['Server-Timing'],
+                         rf'^db;dur=[\d.]+;desc="{len(ctx.captured_queries)} queries", serialize;dur=[\d.]+, '
+                         rf'render;dur=[\d.]+, total;dur=')
+        with override_settings(INSTRUMENTATION_SAMPLE_RATE=0):
+            self.assertNotIn('Server-Timing', self.client.get('/api/projects/'))
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/projects/')
+        self.client.get('/api/projects/0/')
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('taskmanager_requests_total{view="project-list",method="GET",status="2xx"} 1\n', text)
+        self.assertIn('taskmanager_requests_total{view="project-detail",method="GET",status="4xx"} 1\n', text)
+        self.assertIn('taskmanager_request_duration_seconds_bucket{view="project-list",method="GET",status="2xx",'
+                      'le="+Inf"} 1\n', text)
+        self.assertRegex(text, r'taskmanager_db_queries_total\{view="project-list"\} [1-9]')
+        self.assertRegex(text, r'taskmanager_render_duration_seconds_total\{view="project-list"\} [\d.]+\n')
+        # spent in the fast path of the list and in the serializers of ?fields= alike
+        self.assertRegex(text, r'taskmanager_serialization_duration_seconds_total\{view="project-list"\} [\d.]*[1-9]')
+        metrics.reset()
+        self.client.get('/api/projects/', {'fields': 'id,name'})
+        self.assertRegex(metrics.render(),
+                         r'taskmanager_serialization_duration_seconds_total\{view="project-list"\} [\d.]*[1-9]')
+
+    def test_slow_queries_are_logged(self):
+        with override_settings(INSTRUMENTATION_SLOW_QUERY_MS=0), \
+                self.assertLogs('taskmanager.slow_queries', 'WARNING') as logs:
+            self.client.get('/api/projects/')
+        self.assertIn('FROM "taskmanager_project"', '\n'.join(logs.output))
+
+    async def test_async_views_are_measured(self):
+        token = await Token.objects.acreate(user=self.user)
+        response = await self.async_client.get('/api/async/projects/', headers={'Authorization': f'Token {token.key}'})
+        self.assertIn('Server-Timing', response)
+        self.assertIn('view="async-project-list"', metrics.render())
+
+
+@mock.patch.dict(schema._documents, clear=True)
+class SchemaTests(TaskmanagerTestCase):
+    url = '/swagger/?format=openapi'
+
+    def test_serves_generated_artifact(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(OPENAPI_SCHEMA_PATH=os.path.join(directory, 'openapi.json')):
+            call_command('generate_schema', stdout=StringIO())
+            with open(settings.OPENAPI_SCHEMA_PATH, 'rb') as file:
+                document = file.read()
+            self.assertEqual(json.loads(document)['info']['title'], 'Taskmanager Demo API')
+            with mock.patch('taskmanager.schema.generate_schema', side_effect=AssertionError('generated')):
+                response = self.client.get(self.url)
+                self.assertEqual(response.content, document)
+                response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(response.content), document)
+            self.assertEqual(response['ETag'], f'"{schema.code_fingerprint()}"')
+
+    def test_generates_once_without_artifact(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(OPENAPI_SCHEMA_PATH=os.path.join(directory, 'openapi.json')), \
+                mock.patch('taskmanager.schema.generate_schema', wraps=schema.generate_schema) as generate:
+            # a stale artifact is ignored
+            with open(f'{settings.OPENAPI_SCHEMA_PATH}.fingerprint', 'w') as file:
+                file.write('old')
+            first = self.client.get(self.url)
+            self.assertEqual(first.status_code, 200)
+            paths = json.loads(first.content)['paths']
+            # swagger_auto_schema() overrides, applied once drf_yasg got imported
+            self.assertEqual(paths['/auth/login/']['post']['operationId'], 'auth_login')
+            self.assertIn('/projects/{project_pk}/tasks/', paths)
+            self.assertEqual(self.client.get(self.url).content, first.content)
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(self.client.get('/swagger/').status_code, 200)
+        self.assertEqual(generate.call_count, 1)
+
+
+class SearchTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.user = MyUser.objects.create_user(email='user@example.com', password='pass')
+        self.project = Project.objects.create(name='Mobile app', owner=self.owner)
+        self.project.other_users.add(self.user)
+        self.other_project = Project.objects.create(name='Login service', owner=self.owner)
+        for project, names in ((self.project, ['Relogin after expiry', 'Fix LOGIN bug', 'Login screen', 'login',
+                                               'Settings']),
+                               (self.other_project, ['login'])):
+            Task.objects.bulk_create(Task(project=project, created_by=self.owner, name=name, estimation=1,
+                                          status='NOT_ASSIGNED') for name in names)
+        self.client.force_authenticate(self.user)
+        self.url = '/api/search/'
+
+    def names(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [result['name'] for result in response.data['results']]
+
+    def test_ranks_tasks_of_my_projects(self):
+        expected = ['login', 'Login screen', 'Fix LOGIN bug', 'Relogin after expiry']
+        self.assertEqual(self.names({'q': 'Login'}), expected)
+        response = self.client.get(self.url, {'q': 'login'})
+        self.assertEqual({task['project_name'] for task in response.data['results']}, {'Mobile app'})
+        # the tasks found through the FTS5 index are the same
+        with override_settings(SEARCH_INDEX_MIN_TASKS=0), \
+                mock.patch('taskmanager.search.fts_match_count', return_value=0):
+            self.assertEqual(self.names({'q': 'Login'}), expected)
+
+    @skipUnless(has_fts(connection), "SQLite without the FTS5 trigram tokenizer")
+    @override_settings(SEARCH_INDEX_MIN_TASKS=0)
+    @mock.patch('taskmanager.search.FTS_MATCH_COST', 1)
+    def test_index_is_kept_up_to_date(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.names({'q': 'settings'}), ['Settings'])
+        self.assertIn('taskmanager_task_fts MATCH', ctx.captured_queries[-1]['sql'])
+        # long queries are looked up by a few of their trigrams
+        self.assertEqual(self.names({'q': 'login after exp'}), ['Relogin after expiry'])
+        Task.objects.filter(name='Settings').update(name='Preferences')
+        Task.objects.filter(name='login').delete()
+        self.assertEqual(self.names({'q': 'settings'}), [])
+        self.assertEqual(self.names({'q': 'prefer'}), ['Preferences'])
+        self.assertEqual(self.names({'q': 'login'}), ['Login screen', 'Fix LOGIN bug', 'Relogin after expiry'])
+
+    def test_projects(self):
+        self.other_project.other_users.add(self.user)
+        response = self.client.get(self.url, {'q': 'login', 'type': 'projects'})
+        self.assertEqual(response.data['results'], fast_serializers.serialize_projects(
+            Project.objects.filter(pk=self.other_project.pk)))
+
+    def test_pages(self):
+        url, names = f'{self.url}?q=gin&page_size=3', []
+        while url:
+            response = self.client.get(url)
+            names.extend(task['name'] for task in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(names, self.names({'q': 'gin'}))
+        self.assertEqual(len(names), 4)
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'lo'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'login', 'type': 'users'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'login', 'page': 0}).status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url, {'q': 'login'}).status_code, 401)
+
+
+class StartupTests(TaskmanagerTestCase):
+    def test_bench_startup(self):
+        output = StringIO()
+        call_command('bench_startup', repeat=1, top=5, json=True, stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual(set(report['phases_ms']), {'import', 'urlconf', 'warm_up'})
+        self.assertIn('django', report['packages_ms'])
+        self.assertEqual(len(report['slowest_modules']), 5)
+
+    def test_lazy_view(self):
+        view = mock.Mock(return_value='response')
+        with mock.patch('taskmanager.startup.import_string', return_value=view) as import_string:
+            lazy = lazy_view('some.view')
+            import_string.assert_not_called()
+            self.assertEqual(lazy('request', 1), 'response')
+            self.assertEqual(lazy('request', 2), 'response')
+        import_string.assert_called_once_with('some.view')
+        view.assert_called_with('request', 2)
+
+
+class LoginTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = MyUser.objects.create_user(email='user@example.com', password='pass')
+
+    def login(self, email='user@example.com', password='pass', **kwargs):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password}, **kwargs)
+
+    def test_register_hashes_once(self):
+        with mock.patch('django.contrib.auth.hashers.make_password', wraps=make_password) as hashing, \
+                CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/register/', {'email': 'new@example.com', 'password': 'secret',
+                                                                 'name': 'new', 'profession': 'BACKEND'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(hashing.call_count, 1)
+        self.assertEqual(sum(query['sql'].startswith('UPDATE') for query in ctx.captured_queries), 0)
+        user = MyUser.objects.get(email='new@example.com')
+        self.assertTrue(user.password.startswith('scrypt$'))
+        self.assertEqual(self.login('new@example.com', 'secret').status_code, 200)
+
+    def test_outdated_hashes_are_upgraded_on_login(self):
+        self.user.password = make_password('pass', hasher='pbkdf2_sha256')
+        self.user.save()
+        self.assertEqual(self.login(password='wrong').status_code, 401)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith(f'scrypt${settings.PASSWORD_SCRYPT_WORK_FACTOR}$'))
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 12):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$4096$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_login_is_throttled_by_email_and_address(self):
+        rates = {'login_ip': '4/min', 'login_email': '2/min', 'register_ip': '1/min'}
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', rates):
+            self.assertEqual(self.login(password='wrong').status_code, 401)
+            self.assertEqual(self.login(email='USER@example.com ').status_code, 401)
+            response = self.login()
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+            # the same account from another address
+            self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, 429)
+            # other accounts from the first address
+            self.assertEqual(self.login(email='other@example.com').status_code, 401)
+            self.assertEqual(self.login(email='another@example.com').status_code, 429)
+
+    def test_busy_hashing_pool_answers_503(self):
+        pool = HashingPool(workers=1, queue=0)
+        pool._slots.acquire()
+        with mock.patch('taskmanager.hashers._pool', pool):
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        pool._slots.release()
+        with mock.patch('taskmanager.hashers._pool', pool):
+            self.assertEqual(self.login().status_code, 200)
+
+
+class SyncTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.member = MyUser.objects.create_user(email='member@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        self.project.other_users.add(self.member)
+        self.task = Task.objects.create(project=self.project, created_by=self.owner, name='task', estimation=1,
+                                        status='NOT_ASSIGNED')
+        self.client.force_authenticate(self.member)
+
+    def sync(self, token=None):
+        response = self.client.get('/api/sync/', {'since': token} if token else {})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def age_everything(self):
+        # pretend all rows were written long before the token, beyond the overlap window
+        past = timezone.now() - timezone.timedelta(hours=1)
+        Project.objects.update(updated_at=past)
+        Task.objects.update(updated_at=past)
+        Tombstone.objects.update(deleted_at=past)
+
+    def test_full_sync_without_token(self):
+        data = self.sync()
+        self.assertTrue(data['full'])
+        self.assertEqual([project['id'] for project in data['projects']], [self.project.id])
+        self.assertEqual([task['id'] for task in data['tasks']], [self.task.id])
+
+    def test_returns_only_changes_since_token(self):
+        token = self.sync()['token']
+        self.age_everything()
+        data = self.sync(token)
+        self.assertFalse(data['full'])
+        self.assertEqual((data['projects'], data['tasks']), ([], []))
+
+        other = Task.objects.create(project=self.project, created_by=self.owner, name='new', estimation=2,
+                                    status='NOT_ASSIGNED')
+        task_id = self.task.id
+        self.task.delete()
+        data = self.sync(token)
+        self.assertEqual([task['id'] for task in data['tasks']], [other.id])
+        self.assertEqual(data['deleted'], {'projects': [], 'tasks': [task_id]})
+
+    def test_batch_changes_are_tracked(self):
+        token = self.sync()['token']
+        self.age_everything()
+        url = f'/api/projects/{self.project.id}/tasks/batch/'
+        response = self.client.post(url, {'update': [{'id': self.task.id, 'name': 'renamed'}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([task['name'] for task in self.sync(token)['tasks']], ['renamed'])
+        response = self.client.post(url, {'delete': [self.task.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sync(token)['deleted']['tasks'], [self.task.id])
+
+    def test_losing_and_gaining_access(self):
+        token = self.sync()['token']
+        self.age_everything()
+        self.project.other_users.remove(self.member)
+        self.assertEqual(self.sync(token)['deleted']['projects'], [self.project.id])
+
+        self.age_everything()
+        self.member.projects.add(self.project)
+        data = self.sync(token)
+        self.assertEqual([project['id'] for project in data['projects']], [self.project.id])
+        # the project is new to the client, so all of its tasks come along
+        self.assertEqual([task['id'] for task in data['tasks']], [self.task.id])
+        self.assertEqual(data['deleted']['projects'], [])
+
+    def test_project_deletion_leaves_one_tombstone_per_member(self):
+        token = self.sync()['token']
+        project_id = self.project.id
+        self.project.delete()
+        self.assertEqual(self.sync(token)['deleted'], {'projects': [project_id], 'tasks': []})
+        self.assertEqual(Tombstone.objects.count(), 2)
+
+    def test_invalid_and_expired_tokens(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'forged'}).status_code, 400)
+        old = signing.dumps((timezone.now() - timezone.timedelta(days=365)).isoformat(), salt=SyncViewSet.token_salt)
+        self.assertTrue(self.sync(old)['full'])
+
+
+class ConditionalRequestTests(QueryCountTestMixin, TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        self.task = Task.objects.create(project=self.project, created_by=self.owner, name='task', estimation=1,
+                                        status='NOT_ASSIGNED')
+        self.tasks_url = f'/api/projects/{self.project.id}/tasks/'
+        self.task_url = f'{self.tasks_url}{self.task.id}/'
+        self.client.force_authenticate(self.owner)
+
+    def test_unchanged_resources_answer_304(self):
+        for url in (f'/api/projects/{self.project.id}/', self.tasks_url, self.task_url):
+            etag = self.client.get(url)['ETag']
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertLessEqual(len(ctx.captured_queries), 1, url)
+
+    def test_etags_follow_the_representation(self):
+        url = f'/api/projects/{self.project.id}/'
+        response = self.client.get(url)
+        self.assertIn('Accept', response['Vary'])
+        etag = response['ETag']
+        # another format of the same project
+        self.assertNotEqual(self.client.get(url, HTTP_ACCEPT='text/html')['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept', response['Vary'])
+        # the owner is nested in the project
+        self.owner.name = 'renamed'
+        self.owner.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        for url in (self.tasks_url, f'/api/projects/{self.project.id}/stats/'):
+            etag = self.client.get(url)['ETag']
+            self.assertNotEqual(self.client.get(url, HTTP_ACCEPT='text/html')['ETag'], etag)
+
+    def test_saving_a_project_never_moves_its_version_back(self):
+        project = Project.objects.get(pk=self.project.id)
+        # a task written between loading the project and saving it
+        Task.objects.create(project=self.project, created_by=self.owner, name='other', estimation=1,
+                            status='NOT_ASSIGNED')
+        bumped = Project.objects.get(pk=self.project.id).version
+        project.name = 'renamed'
+        project.save()
+        self.assertGreater(Project.objects.get(pk=self.project.id).version, bumped)
+
+    def test_project_last_modified(self):
+        response = self.client.get(f'/api/projects/{self.project.id}/')
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(f'/api/projects/{self.project.id}/',
+                                   HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_task_changes_invalidate_list_and_project_etags(self):
+        list_etag = self.client.get(self.tasks_url)['ETag']
+        project_etag = self.client.get(f'/api/projects/{self.project.id}/')['ETag']
+        Task.objects.create(project=self.project, created_by=self.owner, estimation=1, status='NOT_ASSIGNED')
+        self.assertEqual(self.client.get(self.tasks_url, HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        response = self.client.get(f'/api/projects/{self.project.id}/', HTTP_IF_NONE_MATCH=project_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(self.client.get(self.tasks_url + '?page_size=1')['ETag'],
+                            self.client.get(self.tasks_url)['ETag'])
+
+    def test_if_match_prevents_lost_updates(self):
+        etag = self.client.get(self.task_url)['ETag']
+        data = {'name': 'first', 'estimation': 2, 'status': 'IN_PROGRESS'}
+        response = self.client.put(self.task_url, data, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        new_etag = response['ETag']
+        self.assertNotEqual(new_etag, etag)
+
+        response = self.client.put(self.task_url, {**data, 'name': 'second'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.delete(self.task_url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).name, 'first')
+        self.assertEqual(self.client.delete(self.task_url, HTTP_IF_MATCH=new_etag).status_code, 204)
+
+    def test_project_if_match(self):
+        url = f'/api/projects/{self.project.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.put(url, {'name': 'renamed'}, format='json', HTTP_IF_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.put(url, {'name': 'again'}, format='json', HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(self.client.delete(url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(Project.objects.get(pk=self.project.pk).name, 'renamed')
+
+
+class CachedTokenAuthenticationTests(QueryCountTestMixin, TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = MyUser.objects.create_user(email='user@example.com', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_is_looked_up_once(self):
+        first = self.count_queries('get', '/api/projects/')
+        second = self.count_queries('get', '/api/projects/')
+        self.assertEqual(first - second, 1)
+
+    def test_logout_invalidates_cached_token(self):
+        self.client.get('/api/projects/')
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(self.client.get('/api/projects/').status_code, 401)
+
+    def test_deactivation_invalidates_cached_token(self):
+        self.client.get('/api/projects/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/projects/').status_code, 401)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+        self.assertEqual(self.client.get('/api/projects/').status_code, 401)
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='default')
+    def test_shared_cache_fills_local_one(self):
+        self.client.get('/api/projects/')
+        caches[settings.TOKEN_AUTH_LOCAL_CACHE].clear()
+        first = self.count_queries('get', '/api/projects/')
+        second = self.count_queries('get', '/api/projects/')
+        self.assertEqual(first, second)
+        self.client.post('/api/auth/logout/')
+        self.assertEqual(self.client.get('/api/projects/').status_code, 401)
+
+
+@override_settings(DATABASE_REPLICAS=['default'], DATABASE_ROUTERS=['taskmanager.db_routers.ReplicaRouter'])
+class ReplicaRouterTests(TaskmanagerTestCase):
+    """'default' stands in for a replica, reads routed to it are recorded."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = MyUser.objects.create_user(email='user@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.user)
+        self.client.force_authenticate(self.user)
+        self.routed = []
+        original = ReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            alias = original(router, model, **hints)
+            self.routed.append(alias)
+            return alias
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read', db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reads_from_replica(self, method, url, **kwargs):
+        self.routed.clear()
+        response = getattr(self.client, method)(url, format='json', **kwargs)
+        self.assertLess(response.status_code, 400, response.content)
+        return 'default' in self.routed
+
+    def test_reads_go_to_replicas_until_the_user_writes(self):
+        tasks_url = f'/api/projects/{self.project.id}/tasks/'
+        self.assertTrue(self.reads_from_replica('get', '/api/projects/'))
+        self.assertTrue(self.reads_from_replica('get', tasks_url))
+        self.assertFalse(self.reads_from_replica('get', '/api/me/tasks/'))
+
+        self.assertFalse(self.reads_from_replica('post', tasks_url, data={
+            'name': 'task', 'estimation': 3, 'status': 'NOT_ASSIGNED'}))
+        self.assertFalse(self.reads_from_replica('get', tasks_url))
+        self.assertFalse(self.reads_from_replica('get', '/api/projects/'))
+        # other users are not affected
+        other = MyUser.objects.create_user(email='other@example.com', password='pass')
+        self.client.force_authenticate(other)
+        self.assertTrue(self.reads_from_replica('get', '/api/projects/'))
+
+        cache.clear()
+        self.client.force_authenticate(self.user)
+        self.assertTrue(self.reads_from_replica('get', '/api/projects/'))
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Task))
+        self.assertEqual(router.db_for_write(Task), 'default')
+        self.assertFalse(router.allow_migrate('replica_0', 'taskmanager'))
+
+
+class AccessTokenTests(QueryCountTestMixin, TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = MyUser.objects.create_user(email='user@example.com', password='pass', name='user')
+        Project.objects.create(name='project', owner=self.user)
+
+    def login(self, device=''):
+        response = self.client.post('/api/auth/login/', {'email': 'user@example.com', 'password': 'pass',
+                                                          'device': device})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def get_projects(self, token, keyword='Bearer'):
+        return self.client.get('/api/projects/', HTTP_AUTHORIZATION=f'{keyword} {token}')
+
+    def test_login_response(self):
+        data = self.login()
+        self.assertEqual(set(data), {'token', 'token_type', 'expires_in', 'refresh_token', 'email', 'profession',
+                                     'id', 'name'})
+        self.assertEqual((data['token_type'], data['expires_in']), ('Bearer', settings.ACCESS_TOKEN_LIFETIME))
+        self.assertFalse(Token.objects.exists())
+        response = self.client.post('/api/auth/register/', {'email': 'new@example.com', 'password': 'secret',
+                                                             'name': 'new', 'profession': 'BACKEND'})
+        self.assertEqual(set(response.json()), set(data))
+
+    def test_authentication_does_not_query(self):
+        token = self.login()['token']
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.get_projects(token).status_code, 200)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(len(ctx.captured_queries), self.count_queries('get', '/api/projects/'))
+        # apps sending 'Token <token>' keep working
+        self.client.force_authenticate(None)
+        self.assertEqual(self.get_projects(token, 'Token').status_code, 200)
+
+    def test_invalid_and_expired_tokens(self):
+        token = self.login()['token']
+        self.assertEqual(self.get_projects(token[:-1]).status_code, 401)
+        with override_settings(ACCESS_TOKEN_LIFETIME=-1):
+            response = self.get_projects(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    def test_token_users_are_read_only(self):
+        token = self.login()['token']
+        MyUser.objects.filter(pk=self.user.pk).update(is_staff=True, name='renamed')
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        with self.assertNumQueries(0):
+            user, claims = AccessTokenAuthentication().authenticate(request)
+            self.assertEqual((user.pk, user.name), (self.user.pk, 'user'))
+        # what the token does not carry is read from the database
+        with self.assertNumQueries(1):
+            self.assertTrue(user.is_staff)
+        self.assertFalse(user.is_superuser)
+        with self.assertRaises(TypeError):
+            user.save()
+        self.assertEqual(MyUser.objects.get(pk=self.user.pk).name, 'renamed')
+
+    def test_refresh_rotates_the_refresh_token(self):
+        data = self.login()
+        response = self.client.post('/api/auth/refresh/', {'refresh_token': data['refresh_token']},
+                                    HTTP_AUTHORIZATION=f"Bearer {data['token'][:-1]}")
+        self.assertEqual(response.status_code, 200, response.content)
+        refreshed = response.json()
+        self.assertEqual(refreshed['id'], self.user.id)
+        self.assertNotEqual(refreshed['refresh_token'], data['refresh_token'])
+        self.assertEqual(self.get_projects(refreshed['token']).status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh_token': data['refresh_token']}).status_code,
+                         401)
+        with override_settings(REFRESH_TOKEN_LIFETIME=-1):
+            self.client.post('/api/auth/refresh/', {'refresh_token': refreshed['refresh_token']})
+        response = self.client.post('/api/auth/refresh/', {'refresh_token': refreshed['refresh_token']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_devices_log_out_separately(self):
+        phone, tablet = self.login('phone'), self.login('tablet')
+        self.assertEqual(list(self.user.refresh_tokens.order_by('id').values_list('device', flat=True)),
+                         ['phone', 'tablet'])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {phone['token']}")
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 404)
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh_token': phone['refresh_token']})
+                         .status_code, 401)
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh_token': tablet['refresh_token']})
+                         .status_code, 200)
+
+        self.login('laptop')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tablet['token']}")
+        self.assertEqual(self.client.post('/api/auth/logout/', {'all_devices': True}).status_code, 200)
+        self.assertFalse(self.user.refresh_tokens.exists())
+
+    def test_deactivation_revokes_refresh_tokens(self):
+        data = self.login()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh_token': data['refresh_token']})
+                         .status_code, 401)
+
+    async def test_async_views(self):
+        data = await sync_to_async(self.login)()
+        response = await self.async_client.get('/api/async/projects/',
+                                               headers={'Authorization': f"Bearer {data['token']}"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+
+class AsyncReadViewsTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.member = MyUser.objects.create_user(email='member@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        self.project.other_users.add(self.member)
+        Task.objects.bulk_create(Task(project=self.project, created_by=self.owner, name=f'task {i}', estimation=1,
+                                      status='NOT_ASSIGNED') for i in range(3))
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.member).key}'}
+        self.client.force_authenticate(self.member)
+
+    async def test_same_json_as_sync_views(self):
+        sync_projects = await sync_to_async(self.client.get)('/api/projects/')
+        response = await self.async_client.get('/api/async/projects/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sync_projects.json())
+
+        sync_tasks = await sync_to_async(self.client.get)(f'/api/projects/{self.project.id}/tasks/?page_size=2')
+        response = await self.async_client.get(f'/api/async/projects/{self.project.id}/tasks/?page_size=2',
+                                               headers=self.headers)
+        self.assertEqual(response.json()['results'], sync_tasks.json()['results'])
+        self.assertIsNotNone(response.json()['next'])
+
+    async def test_board(self):
+        response = await self.async_client.get(f'/api/async/projects/{self.project.id}/board/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([project['id'] for project in response.json()['projects']], [self.project.id])
+        self.assertEqual(len(response.json()['tasks']['results']), 3)
+
+    async def test_authentication_and_membership(self):
+        response = await self.async_client.get('/api/async/projects/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/async/projects/', headers={'Authorization': 'Token nope'})
+        self.assertEqual(response.status_code, 401)
+        outsider = await sync_to_async(MyUser.objects.create_user)(email='outsider@example.com', password='pass')
+        token = await Token.objects.acreate(user=outsider)
+        response = await self.async_client.get(f'/api/async/projects/{self.project.id}/tasks/',
+                                               headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.post('/api/async/projects/', headers=self.headers)
+        self.assertEqual(response.status_code, 405)
+
+
+class ProjectEventsTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.member = MyUser.objects.create_user(email='member@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        self.project.other_users.add(self.member)
+        self.task = Task.objects.create(project=self.project, created_by=self.owner, name='task', estimation=1,
+                                        status='NOT_ASSIGNED')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.member).key}'}
+        self.client.force_authenticate(self.owner)
+
+    def change(self, method, url, **kwargs):
+        # events are published on commit, which never happens inside a TestCase
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, format='json', **kwargs)
+        self.assertLess(response.status_code, 400, response.content)
+        return response
+
+    async def test_in_memory_broker(self):
+        broker = InMemoryBroker(queue_size=2)
+        subscription = await broker.subscribe('channel')
+        broker.publish('channel', {'type': 'tasks'})
+        broker.publish('other', {'type': 'other'})
+        self.assertEqual(await subscription.get(timeout=1), {'type': 'tasks'})
+        self.assertIsNone(await subscription.get(timeout=0.01))
+
+        for i in range(3):
+            broker.publish('channel', {'type': 'tasks', 'i': i})
+        await asyncio.sleep(0)
+        self.assertEqual(await subscription.get(timeout=1), {'type': 'resync'})
+        await subscription.close()
+        self.assertFalse(broker._subscriptions)
+
+    async def test_batch_publishes_one_event(self):
+        subscription = await get_broker().subscribe(project_channel(self.project.id))
+        await sync_to_async(self.change)('post', f'/api/projects/{self.project.id}/tasks/batch/', data={
+            'create': [{'name': 'new', 'estimation': 1, 'status': 'NOT_ASSIGNED'}],
+            'update': [{'id': self.task.id, 'name': 'renamed'}],
+        })
+        event = await subscription.get(timeout=1)
+        self.assertEqual(event['type'], 'tasks')
+        self.assertEqual(len(event['created']), 1)
+        self.assertEqual(event['updated'], [self.task.id])
+        self.assertIsNone(await subscription.get(timeout=0.01))
+        await subscription.close()
+
+    async def test_stream(self):
+        response = await self.async_client.get(f'/api/async/projects/{self.project.id}/events/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertTrue((await stream.__anext__()).startswith(b'retry:'))
+
+        await sync_to_async(self.change)('put', f'/api/projects/{self.project.id}/tasks/{self.task.id}/',
+                                         data={'name': 'renamed', 'estimation': 1, 'status': 'NOT_ASSIGNED'})
+        chunk = (await stream.__anext__()).decode()
+        self.assertTrue(chunk.startswith('event: tasks\n'))
+        self.assertEqual(json.loads(chunk.split('data: ')[1])['updated'], [self.task.id])
+
+        await sync_to_async(MyUser.objects.create_user)(email='new@example.com', password='pass')
+        await sync_to_async(self.change)('post', f'/api/projects/{self.project.id}/add-users-to-project/',
+                                         data={'emails': ['new@example.com']})
+        self.assertTrue((await stream.__anext__()).startswith(b'event: project\n'))
+
+        await sync_to_async(self.change)('put', f'/api/projects/{self.project.id}/',
+                                         data={'name': 'project', 'owner_id': self.owner.id, 'other_users_ids': []})
+        self.assertTrue((await stream.__anext__()).startswith(b'event: revoked\n'))
+        with self.assertRaises(StopAsyncIteration):
+            await stream.__anext__()
+
+    def test_refused_under_wsgi(self):
+        response = self.client.get(f'/api/async/projects/{self.project.id}/events/',
+                                   HTTP_AUTHORIZATION=self.headers['Authorization'])
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+
+    async def test_outsider_is_forbidden(self):
+        outsider = await sync_to_async(MyUser.objects.create_user)(email='outsider@example.com', password='pass')
+        token = await Token.objects.acreate(user=outsider)
+        response = await self.async_client.get(f'/api/async/projects/{self.project.id}/events/',
+                                               headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 403)
+
+
+class JobTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.member = MyUser.objects.create_user(email='member@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        self.project.other_users.add(self.member)
+        Task.objects.bulk_create(Task(project=self.project, created_by=self.owner, name=f'task {i}', estimation=1,
+                                      status='NOT_ASSIGNED') for i in range(5))
+        self.client.force_authenticate(self.owner)
+
+    def run_jobs(self):
+        call_command('run_jobs', once=True, stdout=StringIO())
+
+    @override_settings(JOB_CHUNK_SIZE=2)
+    def test_project_is_purged_in_background(self):
+        response = self.client.delete(f'/api/projects/{self.project.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Location'], f'/api/jobs/{Job.objects.get().pk}/')
+        # gone for clients at once, with the tasks still there
+        self.client.force_authenticate(self.member)
+        self.assertEqual(self.client.get('/api/projects/').data, [])
+        self.assertEqual(self.client.get(f'/api/projects/{self.project.id}/tasks/').status_code, 403)
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 5)
+        self.assertEqual(set(Tombstone.objects.values_list('user_id', flat=True)), {self.owner.id, self.member.id})
+
+        self.run_jobs()
+        self.assertFalse(Project.objects.filter(pk=self.project.id).exists())
+        self.assertFalse(Task.objects.exists())
+        # no tombstones of the tasks, nor a second one of the project
+        self.assertEqual(Tombstone.objects.count(), 2)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.result), ('SUCCEEDED', {'deleted_tasks': 5}))
+        self.assertEqual(self.client.get(f'/api/jobs/{job.id}/').status_code, 404)
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(f'/api/jobs/{job.id}/')
+        self.assertEqual((response.data['kind'], response.data['status']), ('purge_project', 'SUCCEEDED'))
+
+    @override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_SECONDS=0)
+    def test_failed_jobs_are_retried(self):
+        job = enqueue('taskmanager.operations.no_such_job')
+        with self.assertLogs('taskmanager.jobs', 'ERROR'):
+            self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('FAILED', 2))
+        self.assertIn('no_such_job', job.error)
+
+        # a running job that stopped reporting progress lost its worker
+        job = enqueue('taskmanager.operations.purge_project', project_id=self.project.id)
+        Job.objects.filter(pk=job.pk).update(status='RUNNING', attempts=1)
+        self.assertIsNone(claim_job())
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(hours=1)):
+            self.assertEqual(claim_job().pk, job.pk)
+            # not once it was its last attempt
+            Job.objects.filter(pk=job.pk).update(status='RUNNING', attempts=2,
+                                                 updated_at=timezone.now() - timedelta(hours=2))
+            self.assertIsNone(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_import_tasks(self):
+        url = f'/api/projects/{self.project.id}/tasks/import/'
+        tasks = [{'name': 'imported', 'estimation': 2, 'status': 'NOT_ASSIGNED', 'assigned_to': self.member.id},
+                 {'name': 'invalid', 'estimation': 4, 'status': 'NOT_ASSIGNED'}]
+        with mock.patch('taskmanager.jobs._runner', ImmediateRunner()), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'tasks': tasks}, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response['Location'], f"/api/jobs/{response.data['id']}/")
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(list(job.result['errors']), ['1'])
+        self.assertFalse(Task.objects.filter(name='imported').exists())
+
+        response = self.client.post(url, {'tasks': tasks[:1]}, format='json')
+        self.run_jobs()
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual((job.status, job.result), ('SUCCEEDED', {'created': 1}))
+        task = Task.objects.get(name='imported')
+        self.assertEqual((task.created_by, task.assigned_to), (self.owner, self.member))
+        self.assertEqual(self.client.post(url, {'tasks': []}, format='json').status_code, 400)
+
+    @override_settings(JOB_INLINE_MAX_EMAILS=1)
+    def test_long_member_lists(self):
+        MyUser.objects.create_user(email='new@example.com', password='pass')
+        response = self.client.post(f'/api/projects/{self.project.id}/add-users-to-project/',
+                                    {'emails': ['NEW@example.com', 'member@example.com', 'nobody@example.com']},
+                                    format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.run_jobs()
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual(job.result, {'message': 'All good project', 'added': ['new@example.com'],
+                                      'already_members': ['member@example.com'], 'not_found': ['nobody@example.com']})
+        self.assertTrue(self.project.other_users.filter(email='new@example.com').exists())
+
+
+class StreamingTests(TaskmanagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = MyUser.objects.create_user(email='owner@example.com', password='pass')
+        self.project = Project.objects.create(name='project', owner=self.owner)
+        Task.objects.bulk_create(Task(project=self.project, created_by=self.owner, name=f'task {i}', estimation=1,
+                                      status='CLOSED' if i % 2 else 'NOT_ASSIGNED') for i in range(5))
+        self.client.force_authenticate(self.owner)
+        self.url = f'/api/projects/{self.project.id}/tasks/export/'
+
+    def content(self, response):
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return json.loads(body)
+
+    def test_long_lists_are_streamed(self):
+        expected = TaskSerializer(Task.objects.order_by('created_at', 'id'), many=True).data
+        with override_settings(STREAMING_CHUNK_SIZE=2):
+            response = self.client.get(self.url)
+            self.assertTrue(response.streaming)
+            self.assertEqual(self.content(response), expected)
+            self.assertEqual([task['name'] for task in self.content(self.client.get(self.url, {'status': 'CLOSED'}))],
+                             ['task 1', 'task 3'])
+            self.assertEqual(self.content(self.client.get(self.url, {'fields': 'id'})),
+                             [{'id': task['id']} for task in expected])
+            # other renderers get an ordinary response
+            self.assertFalse(self.client.get(self.url, HTTP_ACCEPT='text/html').streaming)
+        # a list that fits in one chunk is not streamed
+        response = self.client.get(self.url)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.data, expected)
+
+    def test_project_list(self):
+        member = MyUser.objects.create_user(email='member@example.com', password='pass')
+        for i in range(3):
+            Project.objects.create(name=f'other {i}', owner=self.owner).other_users.add(member)
+        expected = self.client.get('/api/projects/').data
+        with override_settings(STREAMING_CHUNK_SIZE=2):
+            response = self.client.get('/api/projects/')
+            self.assertTrue(response.streaming)
+            self.assertEqual(self.content(response), json.loads(json.dumps(expected)))
+
+    @override_settings(STREAMING_CHUNK_SIZE=2, COMPRESSION_MIN_SIZE=100)
+    def test_compression(self):
+        expected = self.content(self.client.get(self.url))
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br;q=0.5, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(self.content(response), expected)
+
+        url = f'/api/projects/{self.project.id}/tasks/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        # another representation, so another tag, but a strong one that still works in If-Match
+        self.assertEqual(response['ETag'], etag[:-1] + '-gzip"')
+        self.assertEqual(self.content(response)['results'], expected)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag[:-1] + '-gzip"')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        project_url = f'/api/projects/{self.project.id}/'
+        coded = self.client.get(project_url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        self.assertTrue(coded.endswith('-gzip"'))
+        response = self.client.put(project_url, {'name': 'renamed'}, format='json', HTTP_IF_MATCH=coded)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.put(project_url, {'name': 'again'}, format='json',
+                                         HTTP_IF_MATCH=coded).status_code, 412)
+
+        self.assertFalse(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0').has_header('Content-Encoding'))
+        # too short to be worth it
+        self.assertFalse(self.client.get(f'/api/projects/{self.project.id}/', {'fields': 'id'},
+                                         HTTP_ACCEPT_ENCODING='gzip').has_header('Content-Encoding'))
+        self.assertEqual(preferred_encoding('identity'), None)
+        self.assertEqual(preferred_encoding('*'), 'br' if compression.brotli else 'gzip')
+
+    @override_settings(STREAMING_CHUNK_SIZE=2)
+    async def test_streamed_over_asgi(self):
+        token = await Token.objects.acreate(user=self.owner)
+        response = await self.async_client.get(self.url, headers={'Authorization': f'Token {token.key}',
+                                                                  'Accept-Encoding': 'gzip'})
+        self.assertTrue(response.is_async)
+        body = gzip.decompress(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual([task['name'] for task in json.loads(body)], [f'task {i}' for i in range(5)])
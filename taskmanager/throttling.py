@@ -0,0 +1,31 @@
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class IPRateThrottle(SimpleRateThrottle):
+    """Throttles by client address, authenticated or not. Behind proxies, set NUM_PROXIES so the address is right."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginIPThrottle(IPRateThrottle):
+    scope = 'login_ip'
+
+
+class RegisterIPThrottle(IPRateThrottle):
+    scope = 'register_ip'
+
+
+class LoginEmailThrottle(SimpleRateThrottle):
+    """Throttles logins into one account, whichever addresses they come from."""
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email')
+        if not isinstance(email, str):
+            return None
+        # emails are personal data, keep them out of cache keys
+        ident = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -2,13 +2,20 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from rest_framework_nested.routers import NestedDefaultRouter
-from .views import ProjectViewSet, TaskViewSet, LoginViewSet, RegisterViewSet, LogoutViewSet, AddUsersToProject
+from . import async_views
+from .views import ProjectViewSet, TaskViewSet, LoginViewSet, RegisterViewSet, LogoutViewSet, AddUsersToProject, \
+    SyncViewSet, MyTasksViewSet, RefreshViewSet, SearchViewSet, JobViewSet
 
 router = DefaultRouter()
 router.register(r'auth/login', LoginViewSet, basename='login')
 router.register(r'auth/register', RegisterViewSet, basename='register')
+router.register(r'auth/refresh', RefreshViewSet, basename='refresh')
 router.register(r'auth/logout', LogoutViewSet, basename='logout')
 router.register(r'projects', ProjectViewSet)
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'me/tasks', MyTasksViewSet, basename='my-tasks')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'jobs', JobViewSet, basename='jobs')
 
 projects_router = NestedDefaultRouter(router, r'projects', lookup='project')
 
@@ -21,6 +28,14 @@ projects_router.register(
     basename='add-users-to-project',
 )
 
+async_urlpatterns = [
+    path('projects/', async_views.project_list, name='async-project-list'),
+    path('projects/<int:project_pk>/tasks/', async_views.task_list, name='async-task-list'),
+    path('projects/<int:project_pk>/board/', async_views.board, name='async-board'),
+    path('projects/<int:project_pk>/events/', async_views.project_events, name='async-project-events'),
+]
+
 urlpatterns = [
     path('', include(router.urls + projects_router.urls)),
+    path('async/', include(async_urlpatterns)),
 ]
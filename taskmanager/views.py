@@ -1,42 +1,81 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.db.models import Q
-from drf_yasg.utils import swagger_auto_schema
+from django.core import signing
+from django.db import transaction
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
 
-from .models import Project, Task, MyUser
+from . import fast_serializers
+from .authentication import issue_tokens, rotate_refresh_token
+from .changes import batched_changes, bump_project_versions, notify_tasks
+from .conditional import _as_pk, forget_state, project_etag, project_last_modified, project_stats_etag, \
+    project_version, task_etag, task_last_modified, task_list_etag
+from .db_routers import ReplicaReadsMixin
+from .docs import swagger_auto_schema
+from .filters import TaskFilterBackend
+from .jobs import enqueue
+from .membership import is_project_member
+from .models import Job, Project, RefreshToken, Task, Tombstone, TombstoneKindChoices
+from .operations import delete_project
+from .pagination import PageNumberPagination, TaskCursorPagination
 from .permissions import IsProjectOwnerOrReadOnly, IsPartOfThisProject
-from .serializers import RegisterSerializer, LoginSerializer, ProjectSerializer, TaskSerializer
+from .search import search_projects, search_tasks
+from .serializers import RegisterSerializer, LoginSerializer, ProjectSerializer, TaskSerializer, \
+    TaskBatchSerializer, TaskBatchItemSerializer, SyncQuerySerializer, TaskFilterSerializer, MyTaskSerializer, \
+    RefreshTokenSerializer, LogoutSerializer, SearchQuerySerializer, TaskImportSerializer, JobSerializer, get_expand
+from .stats import get_project_stats
+from .streaming import stream_list
 from rest_framework import serializers, viewsets, status, mixins
 
+from .throttling import LoginEmailThrottle, LoginIPThrottle, RegisterIPThrottle
 from .swagger_serializers import AuthResponseSerializer, ProjectResponseSerializer, ProjectPostSerializer, \
-    EmailsSerializer
+    EmailsSerializer, AddUsersResponseSerializer, TaskBatchResponseSerializer, SyncResponseSerializer, \
+    ProjectStatsSerializer
+
+
+def job_accepted(job):
+    """202 response for work handed to a background job."""
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': reverse('jobs-detail', args=[job.pk])})
 
 
 class LoginViewSet(viewsets.ViewSet):
     serializer_class = LoginSerializer
     http_method_names = ['post']
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
 
     @swagger_auto_schema(
         query_serializer=LoginSerializer,
         responses={
             '200': AuthResponseSerializer,
-            '401': "Unauthorized"
+            '401': "Unauthorized",
+            '429': "Too many attempts from this address or for this email",
+            '503': "Too many logins at once, retry after Retry-After seconds",
         },
         security=[],
         operation_id='auth_login',
-        operation_description="Accepts email and password and returns token that is used for authorization in other endpoints"
+        operation_description="Accepts email and password (and an optional device name) and returns an access token "
+                              "that is used for authorization in other endpoints, valid for expires_in seconds, and a "
+                              "refresh token to get new ones from /auth/refresh/. Every login is a separate session."
     )
     def create(self, request):
         user = authenticate(email=request.data["email"], password=request.data["password"])
         if user is not None:
-            token, created = Token.objects.get_or_create(user=user)
-            return Response(data={"token": token.key, "email": user.email, "profession": user.profession, "id": user.id,
-                                  "name": user.name},
+            return Response(data={**issue_tokens(user, request.data.get("device", "")), "email": user.email,
+                                  "profession": user.profession, "id": user.id, "name": user.name},
                             status=status.HTTP_200_OK)
         else:
             return Response(data={"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
@@ -45,6 +84,7 @@ class LoginViewSet(viewsets.ViewSet):
 class RegisterViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin):
     serializer_class = RegisterSerializer
     http_method_names = ['post']
+    throttle_classes = [RegisterIPThrottle]
 
     def perform_create(self, serializer):
         return serializer.save()
@@ -56,59 +96,106 @@ class RegisterViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin):
         },
         security=[],
         operation_id='auth_register',
-        operation_description="Creates new user and returns token that is used for authorization in other endpoints"
+        operation_description="Creates new user and returns tokens like /auth/login/"
     )
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = self.perform_create(serializer)
-        token, created = Token.objects.get_or_create(user=user)
         headers = self.get_success_headers(serializer.data)
-        serializer.data["token"] = token.key
-        return Response(data={"token": token.key, **serializer.data}, status=status.HTTP_201_CREATED, headers=headers)
+        return Response(data={**issue_tokens(user, request.data.get("device", "")), **serializer.data},
+                        status=status.HTTP_201_CREATED, headers=headers)
+
+
+class RefreshViewSet(viewsets.ViewSet):
+    serializer_class = RefreshTokenSerializer
+    http_method_names = ['post']
+    # an expired access token may still be sent along
+    authentication_classes = []
+
+    @swagger_auto_schema(
+        request_body=RefreshTokenSerializer,
+        responses={
+            '200': AuthResponseSerializer,
+            '401': "Invalid or expired refresh token",
+        },
+        security=[],
+        operation_id='auth_refresh',
+        operation_description="Exchanges a refresh token for a new access token and a new refresh token, the one "
+                              "sent stops working"
+    )
+    def create(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rotated = rotate_refresh_token(serializer.validated_data["refresh_token"])
+        if rotated is not None:
+            user, tokens = rotated
+            return Response(data={**tokens, "email": user.email, "profession": user.profession, "id": user.id,
+                                  "name": user.name},
+                            status=status.HTTP_200_OK)
+        else:
+            return Response(data={"error": "Invalid refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
 
 
 class LogoutViewSet(viewsets.ViewSet):
-    serializer_class = serializers.Serializer()
+    serializer_class = LogoutSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ['post']
 
     @swagger_auto_schema(
+        request_body=LogoutSerializer,
         responses={
             '200': "Token invalidated, successful logout",
             '404': "Token not found",
         },
         operation_id='auth_logout',
-        operation_description="Deletes and invalidates users' authorization token"
+        operation_description="Ends the session of this device, or of all devices with all_devices. Its refresh "
+                              "token stops working at once, access tokens when they expire."
     )
     def create(self, request):
         user = request.user
-        try:
-            token = Token.objects.get(user=user)
-            token.delete()
+        serializer = LogoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if serializer.validated_data["all_devices"]:
+            deleted = RefreshToken.objects.filter(user=user).delete()[0] + Token.objects.filter(user=user).delete()[0]
+        elif isinstance(request.auth, Token):
+            deleted = Token.objects.filter(user=user).delete()[0]
+        else:
+            deleted = RefreshToken.objects.filter(pk=request.auth["s"], user=user).delete()[0]
+        if deleted:
             return Response(data={"token": "Token invalidated, successful logout"}, status=status.HTTP_200_OK)
-        except Token.DoesNotExist:
-            return Response(data={"error": "Token not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data={"error": "Token not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated, IsProjectOwnerOrReadOnly]
     http_method_names = ['get', 'post', 'put', 'delete', 'head', 'options']
 
     def get_queryset(self):
-        user = self.request.user
-        return Project.objects.filter(Q(owner=user) | Q(other_users=user)).distinct()
+        if getattr(self, 'swagger_fake_view', False):
+            return Project.objects.none()
+        queryset = Project.objects.for_user(self.request.user)
+        return self.get_serializer_class().setup_eager_loading(queryset)
 
     @swagger_auto_schema(
         responses={
             '200': ProjectResponseSerializer(many=True),
         },
-        operation_description="Returns all projects that current authed user is part of"
+        operation_description="Returns all projects that current authed user is part of. With ?expand= (or "
+                              "COMPACT_RESPONSES) users not listed in expand are ids and the response is "
+                              "{results, users} with every referenced user once."
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        if fast_serializers.is_applicable(request):
+            projects = fast_serializers.project_values(Project.objects.for_user(request.user))
+            return stream_list(request, projects, fast_serializers.projects_chunk_data(projects.db))
+        if get_expand(request) is None:
+            return super().list(request, *args, **kwargs)
+        projects = list(self.filter_queryset(self.get_queryset()))
+        data = self.get_serializer(projects, many=True).data
+        return Response({'results': data, 'users': ProjectSerializer.side_loaded_users(projects, data)})
 
     @swagger_auto_schema(
         request_body=ProjectPostSerializer,
@@ -123,32 +210,91 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         request_body=ProjectPostSerializer,
-        operation_description="Updates project",
+        operation_description="Updates project. Send the ETag in If-Match to update only if nobody changed it "
+                              "in the meantime.",
         responses={
             '200': "Success",
+            '412': "Project changed since the ETag given in If-Match",
         },
     )
+    @method_decorator(condition(etag_func=project_etag))
     def update(self, request, *args, **kwargs):
         request.data['owner_id'] = request.user.id
-        return super().update(request, *args, **kwargs)
+        response = super().update(request, *args, **kwargs)
+        forget_state(request)
+        response['ETag'] = project_etag(request, **kwargs)
+        return response
 
     @swagger_auto_schema(
         responses={
             '200': ProjectResponseSerializer,
+            '304': "Not modified since the ETag given in If-None-Match",
         },
         operation_description="Projects details"
     )
+    @method_decorator(condition(etag_func=project_etag, last_modified_func=project_last_modified))
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        if fast_serializers.is_applicable(request):
+            # reads are open to every member, IsProjectOwnerOrReadOnly has nothing to check on the instance
+            pk = _as_pk(kwargs['pk'])
+            if pk is None:
+                raise NotFound()
+            data = fast_serializers.serialize_projects(Project.objects.for_user(request.user).filter(pk=pk))
+            if not data:
+                raise NotFound()
+            return Response(data[0])
+        if get_expand(request) is None:
+            return super().retrieve(request, *args, **kwargs)
+        project = self.get_object()
+        data = self.get_serializer(project).data
+        return Response({**data, 'users': ProjectSerializer.side_loaded_users(project, data)})
 
+    @swagger_auto_schema(
+        responses={
+            '204': "Deleted, the Location header is the job purging the tasks",
+            '412': "Project changed since the ETag given in If-Match",
+        },
+        operation_description="Deletes project with all its tasks. The project is gone at once, its tasks are "
+                              "removed by a background job, which can be followed at the /jobs/{id}/ given in the "
+                              "Location header."
+    )
+    @method_decorator(condition(etag_func=project_etag))
+    def destroy(self, request, *args, **kwargs):
+        project = self.get_object()
+        # a CASCADE over every task would hold the request and lock the tasks for as long
+        with transaction.atomic():
+            job = delete_project(project, request.user)
+        # still a 204, which apps expect, the project itself is deleted already
+        return Response(status=status.HTTP_204_NO_CONTENT, headers={'Location': reverse('jobs-detail', args=[job.pk])})
 
-class TaskViewSet(viewsets.ModelViewSet):
+    @swagger_auto_schema(
+        responses={
+            '200': ProjectStatsSerializer,
+            '304': "Not modified since the ETag given in If-None-Match",
+        },
+        operation_description="Task counts and story points of the project: in total, per status, per assignee "
+                              "(open ones are those not CLOSED) and per assignee profession. Members without "
+                              "assigned tasks are not listed."
+    )
+    @action(detail=True, methods=['get'])
+    @method_decorator(condition(etag_func=project_stats_etag))
+    def stats(self, request, pk=None):
+        if not is_project_member(request, pk):
+            raise NotFound()
+        return Response(get_project_stats(int(pk), project_version(request, pk)))
+
+
+class TaskViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated, IsPartOfThisProject]
+    pagination_class = TaskCursorPagination
+    filter_backends = [TaskFilterBackend]
     http_method_names = ['get', 'post', 'put', 'delete', 'head', 'options']
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Task.objects.none()
         project_id = self.kwargs['project_pk']
         return Task.objects.filter(project__id=project_id)
 
@@ -160,42 +306,303 @@ class TaskViewSet(viewsets.ModelViewSet):
         request.data['created_by'] = request.user.id
         return super().create(request, *args, **kwargs)
 
-    @swagger_auto_schema()
+    @swagger_auto_schema(
+        query_serializer=TaskFilterSerializer,
+        responses={
+            '304': "Not modified since the ETag given in If-None-Match",
+        },
+    )
+    @method_decorator(condition(etag_func=task_list_etag))
+    def list(self, request, *args, **kwargs):
+        if not fast_serializers.is_applicable(request):
+            return super().list(request, *args, **kwargs)
+        queryset = fast_serializers.task_values(self.filter_queryset(self.get_queryset()), request)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(fast_serializers.tasks_data(page))
+
+    @swagger_auto_schema(
+        query_serializer=TaskFilterSerializer,
+        responses={
+            '200': TaskSerializer(many=True),
+            '304': "Not modified since the ETag given in If-None-Match",
+        },
+        operation_description="Every task of the project matching the filters of the list, in its order, as one "
+                              "JSON array without pages. Long arrays are streamed as they are read."
+    )
+    @action(detail=False, methods=['get'])
+    @method_decorator(condition(etag_func=task_list_etag))
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.order_by(*TaskCursorPagination().get_ordering(request, queryset, self))
+        if fast_serializers.is_applicable(request):
+            return stream_list(request, fast_serializers.task_values(queryset), fast_serializers.tasks_data)
+        return stream_list(request, queryset, lambda tasks: self.get_serializer(tasks, many=True).data)
+
+    @swagger_auto_schema(
+        responses={
+            '304': "Not modified since the ETag given in If-None-Match",
+        },
+    )
+    @method_decorator(condition(etag_func=task_etag, last_modified_func=task_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Updates task. Send the ETag in If-Match to update only if nobody changed it "
+                              "in the meantime.",
+        responses={
+            '412': "Task changed since the ETag given in If-Match",
+        },
+    )
+    @method_decorator(condition(etag_func=task_etag))
     def update(self, request, *args, **kwargs):
         project_id = self.kwargs['project_pk']
         project = get_object_or_404(Project, id=project_id)
         request.data['project'] = project.id
         request.data['created_by'] = request.user.id
-        return super().update(request, *args, **kwargs)
+        response = super().update(request, *args, **kwargs)
+        forget_state(request)
+        response['ETag'] = task_etag(request, **kwargs)
+        return response
+
+    @swagger_auto_schema(
+        responses={
+            '412': "Task changed since the ETag given in If-Match",
+        },
+    )
+    @method_decorator(condition(etag_func=task_etag))
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        request_body=TaskBatchSerializer,
+        responses={
+            '200': TaskBatchResponseSerializer,
+            '400': "Per-item errors, nothing was applied",
+        },
+        operation_description="Creates, updates (partially, by id) and deletes many tasks of the project in one "
+                              "transaction. Either every item is applied or none is."
+    )
+    @action(detail=False, methods=['post'])
+    def batch(self, request, *args, **kwargs):
+        batch = TaskBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        creates, updates, deletes = (batch.validated_data[key] for key in ('create', 'update', 'delete'))
+
+        update_ids = [item['id'] for item in updates]
+        tasks = self.get_queryset().in_bulk(update_ids + deletes)
+        errors = {
+            'update': [{} if pk in tasks else {'id': ['Task not found']} for pk in update_ids],
+            'delete': [{} if pk in tasks else {'id': ['Task not found']} for pk in deletes],
+        }
+        create_serializer = TaskBatchItemSerializer(data=creates, many=True)
+        update_serializer = TaskBatchItemSerializer([tasks.get(pk) for pk in update_ids], data=updates, many=True,
+                                                    partial=True)
+        if not create_serializer.is_valid():
+            errors['create'] = create_serializer.errors
+        if not update_serializer.is_valid():
+            errors['update'] = [{**found, **invalid} for found, invalid in zip(errors['update'],
+                                                                               update_serializer.errors)]
+        if any(any(item) for item in errors.values()):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        project_id = int(self.kwargs['project_pk'])
+        with transaction.atomic(), batched_changes():
+            created = create_serializer.save(project_id=project_id, created_by_id=request.user.id)
+            updated = update_serializer.save()
+            # bulk_create and bulk_update send no signals
+            bump_project_versions([project_id])
+            notify_tasks(project_id, created=[task.pk for task in created], updated=[task.pk for task in updated])
+            self.get_queryset().filter(pk__in=deletes).delete()
+        return Response({
+            'created': TaskSerializer(created, many=True).data,
+            'updated': TaskSerializer(updated, many=True).data,
+            'deleted': deletes,
+        }, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        request_body=TaskImportSerializer,
+        responses={
+            '202': JobSerializer,
+        },
+        operation_description="Creates up to 10000 tasks of the project in the background, the response is the job "
+                              "to follow at /jobs/{id}/. Tasks are checked like in /batch/, either every one is "
+                              "created or none is and the job fails with the errors per task index in its result."
+    )
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_tasks(self, request, *args, **kwargs):
+        serializer = TaskImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            job = enqueue('taskmanager.operations.import_tasks', user=request.user,
+                          project_id=int(self.kwargs['project_pk']), tasks=serializer.validated_data['tasks'])
+        return job_accepted(job)
 
 
-class AddUsersToProject(viewsets.ViewSet):
+class MyTasksViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    serializer_class = MyTaskSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = TaskCursorPagination
+    filter_backends = [TaskFilterBackend]
+    http_method_names = ['get', 'head', 'options']
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Task.objects.none()
+        user = self.request.user
+        # tasks of projects the user has left stay assigned, but are not theirs to see anymore
+        return (user.tasks_assigned.filter(project__in=Project.objects.for_user(user).values('pk'))
+                .annotate(project_name=F('project__name')))
+
+    @swagger_auto_schema(
+        query_serializer=TaskFilterSerializer,
+        operation_description="Tasks assigned to the current user in all their projects, with project names"
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class SearchViewSet(ReplicaReadsMixin, viewsets.GenericViewSet):
+    serializer_class = MyTaskSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = PageNumberPagination
+    http_method_names = ['get', 'head', 'options']
+
+    @swagger_auto_schema(
+        query_serializer=SearchQuerySerializer,
+        operation_id='search',
+        operation_description="Tasks (with project names) or projects the current user is part of whose name "
+                              "contains q, best matches first: the whole name, its start, the start of a word, "
+                              "then anywhere. With type=projects the results are projects like in /projects/."
+    )
+    def list(self, request, *args, **kwargs):
+        query = SearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        text = query.validated_data['q']
+        if query.validated_data['type'] == 'projects':
+            page = self.paginate_queryset(fast_serializers.project_values(search_projects(request.user, text)))
+            data = fast_serializers.projects_data(page, fast_serializers.member_values([row['id'] for row in page]))
+        else:
+            data = self.get_serializer(self.paginate_queryset(search_tasks(request.user, text)), many=True).data
+        return self.get_paginated_response(data)
+
+
+class AddUsersToProject(ReplicaReadsMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
     http_method_names = ['post']
 
     @swagger_auto_schema(
         request_body=EmailsSerializer,
         responses={
-            '201': "All good, however some emails might have been skipped",
+            '201': AddUsersResponseSerializer,
+            '202': JobSerializer,
+            '400': "Invalid emails list",
             '404': "Project not found",
             '403': "You're not project's owner",
         },
-        operation_description="Accepts list of emails and add those users to project, skips emails not connected to any user"
+        operation_description="Accepts list of emails and add those users to project, emails not connected to any "
+                              "user are skipped and returned in not_found. Lists longer than JOB_INLINE_MAX_EMAILS "
+                              "are added by a background job, the response is then the job to follow at /jobs/{id}/ "
+                              "with the same fields in its result."
     )
     def create(self, request, *args, **kwargs):
-        emails = request.data.get('emails')
+        serializer = EmailsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         project_id = self.kwargs['project_pk']
         try:
-            project = Project.objects.get(pk=project_id)
+            project = Project.objects.alive().get(pk=project_id)
             if project.owner_id != request.user.id:
                 return Response(data={"error": "You're not project's owner"}, status=status.HTTP_403_FORBIDDEN)
 
-            for email in emails:
-                try:
-                    user = MyUser.objects.get(email=email.lower())
-                    project.other_users.add(user)
-                except MyUser.DoesNotExist:
-                    print("NOTFOUND:" + email)
-            return Response({'message': f'All good {project.name}'}, status=status.HTTP_201_CREATED)
+            emails = serializer.validated_data['emails']
+            if len(emails) > settings.JOB_INLINE_MAX_EMAILS:
+                with transaction.atomic():
+                    job = enqueue('taskmanager.operations.add_members', user=request.user, project_id=project.pk,
+                                  emails=emails)
+                return job_accepted(job)
+            result = project.add_members_by_email(emails)
+            return Response({'message': f'All good {project.name}', **result}, status=status.HTTP_201_CREATED)
         except Project.DoesNotExist:
             return Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+class JobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'head', 'options']
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Job.objects.none()
+        return Job.objects.filter(user=self.request.user)
+
+    @swagger_auto_schema(
+        operation_description="Status of a background job started by the current user: QUEUED, RUNNING (result then "
+                              "holds its progress), SUCCEEDED with its result or FAILED with an error."
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class SyncViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get']
+    token_salt = 'taskmanager.sync'
+
+    @swagger_auto_schema(
+        query_serializer=SyncQuerySerializer,
+        responses={
+            '200': SyncResponseSerializer,
+        },
+        operation_id='sync',
+        operation_description="Returns projects and tasks changed since the given token and ids of deleted ones. "
+                              "Without a token, or with one older than the tombstone retention, returns everything "
+                              "with full=true and the client should replace its local copy. All tasks of a returned "
+                              "project are included when the project itself changed (e.g. the user just joined it). "
+                              "Pass the returned token to the next sync."
+    )
+    def list(self, request):
+        query = SyncQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        # taken before querying, so that rows changed while we read are sent again next time
+        now = timezone.now()
+        since = self.parse_token(query.validated_data.get('since'), now)
+        full = since is None
+
+        projects = Project.objects.for_user(request.user)
+        tasks = Task.objects.filter(project__in=projects.values('pk'))
+        deleted_projects, deleted_tasks = [], []
+        if not full:
+            since -= timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+            tasks = tasks.filter(Q(updated_at__gt=since) | Q(project__updated_at__gt=since))
+            projects = projects.filter(updated_at__gt=since)
+            tombstones = Tombstone.objects.filter(deleted_at__gt=since)
+            deleted_projects = tombstones.filter(kind=TombstoneKindChoices.PROJECT, user=request.user)
+            deleted_tasks = tombstones.filter(kind=TombstoneKindChoices.TASK,
+                                              project_id__in=Project.objects.for_user(request.user).values('pk'))
+
+        projects = fast_serializers.serialize_projects(projects)
+        returned_project_ids = {project['id'] for project in projects}
+        return Response({
+            'token': signing.dumps(now.isoformat(), salt=self.token_salt),
+            'full': full,
+            'projects': projects,
+            'tasks': fast_serializers.tasks_data(fast_serializers.task_values(tasks)),
+            'deleted': {
+                # a user removed and added back again gets the project among changed ones only
+                'projects': sorted({tombstone.object_id for tombstone in deleted_projects} - returned_project_ids),
+                'tasks': sorted({tombstone.object_id for tombstone in deleted_tasks}),
+            },
+        }, status=status.HTTP_200_OK)
+
+    def parse_token(self, token, now):
+        if not token:
+            return None
+        try:
+            since = datetime.fromisoformat(signing.loads(token, salt=self.token_salt))
+        except (signing.BadSignature, TypeError, ValueError):
+            raise serializers.ValidationError({'since': ['Invalid sync token']})
+        if since < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+            # tombstones this old may have been pruned already
+            return None
+        return since